@@ -0,0 +1,307 @@
+from __future__ import annotations
+
+import json
+import os
+import random
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, Iterator, List, Optional, Sequence
+
+from database import (
+    BatchRepository,
+    DiscountRepository,
+    InMemoryBatchRepository,
+    InMemoryDiscountRepository,
+    InMemoryItemRepository,
+    ItemRepository,
+)
+from entities import Batch, Item, ItemPack, PercentageDiscount, Receipt, Sellable
+from pos_simulator import PosSimulator
+from printer import NoPrinterOutput, Printer
+from real_database import (
+    SQLiteBatchRepository,
+    SQLiteDBCreator,
+    SQLiteDiscountRepository,
+    SQLiteItemRepository,
+    SQLiteUnitOfWork,
+)
+from store_agents import (
+    DefaultCashier,
+    DefaultStoreManager,
+    PolicyConsole,
+    TransactionAnalyzer,
+)
+from store_units import (
+    CashRegister,
+    DefaultCatalog,
+    DefaultPricingSystem,
+    InMemoryCashRegister,
+    NoPricingSystem,
+)
+
+# Benchmarks of the POS hot paths. Every benchmark runs against a store seeded
+# with catalog_size items (a discount on every 10th item, a batch of every 5th)
+# in memory and in SQLite. A benchmark is a setup returning the timed run, which
+# reports how many operations it did, so results of different sizes compare as
+# seconds per operation.
+
+BENCHMARK_SIZES = (100, 10_000, 1_000_000)
+BACKENDS = ("memory", "sqlite")
+# work per run is capped, so big catalogs measure lookup cost, not loop length
+SAMPLE_SIZE = 10_000
+RECEIPTS = 1_000
+RECEIPT_LINES = 5
+PACK_FANOUT = 4
+
+
+@dataclass
+class BenchmarkStore:
+    backend: str
+    catalog_size: int
+    item_repo: ItemRepository
+    discount_repo: DiscountRepository
+    batch_repo: BatchRepository
+
+
+@dataclass
+class BenchmarkResult:
+    name: str
+    backend: str
+    catalog_size: int
+    seconds: float
+    operations: int
+
+    def key(self) -> str:
+        return f"{self.name}/{self.backend}/{self.catalog_size}"
+
+    def seconds_per_operation(self) -> float:
+        return self.seconds / max(self.operations, 1)
+
+
+Benchmark = Callable[[BenchmarkStore], Callable[[], int]]
+
+
+def build_store(backend: str, catalog_size: int, db_name: str) -> BenchmarkStore:
+    items = [
+        Item(id=i, name=f"Item {i}", price=1 + i % 500 / 100)
+        for i in range(1, catalog_size + 1)
+    ]
+    discounts = [
+        PercentageDiscount(id=i, item_id=i, percentage=0.1)
+        for i in range(1, catalog_size + 1, 10)
+    ]
+    batches = [
+        Batch(id=i, amount=6, item_type=items[i - 1])
+        for i in range(1, catalog_size + 1, 5)
+    ]
+
+    if backend == "memory":
+        item_repo: ItemRepository = InMemoryItemRepository()
+        discount_repo: DiscountRepository = InMemoryDiscountRepository()
+        batch_repo: BatchRepository = InMemoryBatchRepository()
+        item_repo.create_all(items)
+        discount_repo.create_all(discounts)
+        batch_repo.create_all(batches)
+    else:
+        db_creator = SQLiteDBCreator(db_name)
+        db_creator.drop_tables()
+        db_creator.migrate()
+        with SQLiteUnitOfWork(db_name) as unit_of_work:
+            unit_of_work.items.create_all(items)
+            unit_of_work.discounts.create_all(discounts)
+            unit_of_work.batches.create_all(batches)
+        item_repo = SQLiteItemRepository(db_name)
+        discount_repo = SQLiteDiscountRepository(db_name)
+        batch_repo = SQLiteBatchRepository(db_name)
+
+    return BenchmarkStore(backend, catalog_size, item_repo, discount_repo, batch_repo)
+
+
+def sample_items(store: BenchmarkStore) -> List[Item]:
+    # evenly spread over the catalog, at most SAMPLE_SIZE items. They are read
+    # back through the repository, so every backend measures its own objects
+    step = max(1, store.catalog_size // SAMPLE_SIZE)
+    item_ids = range(1, store.catalog_size + 1, step)[:SAMPLE_SIZE]
+    return [store.item_repo.read(item_id) for item_id in item_ids]
+
+
+def sample_sellables(store: BenchmarkStore) -> List[Sellable]:
+    # the sampled items and the batches seeded for them (every 5th item)
+    items = sample_items(store)
+    batches = [
+        store.batch_repo.read(item.getId()) for item in items if item.getId() % 5 == 1
+    ]
+    return [*items, *batches]
+
+
+def chunks(sellables: List[Sellable], size: int) -> Iterator[List[Sellable]]:
+    for start in range(0, len(sellables), size):
+        end = start + size
+        yield sellables[start:end]
+
+
+def make_receipts(store: BenchmarkStore) -> List[Receipt]:
+    items = sample_sellables(store)
+    rng = random.Random(0)
+    return [
+        Receipt(
+            id=receipt_id,
+            payment_method=rng.choice(["cash", "card"]),
+            sellables=rng.sample(items, min(RECEIPT_LINES, len(items))),
+        )
+        for receipt_id in range(RECEIPTS)
+    ]
+
+
+def catalog_browse(store: BenchmarkStore) -> Callable[[], int]:
+    def run() -> int:
+        # a new catalog has no snapshot, so the repositories are read in full
+        return len(DefaultCatalog(store.item_repo, store.batch_repo).browse_catalog())
+
+    return run
+
+
+def discount_resolution(store: BenchmarkStore) -> Callable[[], int]:
+    items = sample_items(store)
+    pricing_system = DefaultPricingSystem(store.discount_repo, store.item_repo)
+
+    def run() -> int:
+        pricing_system.strategies.clear()  # cold cache, every item is resolved
+        return len(pricing_system.manage_discounts(items))
+
+    return run
+
+
+def item_pack_price(store: BenchmarkStore) -> Callable[[], int]:
+    # a pack of packs, PACK_FANOUT wide, with the sampled sellables as leaves
+    level = sample_sellables(store)
+    leaves = len(level)
+    while len(level) > 1:
+        level = [
+            ItemPack(id=i, sellables=pack)
+            for i, pack in enumerate(chunks(level, PACK_FANOUT))
+        ]
+    receipt = Receipt(id=1, sellables=level)
+
+    def run() -> int:
+        receipt.getPrice()
+        return leaves
+
+    return run
+
+
+def close_receipt(store: BenchmarkStore) -> Callable[[], int]:
+    receipts = make_receipts(store)
+    cash_register = InMemoryCashRegister()
+    cashier = DefaultCashier(cash_register, NoPricingSystem())
+    # X reports on every prompt, so every 20th receipt is analyzed in full
+    store_manager = DefaultStoreManager(
+        console=PolicyConsole(),
+        cashier=cashier,
+        printer=Printer(NoPrinterOutput()),
+    )
+    cash_register.add_observer(store_manager)
+
+    def run() -> int:
+        for receipt in receipts:
+            cash_register.close_receipt(receipt)
+        return len(receipts)
+
+    return run
+
+
+def x_report(store: BenchmarkStore) -> Callable[[], int]:
+    receipts = make_receipts(store)
+
+    def run() -> int:
+        TransactionAnalyzer().analyze_transactions(receipts)
+        return len(receipts)
+
+    return run
+
+
+def headless_shift(store: BenchmarkStore) -> Callable[[], int]:
+    simulator = PosSimulator(
+        store.item_repo,
+        store.discount_repo,
+        store.batch_repo,
+        console=PolicyConsole(),
+        printer=Printer(NoPrinterOutput()),
+    )
+    simulator.setup()
+
+    def run() -> int:
+        random.seed(0)
+        simulator.simulate(customers=CashRegister.ENTRIES_FOR_Z_REPORT)
+        return CashRegister.ENTRIES_FOR_Z_REPORT
+
+    return run
+
+
+BENCHMARKS: Dict[str, Benchmark] = {
+    "catalog_browse": catalog_browse,
+    "discount_resolution": discount_resolution,
+    "item_pack_price": item_pack_price,
+    "close_receipt": close_receipt,
+    "x_report": x_report,
+    "headless_shift": headless_shift,
+}
+
+
+def run_benchmarks(
+    sizes: Sequence[int] = BENCHMARK_SIZES,
+    backends: Sequence[str] = BACKENDS,
+    names: Optional[Sequence[str]] = None,
+    repeat: int = 3,
+) -> List[BenchmarkResult]:
+    # the best of repeat runs is kept, it is the one least disturbed by noise
+    results: List[BenchmarkResult] = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in sizes:
+            for backend in backends:
+                db_name = os.path.join(workdir, f"bench_{size}.db")
+                store = build_store(backend, size, db_name)
+                for name in names or BENCHMARKS:
+                    timings = []
+                    for _ in range(repeat):
+                        run = BENCHMARKS[name](store)
+                        start = time.perf_counter()
+                        operations = run()
+                        timings.append(time.perf_counter() - start)
+                    results.append(
+                        BenchmarkResult(name, backend, size, min(timings), operations)
+                    )
+    return results
+
+
+def write_results(path: str, results: Sequence[BenchmarkResult]) -> None:
+    with open(path, "w") as results_file:
+        json.dump({"results": [asdict(r) for r in results]}, results_file, indent=2)
+
+
+def load_results(path: str) -> List[BenchmarkResult]:
+    with open(path) as results_file:
+        entries = json.load(results_file)["results"]
+    return [BenchmarkResult(**entry) for entry in entries]
+
+
+def find_regressions(
+    results: Sequence[BenchmarkResult],
+    baseline: Sequence[BenchmarkResult],
+    threshold: float = 0.2,
+) -> List[str]:
+    # benchmarks more than threshold slower per operation than in the baseline,
+    # benchmarks missing from either side are not compared
+    previous = {result.key(): result for result in baseline}
+    regressions: List[str] = []
+    for result in results:
+        before = previous.get(result.key())
+        if before is None:
+            continue
+        ratio = result.seconds_per_operation() / max(
+            before.seconds_per_operation(), 1e-12
+        )
+        if ratio > 1 + threshold:
+            regressions.append(f"{result.key()} is {ratio:.2f}x slower")
+    return regressions
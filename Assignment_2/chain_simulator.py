@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import os
+import random
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Optional
+
+from database import ReceiptJournal
+from db_init import BatchRepositoryInitializer, DiscountInitializer, ItemInitializer
+from entities import Receipt
+from pos_simulator import PosSimulator
+from printer import NoPrinterOutput, Printer
+from real_database import SQLiteDBCreator
+from store_agents import PolicyConsole, ShiftSummary, merge_summaries
+
+
+# receipt journal that only folds closed receipts into a ShiftSummary
+@dataclass
+class SummaryReceiptJournal(ReceiptJournal):
+    summary: ShiftSummary = field(default_factory=ShiftSummary)
+
+    def record(self, receipt: Receipt) -> None:
+        self.summary.add_receipt(receipt)
+
+    def flush(self) -> None:
+        pass
+
+    def end_shift(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+def simulate_store(
+    store_num: int, customers: int, inmemory: bool = True, seed: int = 0
+) -> ShiftSummary:
+    # runs in a worker process, every store gets its own repositories
+    random.seed(seed + store_num)
+    # a SQLite store only lives for the run, its database is removed after it
+    with tempfile.TemporaryDirectory() as workdir:
+        db_name = os.path.join(workdir, f"store_{store_num}.db")
+        if not inmemory:
+            SQLiteDBCreator(db_name).migrate()
+
+        item_repo = ItemInitializer.initialize_item_repository(inmemory, db_name)
+        batch_repo = BatchRepositoryInitializer.initialize_batch_repository(
+            item_repo, inmemory, db_name
+        )
+        discount_repo = DiscountInitializer.initialize_discount_repository(
+            inmemory, db_name
+        )
+        journal = SummaryReceiptJournal()
+        simulator = PosSimulator(
+            item_repo,
+            discount_repo,
+            batch_repo,
+            # no X reports, the chain report is built from the summaries
+            console=PolicyConsole(x_report_every=customers + 1),
+            printer=Printer(NoPrinterOutput()),
+            journal=journal,
+        )
+        simulator.setup()
+        simulator.simulate(customers)
+        return journal.summary
+
+
+@dataclass
+class ChainSimulator:
+    stores: int
+    customers_per_store: int
+    inmemory: bool = True
+    workers: Optional[int] = None
+    seed: int = 0
+
+    def simulate(self) -> ShiftSummary:
+        store_nums = range(self.stores)
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            summaries = list(
+                executor.map(
+                    simulate_store,
+                    store_nums,
+                    [self.customers_per_store] * self.stores,
+                    [self.inmemory] * self.stores,
+                    [self.seed] * self.stores,
+                )
+            )
+        return merge_summaries(summaries)
+
+    # The chain report covers every receipt of the run, in the X report layout.
+    # It has no Z report counterpart: a Z report only ends a store's shift and
+    # prints nothing, and every store ends its own shifts while it simulates.
+    @staticmethod
+    def print_report(summary: ShiftSummary, printer: Printer) -> None:
+        printer.print_x_report(
+            summary.get_revenue("cash"),
+            summary.get_revenue("card"),
+            summary.product_sales,
+        )
+        printer.flush()
@@ -1,15 +1,34 @@
 from __future__ import annotations
 
+import heapq
+import math
+import threading
+from contextlib import contextmanager
 from dataclasses import dataclass, field
-from typing import List, Protocol
-
-from entities import Batch, Discount, Item, Sellable
+from typing import (
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    MutableMapping,
+    Optional,
+    Protocol,
+    Tuple,
+    TypeVar,
+)
+from weakref import ReferenceType, WeakValueDictionary, ref
+
+from entities import Batch, Discount, Item, Money, Receipt, Sellable
 
 
 class ItemRepository(Protocol):
     def create(self, sellable: Item) -> None:
         pass
 
+    def create_all(self, sellables: Iterable[Item]) -> None:
+        pass
+
     def read(self, sellable_id: int) -> Item:
         pass
 
@@ -22,11 +41,52 @@ class ItemRepository(Protocol):
     def get_all(self) -> List[Sellable]:
         pass
 
+    # streams every entry, fetching batch_size of them at a time
+    def iter_all(self, batch_size: int = 1000) -> Iterator[Sellable]:
+        pass
+
+    # keyset pagination: up to limit entries ordered by id, with id > after_id
+    def page(self, after_id: Optional[int] = None, limit: int = 100) -> List[Sellable]:
+        pass
+
+    # bumped on every mutation so readers can cache get_all results
+    def get_version(self) -> int:
+        pass
+
+
+# notified with the item id whenever a discount of that item is created, updated
+# or deleted
+class DiscountObserver(Protocol):
+    def discount_changed(self, item_id: int) -> None:
+        pass
+
+
+# repositories hold their observers weakly, a pricing system that is dropped
+# stops being notified instead of living as long as the repository
+@dataclass
+class DiscountObservers:
+    refs: List[ReferenceType[DiscountObserver]] = field(default_factory=list)
+
+    def add(self, observer: DiscountObserver) -> None:
+        self.refs = [r for r in self.refs if r() is not None] + [ref(observer)]
+
+    def notify(self, item_id: int) -> None:
+        for observer_ref in self.refs:
+            observer = observer_ref()
+            if observer is not None:
+                observer.discount_changed(item_id)
+
+    def __len__(self) -> int:
+        return sum(1 for r in self.refs if r() is not None)
+
 
 class DiscountRepository(Protocol):
     def create(self, discount: Discount) -> None:
         pass
 
+    def create_all(self, discounts: Iterable[Discount]) -> None:
+        pass
+
     def read(self, discount_id: int) -> Discount:
         pass
 
@@ -39,14 +99,42 @@ class DiscountRepository(Protocol):
     def get_item_discount(self, item_id: int) -> float:
         pass
 
+    # discount in effect at time at, with the time until which it stays in effect
+    def get_item_discount_at(self, item_id: int, at: float) -> Tuple[float, float]:
+        pass
+
+    # discount of every requested item, 0 for items without one
+    def get_item_discounts(self, item_ids: Iterable[int]) -> Dict[int, float]:
+        pass
+
+    def get_item_discounts_at(
+        self, item_ids: Iterable[int], at: float
+    ) -> Dict[int, Tuple[float, float]]:
+        pass
+
     def get_all(self) -> List[Discount]:
         pass
 
+    def iter_all(self, batch_size: int = 1000) -> Iterator[Discount]:
+        pass
+
+    def page(self, after_id: Optional[int] = None, limit: int = 100) -> List[Discount]:
+        pass
+
+    def get_version(self) -> int:
+        pass
+
+    def add_observer(self, observer: DiscountObserver) -> None:
+        pass
+
 
 class BatchRepository(Protocol):
     def create(self, batch: Batch) -> None:
         pass
 
+    def create_all(self, batches: Iterable[Batch]) -> None:
+        pass
+
     def read(self, batch_id: int) -> Batch:
         pass
 
@@ -59,6 +147,132 @@ class BatchRepository(Protocol):
     def get_all(self) -> List[Sellable]:
         pass
 
+    def iter_all(self, batch_size: int = 1000) -> Iterator[Sellable]:
+        pass
+
+    def page(self, after_id: Optional[int] = None, limit: int = 100) -> List[Sellable]:
+        pass
+
+    def get_version(self) -> int:
+        pass
+
+
+# durable log of closed receipts, end_shift is the per-shift durability barrier
+class ReceiptJournal(Protocol):
+    def record(self, receipt: Receipt) -> None:
+        pass
+
+    def flush(self) -> None:
+        pass
+
+    def end_shift(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class NoReceiptJournal(ReceiptJournal):
+    def record(self, receipt: Receipt) -> None:
+        pass
+
+    def flush(self) -> None:
+        pass
+
+    def end_shift(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+# hands every call to each of its journals, in order
+@dataclass
+class CompositeReceiptJournal(ReceiptJournal):
+    journals: List[ReceiptJournal] = field(default_factory=list)
+
+    def record(self, receipt: Receipt) -> None:
+        for journal in self.journals:
+            journal.record(receipt)
+
+    def flush(self) -> None:
+        for journal in self.journals:
+            journal.flush()
+
+    def end_shift(self) -> None:
+        for journal in self.journals:
+            journal.end_shift()
+
+    def close(self) -> None:
+        for journal in self.journals:
+            journal.close()
+
+
+T = TypeVar("T")
+
+
+def keyset_page(
+    entries: Mapping[int, T], after_id: Optional[int], limit: int
+) -> List[T]:
+    ids = heapq.nsmallest(
+        limit, (key for key in entries if after_id is None or key > after_id)
+    )
+    return [entries[key] for key in ids]
+
+
+# Many readers or a single writer. Waiting writers hold off new readers, so a
+# steady stream of reads cannot starve them. Not reentrant.
+@dataclass
+class ReadWriteLock:
+    condition: threading.Condition = field(default_factory=threading.Condition)
+    readers: int = 0
+    writing: bool = False
+    waiting_writers: int = 0
+
+    @contextmanager
+    def read_locked(self) -> Iterator[None]:
+        with self.condition:
+            while self.writing or self.waiting_writers:
+                self.condition.wait()
+            self.readers += 1
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.readers -= 1
+                if not self.readers:
+                    self.condition.notify_all()
+
+    @contextmanager
+    def write_locked(self) -> Iterator[None]:
+        with self.condition:
+            self.waiting_writers += 1
+            while self.writing or self.readers:
+                self.condition.wait()
+            self.waiting_writers -= 1
+            self.writing = True
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.writing = False
+                self.condition.notify_all()
+
+
+def iter_locked(
+    entries: Mapping[int, T], lock: ReadWriteLock, batch_size: int
+) -> Iterator[T]:
+    # only the ids are copied up front, entries are read batch_size at a time
+    # under the read lock, so writers are not blocked while the caller iterates
+    # and entries deleted in the meantime are skipped
+    with lock.read_locked():
+        ids = list(entries)
+    for start in range(0, len(ids), batch_size):
+        end = start + batch_size
+        with lock.read_locked():
+            batch = [entries[i] for i in ids[start:end] if i in entries]
+        yield from batch
+
 
 class ExistsError(Exception):
     pass
@@ -68,107 +282,286 @@ class DoesNotExistError(Exception):
     pass
 
 
+# Identity map in front of the repositories that build Items from rows: every
+# read of an item id returns the same Item object as long as its row is
+# unchanged. Mapped items are flyweights: a changed row maps to a new Item, and
+# nothing sets a discount strategy on them either, pricing works on copies
+# (DefaultPricingSystem.manage_discount, Batch.getPrice, ItemPack.getPrice).
+# Entries are weak, so the map only holds items that are still referenced.
+@dataclass
+class ItemIdentityMap:
+    items: MutableMapping[int, Item] = field(default_factory=WeakValueDictionary)
+
+    def get(self, item_id: int, name: str, price: Money) -> Item:
+        item = self.items.get(item_id)
+        if item is None or item.name != name or item.price != price:
+            item = Item(id=item_id, name=name, price=price)
+            self.items[item_id] = item
+        return item
+
+    def evict(self, item_id: int) -> None:
+        self.items.pop(item_id, None)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+
+ITEM_IDENTITY_MAP = ItemIdentityMap()
+
+
+def shared_identity_map() -> ItemIdentityMap:
+    # process-wide map, shared by every repository that does not get its own
+    return ITEM_IDENTITY_MAP
+
+
 @dataclass
 class InMemoryItemRepository(ItemRepository):
     sellables: dict[int, Item] = field(default_factory=dict)
+    version: int = 0
+    lock: ReadWriteLock = field(
+        default_factory=ReadWriteLock, repr=False, compare=False
+    )
 
     def create(self, sellable: Item) -> None:
-        if sellable.getId() in self.sellables:
-            raise ExistsError
+        with self.lock.write_locked():
+            if sellable.getId() in self.sellables:
+                raise ExistsError
+
+            self.sellables[sellable.getId()] = sellable
+            self.version += 1
 
-        self.sellables[sellable.getId()] = sellable
+    def create_all(self, sellables: Iterable[Item]) -> None:
+        for sellable in sellables:
+            self.create(sellable)
 
     def read(self, sellable_id: int) -> Item:
-        try:
-            return self.sellables[sellable_id]
-        except KeyError:
-            raise DoesNotExistError
+        with self.lock.read_locked():
+            try:
+                return self.sellables[sellable_id]
+            except KeyError:
+                raise DoesNotExistError
 
     def update(self, sellable: Item) -> None:
-        if sellable.getId() not in self.sellables:
-            raise DoesNotExistError
+        with self.lock.write_locked():
+            if sellable.getId() not in self.sellables:
+                raise DoesNotExistError
 
-        self.sellables[sellable.getId()] = sellable
+            self.sellables[sellable.getId()] = sellable
+            self.version += 1
 
     def delete(self, sellable_id: int) -> None:
-        try:
-            del self.sellables[sellable_id]
-        except KeyError:
-            raise DoesNotExistError
+        with self.lock.write_locked():
+            try:
+                del self.sellables[sellable_id]
+            except KeyError:
+                raise DoesNotExistError
+
+            self.version += 1
 
     def get_all(self) -> List[Sellable]:
-        # Implement logic to retrieve all items
-        # Example for InMemoryItemRepository:
-        return list(self.sellables.values())
+        with self.lock.read_locked():
+            # Implement logic to retrieve all items
+            # Example for InMemoryItemRepository:
+            return list(self.sellables.values())
+
+    def iter_all(self, batch_size: int = 1000) -> Iterator[Sellable]:
+        return iter_locked(self.sellables, self.lock, batch_size)
+
+    def page(self, after_id: Optional[int] = None, limit: int = 100) -> List[Sellable]:
+        with self.lock.read_locked():
+            return keyset_page(self.sellables, after_id, limit)
+
+    def get_version(self) -> int:
+        return self.version
 
 
 @dataclass
 class InMemoryDiscountRepository(DiscountRepository):
     discounts: dict[int, Discount] = field(default_factory=dict)
+    version: int = 0
+    lock: ReadWriteLock = field(
+        default_factory=ReadWriteLock, repr=False, compare=False
+    )
+    # secondary index: item_id -> discount ids (in insertion order), so that
+    # get_item_discount does not have to scan every discount
+    item_index: dict[int, dict[int, None]] = field(
+        init=False, repr=False, compare=False, default_factory=dict
+    )
+    # item_id each discount was indexed under, discounts can be mutated in place
+    indexed_items: dict[int, int] = field(
+        init=False, repr=False, compare=False, default_factory=dict
+    )
+    observers: DiscountObservers = field(
+        repr=False, compare=False, default_factory=DiscountObservers
+    )
+
+    def __post_init__(self) -> None:
+        for discount in self.discounts.values():
+            self._index(discount)
 
     def create(self, discount: Discount) -> None:
-        if discount.getId() in self.discounts:
-            raise ExistsError
+        with self.lock.write_locked():
+            if discount.getId() in self.discounts:
+                raise ExistsError
 
-        self.discounts[discount.getId()] = discount
+            self.discounts[discount.getId()] = discount
+            self._index(discount)
+            self.version += 1
+
+    def create_all(self, discounts: Iterable[Discount]) -> None:
+        for discount in discounts:
+            self.create(discount)
 
     def read(self, discount_id: int) -> Discount:
-        try:
-            return self.discounts[discount_id]
-        except KeyError:
-            raise DoesNotExistError
+        with self.lock.read_locked():
+            try:
+                return self.discounts[discount_id]
+            except KeyError:
+                raise DoesNotExistError
 
     def update(self, discount: Discount) -> None:
-        if discount.getId() not in self.discounts:
-            raise DoesNotExistError
+        with self.lock.write_locked():
+            if discount.getId() not in self.discounts:
+                raise DoesNotExistError
 
-        self.discounts[discount.getId()] = discount
+            self._unindex(discount.getId())
+            self.discounts[discount.getId()] = discount
+            self._index(discount)
+            self.version += 1
 
     def delete(self, discount_id: int) -> None:
-        try:
-            del self.discounts[discount_id]
-        except KeyError:
-            raise DoesNotExistError
+        with self.lock.write_locked():
+            try:
+                del self.discounts[discount_id]
+            except KeyError:
+                raise DoesNotExistError
 
-    def get_item_discount(self, item_id: int) -> float:
-        # Search for an item-specific discount in the repository
-        for discount in self.discounts.values():
-            if discount.getItemId() == item_id:
-                return discount.getValue()
+            self._unindex(discount_id)
+            self.version += 1
 
-        return 0
+    def get_item_discount(self, item_id: int) -> float:
+        with self.lock.read_locked():
+            discount_ids = self.item_index.get(item_id)
+            if discount_ids:
+                return self.discounts[next(iter(discount_ids))].getValue()
+
+            return 0
+
+    def get_item_discount_at(self, item_id: int, at: float) -> Tuple[float, float]:
+        # plain discounts never expire
+        return self.get_item_discount(item_id), math.inf
+
+    def get_item_discounts(self, item_ids: Iterable[int]) -> Dict[int, float]:
+        discounts: Dict[int, float] = {}
+        with self.lock.read_locked():
+            for item_id in item_ids:
+                discount_ids = self.item_index.get(item_id)
+                discounts[item_id] = (
+                    self.discounts[next(iter(discount_ids))].getValue()
+                    if discount_ids
+                    else 0
+                )
+        return discounts
+
+    def get_item_discounts_at(
+        self, item_ids: Iterable[int], at: float
+    ) -> Dict[int, Tuple[float, float]]:
+        discounts = self.get_item_discounts(item_ids)
+        return {item_id: (value, math.inf) for item_id, value in discounts.items()}
 
     def get_all(self) -> List[Discount]:
-        return list(self.discounts.values())
+        with self.lock.read_locked():
+            return list(self.discounts.values())
+
+    def iter_all(self, batch_size: int = 1000) -> Iterator[Discount]:
+        return iter_locked(self.discounts, self.lock, batch_size)
+
+    def page(self, after_id: Optional[int] = None, limit: int = 100) -> List[Discount]:
+        with self.lock.read_locked():
+            return keyset_page(self.discounts, after_id, limit)
+
+    def get_version(self) -> int:
+        return self.version
+
+    def add_observer(self, observer: DiscountObserver) -> None:
+        with self.lock.write_locked():
+            self.observers.add(observer)
+
+    def _index(self, discount: Discount) -> None:
+        item_id = discount.getItemId()
+        self.item_index.setdefault(item_id, {})[discount.getId()] = None
+        self.indexed_items[discount.getId()] = item_id
+        self._notify(item_id)
+
+    def _unindex(self, discount_id: int) -> None:
+        item_id = self.indexed_items.pop(discount_id, None)
+        if item_id is None:
+            return
+
+        discount_ids = self.item_index[item_id]
+        discount_ids.pop(discount_id, None)
+        if not discount_ids:
+            del self.item_index[item_id]
+        self._notify(item_id)
+
+    def _notify(self, item_id: int) -> None:
+        self.observers.notify(item_id)
 
 
 @dataclass
 class InMemoryBatchRepository(BatchRepository):
     batches: dict[int, Batch] = field(default_factory=dict)
+    version: int = 0
+    lock: ReadWriteLock = field(
+        default_factory=ReadWriteLock, repr=False, compare=False
+    )
 
     def create(self, batch: Batch) -> None:
-        if batch.getId() in self.batches:
-            raise ExistsError
+        with self.lock.write_locked():
+            if batch.getId() in self.batches:
+                raise ExistsError
 
-        self.batches[batch.getId()] = batch
+            self.batches[batch.getId()] = batch
+            self.version += 1
+
+    def create_all(self, batches: Iterable[Batch]) -> None:
+        for batch in batches:
+            self.create(batch)
 
     def read(self, batch_id: int) -> Batch:
-        try:
-            return self.batches[batch_id]
-        except KeyError:
-            raise DoesNotExistError
+        with self.lock.read_locked():
+            try:
+                return self.batches[batch_id]
+            except KeyError:
+                raise DoesNotExistError
 
     def update(self, batch: Batch) -> None:
-        if batch.getId() not in self.batches:
-            raise DoesNotExistError
+        with self.lock.write_locked():
+            if batch.getId() not in self.batches:
+                raise DoesNotExistError
 
-        self.batches[batch.getId()] = batch
+            self.batches[batch.getId()] = batch
+            self.version += 1
 
     def delete(self, batch_id: int) -> None:
-        try:
-            del self.batches[batch_id]
-        except KeyError:
-            raise DoesNotExistError
+        with self.lock.write_locked():
+            try:
+                del self.batches[batch_id]
+            except KeyError:
+                raise DoesNotExistError
+
+            self.version += 1
 
     def get_all(self) -> List[Sellable]:
-        return list(self.batches.values())
+        with self.lock.read_locked():
+            return list(self.batches.values())
+
+    def iter_all(self, batch_size: int = 1000) -> Iterator[Sellable]:
+        return iter_locked(self.batches, self.lock, batch_size)
+
+    def page(self, after_id: Optional[int] = None, limit: int = 100) -> List[Sellable]:
+        with self.lock.read_locked():
+            return keyset_page(self.batches, after_id, limit)
+
+    def get_version(self) -> int:
+        return self.version
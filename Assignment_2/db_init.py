@@ -1,4 +1,6 @@
-from typing import Dict, List
+import hashlib
+import json
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Protocol, Sequence
 
 from database import (
     BatchRepository,
@@ -13,15 +15,57 @@ from real_database import (
     SQLiteBatchRepository,
     SQLiteDiscountRepository,
     SQLiteItemRepository,
+    SQLiteUnitOfWork,
 )
 
+# SQLite repositories are seeded through a unit of work with bulk inserts, so
+# seeding is one transaction instead of one commit per row. Every seed's checksum
+# is stored next to the data, so an initialized database is not seeded again and
+# a changed seed only writes the rows that differ.
+
+
+class SeedRepository(Protocol):
+    def iter_all(self, batch_size: int = 1000) -> Iterator[Any]:
+        pass
+
+    def create_all(self, entities: Iterable[Any]) -> None:
+        pass
+
+    def update(self, entity: Any) -> None:
+        pass
+
+
+def seed_checksum(seed_data: Sequence[Mapping[str, Any]]) -> str:
+    return hashlib.sha256(json.dumps(seed_data, sort_keys=True).encode()).hexdigest()
+
+
+def apply_seed(
+    unit_of_work: SQLiteUnitOfWork,
+    seed: str,
+    checksum: str,
+    repository: SeedRepository,
+    entities: Sequence[Any],
+) -> None:
+    if unit_of_work.get_seed_checksum(seed) == checksum:
+        return
+
+    existing = {entity.getId(): entity for entity in repository.iter_all()}
+    repository.create_all(e for e in entities if e.getId() not in existing)
+    for entity in entities:
+        current = existing.get(entity.getId())
+        if current is not None and current != entity:
+            repository.update(entity)
+    unit_of_work.record_seed_checksum(seed, checksum)
+
 
 class ItemInitializer:
     @staticmethod
-    def initialize_item_repository(inmemory: bool = False) -> ItemRepository:
+    def initialize_item_repository(
+        inmemory: bool = False, db_name: str = "pos.db"
+    ) -> ItemRepository:
         item_repo: ItemRepository = InMemoryItemRepository()
         if not inmemory:
-            item_repo = SQLiteItemRepository()
+            item_repo = SQLiteItemRepository(db_name)
 
         products_data: List[Dict[str, str]] = [
             {"id": "1", "name": "Bread", "price": "2.49"},
@@ -35,12 +79,21 @@ class ItemInitializer:
             # more products as needed
         ]
 
+        products: List[Item] = []
         for data in products_data:
             id: int = int(data["id"])
             name: str = data["name"]
             price: float = float(data["price"])
-            product = Item(id=id, name=name, price=price)
-            item_repo.create(product)
+            products.append(Item(id=id, name=name, price=price))
+
+        if inmemory:
+            item_repo.create_all(products)
+        else:
+            with SQLiteUnitOfWork(db_name) as unit_of_work:
+                checksum = seed_checksum(products_data)
+                apply_seed(
+                    unit_of_work, "items", checksum, unit_of_work.items, products
+                )
 
         # for p in item_repo.get_all():
         #     print("product id " + str(p.getId()) + " " + p.getName())
@@ -50,10 +103,12 @@ class ItemInitializer:
 
 class DiscountInitializer:
     @staticmethod
-    def initialize_discount_repository(inmemory: bool = False) -> DiscountRepository:
+    def initialize_discount_repository(
+        inmemory: bool = False, db_name: str = "pos.db"
+    ) -> DiscountRepository:
         discount_repo: DiscountRepository = InMemoryDiscountRepository()
         if not inmemory:
-            discount_repo = SQLiteDiscountRepository()
+            discount_repo = SQLiteDiscountRepository(db_name)
 
         # Add percentage discounts for specific items
         discounts_data = [
@@ -67,13 +122,27 @@ class DiscountInitializer:
             # more discounts as needed
         ]
 
-        for data in discounts_data:
-            discount = PercentageDiscount(
+        discounts = [
+            PercentageDiscount(
                 id=int(data["id"]),
                 item_id=int(data["item_id"]),
                 percentage=float(data["percentage"]),
             )
-            discount_repo.create(discount)
+            for data in discounts_data
+        ]
+
+        if inmemory:
+            discount_repo.create_all(discounts)
+        else:
+            with SQLiteUnitOfWork(db_name) as unit_of_work:
+                checksum = seed_checksum(discounts_data)
+                apply_seed(
+                    unit_of_work,
+                    "discounts",
+                    checksum,
+                    unit_of_work.discounts,
+                    discounts,
+                )
 
         # for d in discount_repo.get_all():
         #     print("product id " + str(d.getId()) + " " + str(d.getValue()))
@@ -84,11 +153,11 @@ class DiscountInitializer:
 class BatchRepositoryInitializer:
     @staticmethod
     def initialize_batch_repository(
-        item_repo: ItemRepository, inmemory: bool = False
+        item_repo: ItemRepository, inmemory: bool = False, db_name: str = "pos.db"
     ) -> BatchRepository:
         batch_repo: BatchRepository = InMemoryBatchRepository()
         if not inmemory:
-            batch_repo = SQLiteBatchRepository()
+            batch_repo = SQLiteBatchRepository(db_name)
 
         # Add batches for specific items
         batches_data = [
@@ -98,9 +167,22 @@ class BatchRepositoryInitializer:
             # Add more batches as needed
         ]
 
-        for data in batches_data:
-            item = item_repo.read(data["item_id"])
-            batch = Batch(id=int(data["id"]), amount=data["amount"], item_type=item)
-            batch_repo.create(batch)
+        batches = [
+            Batch(
+                id=int(data["id"]),
+                amount=data["amount"],
+                item_type=item_repo.read(data["item_id"]),
+            )
+            for data in batches_data
+        ]
+
+        if inmemory:
+            batch_repo.create_all(batches)
+        else:
+            with SQLiteUnitOfWork(db_name) as unit_of_work:
+                checksum = seed_checksum(batches_data)
+                apply_seed(
+                    unit_of_work, "batches", checksum, unit_of_work.batches, batches
+                )
 
         return batch_repo
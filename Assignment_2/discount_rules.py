@@ -0,0 +1,243 @@
+from __future__ import annotations
+
+import heapq
+import math
+import time
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from database import (
+    DiscountObserver,
+    DiscountObservers,
+    DiscountRepository,
+    DoesNotExistError,
+    ExistsError,
+    keyset_page,
+)
+from entities import Discount, DiscountRule
+
+# Rules of one item (or one category) are flattened into a sorted-boundary
+# index: the boundaries split the time line into segments, and every segment
+# stores the single rule that wins in it. Resolving a discount is then a binary
+# search over the boundaries, however many rules overlap.
+
+
+@dataclass
+class DiscountRuleIndex:
+    # segment i covers [boundaries[i], boundaries[i + 1]), the last one is open
+    boundaries: List[float] = field(default_factory=list)
+    winners: List[Optional[DiscountRule]] = field(default_factory=list)
+
+    @staticmethod
+    def build(rules: Iterable[DiscountRule]) -> DiscountRuleIndex:
+        by_start = sorted(rules, key=lambda rule: rule.start)
+        times = sorted({rule.start for rule in by_start} | {r.end for r in by_start})
+        index = DiscountRuleIndex()
+        # active rules ordered by priority, then by id so the oldest rule wins
+        # ties, expired rules are only dropped once they reach the top
+        active: List[Tuple[int, int, float, DiscountRule]] = []
+        next_rule = 0
+        for boundary in times:
+            while next_rule < len(by_start) and by_start[next_rule].start <= boundary:
+                rule = by_start[next_rule]
+                heapq.heappush(active, (-rule.priority, rule.id, rule.end, rule))
+                next_rule += 1
+            while active and active[0][2] <= boundary:
+                heapq.heappop(active)
+
+            winner = active[0][3] if active else None
+            if index.winners and index.winners[-1] is winner:
+                continue  # same rule keeps winning, no new segment needed
+            index.boundaries.append(boundary)
+            index.winners.append(winner)
+        return index
+
+    def resolve(self, at: float) -> Tuple[Optional[DiscountRule], float]:
+        # winning rule at time at and the time the next segment starts
+        position = bisect_right(self.boundaries, at)
+        until = (
+            self.boundaries[position] if position < len(self.boundaries) else math.inf
+        )
+        if position == 0:
+            return None, until
+        return self.winners[position - 1], until
+
+
+EMPTY_INDEX = DiscountRuleIndex()
+
+
+# Discount repository over time-windowed rules. Item rules and category rules
+# are indexed separately; an item gets the higher priority of its own winning
+# rule and its category's winning rule, with the item rule winning ties.
+@dataclass
+class RuleDiscountRepository(DiscountRepository):
+    rules: Dict[int, DiscountRule] = field(default_factory=dict)
+    item_categories: Dict[int, str] = field(default_factory=dict)
+    clock: Callable[[], float] = field(default=time.time, repr=False)
+    version: int = 0
+    observers: DiscountObservers = field(
+        repr=False, compare=False, default_factory=DiscountObservers
+    )
+    category_items: Dict[str, Set[int]] = field(
+        init=False, repr=False, compare=False, default_factory=dict
+    )
+    # rule ids per item id and per category, with lazily rebuilt indexes
+    item_rules: Dict[int, Set[int]] = field(
+        init=False, repr=False, compare=False, default_factory=dict
+    )
+    category_rules: Dict[str, Set[int]] = field(
+        init=False, repr=False, compare=False, default_factory=dict
+    )
+    item_indexes: Dict[int, DiscountRuleIndex] = field(
+        init=False, repr=False, compare=False, default_factory=dict
+    )
+    category_indexes: Dict[str, DiscountRuleIndex] = field(
+        init=False, repr=False, compare=False, default_factory=dict
+    )
+
+    def __post_init__(self) -> None:
+        for item_id, category in self.item_categories.items():
+            self.category_items.setdefault(category, set()).add(item_id)
+        for rule in self.rules.values():
+            self._index(rule)
+
+    def create(self, discount: Discount) -> None:
+        if discount.getId() in self.rules:
+            raise ExistsError
+
+        rule = as_rule(discount)
+        self.rules[rule.id] = rule
+        self._index(rule)
+        self.version += 1
+
+    def create_all(self, discounts: Iterable[Discount]) -> None:
+        for discount in discounts:
+            self.create(discount)
+
+    def read(self, discount_id: int) -> Discount:
+        try:
+            return self.rules[discount_id]
+        except KeyError:
+            raise DoesNotExistError
+
+    def update(self, discount: Discount) -> None:
+        if discount.getId() not in self.rules:
+            raise DoesNotExistError
+
+        rule = as_rule(discount)
+        self._unindex(self.rules[rule.id])
+        self.rules[rule.id] = rule
+        self._index(rule)
+        self.version += 1
+
+    def delete(self, discount_id: int) -> None:
+        try:
+            rule = self.rules.pop(discount_id)
+        except KeyError:
+            raise DoesNotExistError
+
+        self._unindex(rule)
+        self.version += 1
+
+    def get_item_discount(self, item_id: int) -> float:
+        return self.get_item_discount_at(item_id, self.clock())[0]
+
+    def get_item_discount_at(self, item_id: int, at: float) -> Tuple[float, float]:
+        rule, until = self._item_index(item_id).resolve(at)
+        category = self.item_categories.get(item_id)
+        if category is not None:
+            category_rule, category_until = self._category_index(category).resolve(at)
+            until = min(until, category_until)
+            if category_rule is not None and (
+                rule is None or category_rule.priority > rule.priority
+            ):
+                rule = category_rule
+        return (rule.percentage if rule is not None else 0.0), until
+
+    def get_item_discounts(self, item_ids: Iterable[int]) -> Dict[int, float]:
+        resolved = self.get_item_discounts_at(item_ids, self.clock())
+        return {item_id: value for item_id, (value, _) in resolved.items()}
+
+    def get_item_discounts_at(
+        self, item_ids: Iterable[int], at: float
+    ) -> Dict[int, Tuple[float, float]]:
+        return {item_id: self.get_item_discount_at(item_id, at) for item_id in item_ids}
+
+    def get_all(self) -> List[Discount]:
+        return list(self.rules.values())
+
+    def iter_all(self, batch_size: int = 1000) -> Iterator[Discount]:
+        yield from self.rules.values()
+
+    def page(self, after_id: Optional[int] = None, limit: int = 100) -> List[Discount]:
+        return keyset_page(self.rules, after_id, limit)
+
+    def get_version(self) -> int:
+        return self.version
+
+    def add_observer(self, observer: DiscountObserver) -> None:
+        self.observers.add(observer)
+
+    def set_category(self, item_id: int, category: str) -> None:
+        previous = self.item_categories.get(item_id)
+        if previous is not None:
+            self.category_items[previous].discard(item_id)
+        self.item_categories[item_id] = category
+        self.category_items.setdefault(category, set()).add(item_id)
+        self.version += 1
+        self._notify(item_id)
+
+    def _item_index(self, item_id: int) -> DiscountRuleIndex:
+        index = self.item_indexes.get(item_id)
+        if index is None:
+            rule_ids = self.item_rules.get(item_id)
+            if not rule_ids:
+                return EMPTY_INDEX
+            index = DiscountRuleIndex.build(self.rules[i] for i in rule_ids)
+            self.item_indexes[item_id] = index
+        return index
+
+    def _category_index(self, category: str) -> DiscountRuleIndex:
+        index = self.category_indexes.get(category)
+        if index is None:
+            rule_ids = self.category_rules.get(category)
+            if not rule_ids:
+                return EMPTY_INDEX
+            index = DiscountRuleIndex.build(self.rules[i] for i in rule_ids)
+            self.category_indexes[category] = index
+        return index
+
+    def _index(self, rule: DiscountRule) -> None:
+        if rule.category is not None:
+            self.category_rules.setdefault(rule.category, set()).add(rule.id)
+        else:
+            self.item_rules.setdefault(rule.item_id, set()).add(rule.id)
+        self._invalidate(rule)
+
+    def _unindex(self, rule: DiscountRule) -> None:
+        if rule.category is not None:
+            self.category_rules.get(rule.category, set()).discard(rule.id)
+        else:
+            self.item_rules.get(rule.item_id, set()).discard(rule.id)
+        self._invalidate(rule)
+
+    def _invalidate(self, rule: DiscountRule) -> None:
+        # only the index the rule belongs to is rebuilt, on its next lookup
+        if rule.category is not None:
+            self.category_indexes.pop(rule.category, None)
+            for item_id in self.category_items.get(rule.category, ()):
+                self._notify(item_id)
+        else:
+            self.item_indexes.pop(rule.item_id, None)
+            self._notify(rule.item_id)
+
+    def _notify(self, item_id: int) -> None:
+        self.observers.notify(item_id)
+
+
+def as_rule(discount: Discount) -> DiscountRule:
+    # plain discounts become rules that are always in effect
+    if isinstance(discount, DiscountRule):
+        return discount
+    return DiscountRule(discount.getId(), discount.getItemId(), discount.getValue())
@@ -1,27 +1,117 @@
 from __future__ import annotations
 
+from copy import copy
 from dataclasses import dataclass, field
-from math import isqrt
-from typing import List, Protocol
+from decimal import Decimal
+from functools import total_ordering
+from itertools import chain, repeat
+from math import inf, isqrt
+from typing import Any, Dict, Iterator, List, Optional, Protocol, Tuple, Type, Union
+
+BASIS_POINTS = 10_000
+
+
+def divide_half_even(numerator: int, denominator: int) -> int:
+    quotient, remainder = divmod(numerator, denominator)
+    if 2 * remainder > denominator or (
+        2 * remainder == denominator and quotient % 2 == 1
+    ):
+        quotient += 1
+    return quotient
+
+
+# fixed-point money: integer cents, so totals add up without float drift.
+# Money compares and hashes like the float amount it stands for, so it can be
+# compared with plain prices and mixed with them in sets and dict keys.
+@total_ordering
+@dataclass(frozen=True, eq=False)
+class Money:
+    cents: int = 0
+
+    def __post_init__(self) -> None:
+        # amounts read back from REAL columns arrive as floats
+        if not isinstance(self.cents, int):
+            object.__setattr__(self, "cents", round(self.cents))
+
+    @staticmethod
+    def of(amount: MoneyLike) -> Money:
+        # ints are whole currency units, floats are rounded to the nearest cent
+        if isinstance(amount, Money):
+            return amount
+        if isinstance(amount, int):
+            return Money(amount * 100)
+        return Money(round(Decimal(str(amount)) * 100))
+
+    def discounted(self, percentage: float) -> Money:
+        # banker's rounding of the discounted amount to whole cents
+        basis_points = round(percentage * BASIS_POINTS)
+        return Money(
+            divide_half_even(self.cents * (BASIS_POINTS - basis_points), BASIS_POINTS)
+        )
+
+    def __add__(self, other: MoneyLike) -> Money:
+        return Money(self.cents + Money.of(other).cents)
+
+    def __radd__(self, other: MoneyLike) -> Money:
+        return self + other
+
+    def __sub__(self, other: MoneyLike) -> Money:
+        return Money(self.cents - Money.of(other).cents)
+
+    def __mul__(self, times: int) -> Money:
+        return Money(self.cents * times)
+
+    def __rmul__(self, times: int) -> Money:
+        return Money(self.cents * times)
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, Money):
+            return self.cents == other.cents
+        if isinstance(other, (int, float)):
+            return float(self) == other
+        return NotImplemented
+
+    def __lt__(self, other: Any) -> bool:
+        if isinstance(other, Money):
+            return self.cents < other.cents
+        if isinstance(other, (int, float)):
+            return float(self) < other
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        # equal to the hash of every int or float this compares equal to
+        return hash(float(self))
+
+    def __float__(self) -> float:
+        return self.cents / 100
+
+    def __format__(self, format_spec: str) -> str:
+        return format(float(self), format_spec)
+
+    def __str__(self) -> str:
+        return format(self, "")
+
+
+MoneyLike = Union[Money, int, float]
 
 
 class DiscountStrategy(Protocol):
-    def applyDiscount(self, price: float) -> float:
+    def applyDiscount(self, price: MoneyLike) -> Money:
         pass
 
 
-@dataclass
+@dataclass(frozen=True)
 class NoDiscount(DiscountStrategy):
-    def applyDiscount(self, price: float) -> float:
-        return price
+    def applyDiscount(self, price: MoneyLike) -> Money:
+        return Money.of(price)
 
 
-@dataclass
+@dataclass(frozen=True)
 class PercentageDiscountStrategy(DiscountStrategy):
     percentage: float = 0.0
 
-    def applyDiscount(self, price: float) -> float:
-        return price * (1 - self.percentage)
+    def applyDiscount(self, price: MoneyLike) -> Money:
+        return Money.of(price).discounted(self.percentage)
 
 
 @dataclass
@@ -37,11 +127,11 @@ class ReceiptDiscountStrategy(DiscountStrategy):
                 return False
         return True
 
-    def applyDiscount(self, price: float) -> float:
+    def applyDiscount(self, price: MoneyLike) -> Money:
         if self.isPrime(self.customer_id):
-            return price * (1 - self.percentage)
+            return Money.of(price).discounted(self.percentage)
         else:
-            return price
+            return Money.of(price)
 
 
 class Sellable(Protocol):
@@ -51,7 +141,7 @@ class Sellable(Protocol):
     def getName(self) -> str:
         ...
 
-    def getPrice(self) -> float:
+    def getPrice(self) -> Money:
         ...
 
     def setDiscountStrategy(self, discount_strategy: DiscountStrategy) -> None:
@@ -69,8 +159,8 @@ class NoSellable:
     def getName(self) -> str:
         return "no name"
 
-    def getPrice(self) -> float:
-        return 0
+    def getPrice(self) -> Money:
+        return Money()
 
     def setDiscountStrategy(self, discount_strategy: DiscountStrategy) -> None:
         pass
@@ -83,16 +173,19 @@ class NoSellable:
 class Item(Sellable):
     id: int
     name: str
-    price: float
+    price: MoneyLike
     discount_strategy: DiscountStrategy = field(default_factory=NoDiscount)
 
+    def __post_init__(self) -> None:
+        self.price = Money.of(self.price)
+
     def getId(self) -> int:
         return self.id
 
     def getName(self) -> str:
         return self.name
 
-    def getPrice(self) -> float:
+    def getPrice(self) -> Money:
         return self.discount_strategy.applyDiscount(self.price)
 
     def setDiscountStrategy(self, discount_strategy: "DiscountStrategy") -> None:
@@ -102,6 +195,15 @@ class Item(Sellable):
         return self.discount_strategy
 
 
+def undiscounted(sellable: Sellable) -> Sellable:
+    # packed sellables may be shared, so their discount is dropped on a copy
+    if isinstance(sellable.getDiscountStrategy(), NoDiscount):
+        return sellable
+    plain = copy(sellable)
+    plain.setDiscountStrategy(NoDiscount())
+    return plain
+
+
 @dataclass
 class ItemPack(Sellable):
     id: int
@@ -114,12 +216,13 @@ class ItemPack(Sellable):
     def getName(self) -> str:
         return self.sellables[0].getName() + " " + str(len(self.sellables)) + " pack"
 
-    def getPrice(self) -> float:
-        for sellable in self.sellables:
-            sellable.setDiscountStrategy(NoDiscount())
+    def getPrice(self) -> Money:
         return sum(
-            self.discount_strategy.applyDiscount(sellable.getPrice())
-            for sellable in self.sellables
+            (
+                self.discount_strategy.applyDiscount(undiscounted(sellable).getPrice())
+                for sellable in self.sellables
+            ),
+            Money(),
         )
 
     def setDiscountStrategy(self, discount_strategy: DiscountStrategy) -> None:
@@ -142,9 +245,9 @@ class Batch(Sellable):
     def getName(self) -> str:
         return self.item_type.getName() + " " + str(self.amount) + " pack"
 
-    def getPrice(self) -> float:
-        self.item_type.setDiscountStrategy(self.discount_strategy)
-        return self.amount * self.item_type.getPrice()
+    def getPrice(self) -> Money:
+        # item_type may be shared, so price it without touching its strategy
+        return self.amount * self.discount_strategy.applyDiscount(self.item_type.price)
 
     def setDiscountStrategy(self, discount_strategy: DiscountStrategy) -> None:
         self.discount_strategy = discount_strategy
@@ -168,6 +271,11 @@ class Receipt(Sellable):
     # customer_number: int
     sellables: List[Sellable] = field(default_factory=list)
     discount_strategy: DiscountStrategy = field(default_factory=NoDiscount)
+    # units sold of every sellable, a consolidated line repeats its sellable
+    quantities: List[int] = field(default_factory=list)
+
+    def __post_init__(self) -> None:
+        self.quantities.extend(repeat(1, len(self.sellables) - len(self.quantities)))
 
     def getId(self) -> int:
         return self.id
@@ -175,10 +283,17 @@ class Receipt(Sellable):
     def getName(self) -> str:
         return "Receipt " + str(self.id)
 
-    def getPrice(self) -> float:
-        price = sum(sellable.getPrice() for sellable in self.sellables)
+    def getPrice(self) -> Money:
+        # every line is priced once, then multiplied
+        price = sum(
+            (sellable.getPrice() * quantity for sellable, quantity in self.lines()),
+            Money(),
+        )
         return self.discount_strategy.applyDiscount(price)
 
+    def lines(self) -> Iterator[Tuple[Sellable, int]]:
+        return zip(self.sellables, chain(self.quantities, repeat(1)))
+
     def setDiscountStrategy(self, discount_strategy: DiscountStrategy) -> None:
         self.discount_strategy = discount_strategy
 
@@ -187,10 +302,17 @@ class Receipt(Sellable):
 
     def addSellable(self, sellable: Sellable) -> None:
         self.sellables.append(sellable)
+        self.quantities.append(1)
 
     def removeSellable(self, sellable: Sellable) -> None:
+        # takes back a single unit of a consolidated line
         if sellable in self.sellables:
-            self.sellables.remove(sellable)
+            line = self.sellables.index(sellable)
+            if self.quantities[line] > 1:
+                self.quantities[line] -= 1
+            else:
+                del self.sellables[line]
+                del self.quantities[line]
 
     def get_payment_method(self) -> str:
         return self.payment_method
@@ -208,8 +330,8 @@ class NoReceipt(Receipt):
     def getName(self) -> str:
         return "No Receipt Name"
 
-    def getPrice(self) -> float:
-        return 0
+    def getPrice(self) -> Money:
+        return Money()
 
     def setDiscountStrategy(self, discount_strategy: DiscountStrategy) -> None:
         pass
@@ -233,13 +355,27 @@ class ReceiptBuilder:
     payment_method: str = ""
     sellables: List[Sellable] = field(default_factory=list)
     discount_strategy: DiscountStrategy = field(default_factory=NoDiscount)
+    quantities: List[int] = field(default_factory=list)
+    # line of the last sellable registered under a type and id
+    line_index: Dict[Tuple[Type[Any], int], int] = field(
+        default_factory=dict, repr=False
+    )
 
     def with_id(self, id: int) -> ReceiptBuilder:
         self.id = id
         return self
 
     def with_sellable(self, sellable: Sellable) -> ReceiptBuilder:
+        # identical sellables (same id, same resolved discount) share one line
+        key = (type(sellable), sellable.getId())
+        line = self.line_index.get(key)
+        if line is not None and self.sellables[line] == sellable:
+            self.quantities[line] += 1
+            return self
+
+        self.line_index[key] = len(self.sellables)
         self.sellables.append(sellable)
+        self.quantities.append(1)
         return self
 
     def with_payment_method(self, payment_method: str) -> ReceiptBuilder:
@@ -258,6 +394,7 @@ class ReceiptBuilder:
             self.payment_method,
             sellables=self.sellables,
             discount_strategy=self.discount_strategy,
+            quantities=self.quantities,
         )
 
 
@@ -286,3 +423,29 @@ class PercentageDiscount(Discount):
 
     def getValue(self) -> float:
         return self.percentage
+
+
+# item_id of rules that apply to a whole category instead of a single item
+NO_ITEM = -1
+
+
+# percentage discount valid in the time window [start, end), when several rules
+# overlap the one with the highest priority wins
+@dataclass
+class DiscountRule(Discount):
+    id: int
+    item_id: int
+    percentage: float
+    start: float = -inf
+    end: float = inf
+    priority: int = 0
+    category: Optional[str] = None
+
+    def getId(self) -> int:
+        return self.id
+
+    def getItemId(self) -> int:
+        return self.item_id
+
+    def getValue(self) -> float:
+        return self.percentage
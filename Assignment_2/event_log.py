@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+
+from database import DoesNotExistError, ReceiptJournal
+from entities import Batch, Receipt
+from store_agents import ShiftSummary
+
+# Register actions are appended as JSON lines to an append-only log:
+#   {"seq": 1, "type": "open", "receipt": 0}
+#   {"seq": 2, "type": "item", "receipt": 0, "name": "Milk", "units": 1}
+#   {"seq": 3, "type": "close", "receipt": 0, "payment": "cash", "cents": 199}
+#   {"seq": 4, "type": "z"}
+# Every snapshot_every events the aggregate report state is written, together
+# with the log offset it covers, to a separate snapshot file, so a report can be
+# rebuilt by replaying only the events after the nearest snapshot.
+
+Event = Dict[str, Any]
+
+
+@dataclass
+class ReportState:
+    seq: int = 0
+    offset: int = 0
+    shift: int = 0
+    summary: ShiftSummary = field(default_factory=ShiftSummary)
+    # lines of the receipt being replayed, applied when it is closed
+    pending: List[Tuple[str, int]] = field(default_factory=list)
+
+    def apply(self, event: Event) -> None:
+        self.seq = event["seq"]
+        kind = event["type"]
+        if kind == "open":
+            self.pending = []
+        elif kind == "item":
+            self.pending.append((event["name"], event["units"]))
+        elif kind == "close":
+            self.summary.add_payment(event["payment"], event["cents"])
+            for product_name, units_sold in self.pending:
+                self.summary.add_sale(product_name, units_sold)
+            self.pending = []
+        elif kind == "z":
+            self.shift += 1
+            self.summary = ShiftSummary()
+
+    def to_snapshot(self) -> Dict[str, Any]:
+        return {
+            "seq": self.seq,
+            "offset": self.offset,
+            "shift": self.shift,
+            "summary": asdict(self.summary),
+        }
+
+    @staticmethod
+    def from_snapshot(snapshot: Dict[str, Any]) -> ReportState:
+        return ReportState(
+            snapshot["seq"],
+            snapshot["offset"],
+            snapshot["shift"],
+            ShiftSummary(**snapshot["summary"]),
+        )
+
+
+def read_lines(file_name: str, offset: int = 0) -> Iterator[Tuple[int, Event]]:
+    # streams (offset after the line, decoded line) pairs starting at offset
+    if not os.path.exists(file_name):
+        return
+    with open(file_name, "rb") as file:
+        file.seek(offset)
+        for line in file:
+            if not line.endswith(b"\n"):
+                # the last record was torn by a crash, it was never written
+                return
+            offset += len(line)
+            yield offset, json.loads(line)
+
+
+def truncate_torn_tail(file_name: str, length: int) -> None:
+    # cuts an incomplete last record off, so appends start on a fresh line
+    if os.path.exists(file_name) and os.path.getsize(file_name) > length:
+        os.truncate(file_name, length)
+
+
+@dataclass
+class EventReplayer:
+    log_name: str = "receipts.log"
+    snapshot_name: str = "receipts.snapshots"
+
+    def rebuild_x_report(self, seq: int) -> ShiftSummary:
+        # report of the shift that was open right after event seq
+        state = self._replay(lambda snapshot: snapshot["seq"] <= seq, seq)
+        return state.summary
+
+    def rebuild_z_report(self, shift: int) -> ShiftSummary:
+        # only a shift closed by a z event has a Z report
+        state = self._nearest_state(lambda snapshot: snapshot["shift"] <= shift)
+        for offset, event in read_lines(self.log_name, state.offset):
+            if event["type"] == "z" and state.shift == shift:
+                return state.summary
+            state.apply(event)
+            state.offset = offset
+        raise DoesNotExistError(f"shift {shift} has no Z report in the log")
+
+    def rebuild_state(self) -> ReportState:
+        return self._replay(lambda snapshot: True)
+
+    def _replay(
+        self, accept: Callable[[Dict[str, Any]], bool], seq: Optional[int] = None
+    ) -> ReportState:
+        state = self._nearest_state(accept)
+        for offset, event in read_lines(self.log_name, state.offset):
+            if seq is not None and event["seq"] > seq:
+                break
+            state.apply(event)
+            state.offset = offset
+        return state
+
+    def _nearest_state(self, accept: Callable[[Dict[str, Any]], bool]) -> ReportState:
+        # snapshots are written in log order, keep the last acceptable one
+        nearest: Optional[Dict[str, Any]] = None
+        for _, snapshot in read_lines(self.snapshot_name):
+            if not accept(snapshot):
+                break
+            nearest = snapshot
+        if nearest is None:
+            return ReportState()
+        return ReportState.from_snapshot(nearest)
+
+
+# receipt journal that event-sources the cash register into the log
+@dataclass
+class EventLogReceiptJournal(ReceiptJournal):
+    log_name: str = "receipts.log"
+    snapshot_name: str = "receipts.snapshots"
+    snapshot_every: int = 1000
+    state: Optional[ReportState] = field(default=None, repr=False)
+    log: Optional[BinaryIO] = field(default=None, repr=False)
+    last_snapshot_seq: int = 0
+
+    def record(self, receipt: Receipt) -> None:
+        receipt_id = receipt.getId()
+        self._append({"type": "open", "receipt": receipt_id})
+        for sellable, quantity in receipt.lines():
+            product_name = sellable.getName()
+            units_sold = quantity
+            if isinstance(sellable, Batch):
+                product_name = sellable.item_type.getName()
+                units_sold = sellable.amount * quantity
+            self._append(
+                {
+                    "type": "item",
+                    "receipt": receipt_id,
+                    "name": product_name,
+                    "units": units_sold,
+                }
+            )
+        self._append(
+            {
+                "type": "close",
+                "receipt": receipt_id,
+                "payment": receipt.get_payment_method(),
+                "cents": receipt.getPrice().cents,
+            }
+        )
+        self._maybe_snapshot()
+
+    def flush(self) -> None:
+        if self.log is not None:
+            self.log.flush()
+
+    def end_shift(self) -> None:
+        self._append({"type": "z"})
+        self.flush()
+        self._maybe_snapshot()
+
+    def close(self) -> None:
+        if self.log is not None:
+            self.log.close()
+            self.log = None
+
+    def get_state(self) -> ReportState:
+        if self.state is None:
+            # resume an existing log from its latest snapshot and tail
+            replayer = EventReplayer(self.log_name, self.snapshot_name)
+            self.state = replayer.rebuild_state()
+            self.last_snapshot_seq = self.state.seq
+            truncate_torn_tail(self.log_name, self.state.offset)
+            snapshots_end = 0
+            for snapshots_end, _ in read_lines(self.snapshot_name):
+                pass
+            truncate_torn_tail(self.snapshot_name, snapshots_end)
+        return self.state
+
+    def _append(self, event: Event) -> None:
+        state = self.get_state()
+        if self.log is None:
+            self.log = open(self.log_name, "ab")
+
+        event = {"seq": state.seq + 1, **event}
+        line = (json.dumps(event) + "\n").encode()
+        self.log.write(line)
+        state.apply(event)
+        state.offset += len(line)
+
+    def _maybe_snapshot(self) -> None:
+        state = self.get_state()
+        if state.seq - self.last_snapshot_seq < self.snapshot_every:
+            return
+
+        self.flush()
+        with open(self.snapshot_name, "a") as snapshots:
+            snapshots.write(json.dumps(state.to_snapshot()) + "\n")
+        self.last_snapshot_seq = state.seq
@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+import heapq
+import random
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Protocol, Tuple
+
+from database import BatchRepository, DiscountRepository, ItemRepository
+from printer import NoPrinterOutput, Printer
+from store_agent_factory import (
+    DefaultStoreAgentFactory,
+    NoStoreAgentFactory,
+    StoreAgentFactory,
+)
+from store_agents import (
+    Cashier,
+    Customer,
+    DefaultCashier,
+    PolicyConsole,
+    UniformProductSampler,
+)
+from store_unit_factory import DefaultStoreComponentFactory
+
+# all times are in minutes since the store opened
+
+ARRIVAL = 0
+DEPARTURE = 1
+
+
+class ServiceTime(Protocol):
+    def service_time(self, cart_size: int, rng: random.Random) -> float:
+        pass
+
+
+@dataclass
+class FixedServiceTime:
+    minutes: float = 1.0
+
+    def service_time(self, cart_size: int, rng: random.Random) -> float:
+        return self.minutes
+
+
+@dataclass
+class ExponentialServiceTime:
+    mean_minutes: float = 1.0
+
+    def service_time(self, cart_size: int, rng: random.Random) -> float:
+        return rng.expovariate(1 / self.mean_minutes)
+
+
+@dataclass
+class PerItemServiceTime:
+    # fixed payment overhead plus scanning time for every item in the cart
+    base_minutes: float = 0.5
+    minutes_per_item: float = 0.1
+
+    def service_time(self, cart_size: int, rng: random.Random) -> float:
+        return self.base_minutes + self.minutes_per_item * cart_size
+
+
+@dataclass
+class Lane:
+    cashier: Cashier
+    service: ServiceTime
+    # waiting customers with their arrival time and customer number
+    queue: Deque[Tuple[float, int, Customer]] = field(default_factory=deque)
+    busy: bool = False
+    busy_time: float = 0.0
+    served: int = 0
+
+    def get_load(self) -> int:
+        return len(self.queue) + self.busy
+
+
+@dataclass
+class StoreSimulationReport:
+    customers: int
+    mean_queue_length: float
+    max_queue_length: int
+    mean_wait: float
+    wait_percentiles: Dict[int, float]
+    utilization: List[float]
+
+
+def percentile(sorted_values: List[float], percent: int) -> float:
+    # nearest-rank percentile of an already sorted list
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-percent * len(sorted_values) // 100))
+    return sorted_values[rank - 1]
+
+
+# Discrete-event model of a store with several registers: customers arrive as a
+# Poisson process, join the shortest lane and are checked out by that lane's
+# DefaultCashier. Events are kept in a heap ordered by time.
+@dataclass
+class StoreEventSimulator:
+    item_repo: ItemRepository
+    discount_repo: DiscountRepository
+    batch_repo: BatchRepository
+    services: List[ServiceTime]
+    arrivals_per_minute: float = 1.0
+    open_minutes: float = 12 * 60
+    seed: int = 0
+    rng: random.Random = field(default_factory=random.Random)
+    agent_factory: StoreAgentFactory = field(default_factory=NoStoreAgentFactory)
+    lanes: List[Lane] = field(default_factory=list)
+    events: List[Tuple[float, int, int, int]] = field(default_factory=list)
+    customer_cnt: int = 0
+    event_cnt: int = 0
+
+    def setup(self) -> None:
+        self.rng.seed(self.seed)
+        component_factory = DefaultStoreComponentFactory(
+            self.item_repo, self.discount_repo, self.batch_repo
+        )
+        catalog = component_factory.create_catalog()
+        pricing_system = component_factory.create_pricing_system()
+        printer = Printer(NoPrinterOutput())
+        self.agent_factory = DefaultStoreAgentFactory(
+            catalog,
+            component_factory.create_cash_register(),
+            pricing_system,
+            # carts and payments come from the seeded rng too, so a seed
+            # reproduces the whole day
+            product_sampler=UniformProductSampler(self.rng),
+            console=PolicyConsole(),
+            printer=printer,
+            rng=self.rng,
+        )
+        self.lanes = [
+            Lane(
+                DefaultCashier(
+                    cash_register=component_factory.create_cash_register(),
+                    pricing_system=pricing_system,
+                    printer=printer,
+                ),
+                service,
+            )
+            for service in self.services
+        ]
+        self.events = []
+        self.customer_cnt = 0
+        self.event_cnt = 0
+
+    def simulate(self) -> StoreSimulationReport:
+        waits: List[float] = []
+        queued = 0
+        max_queued = 0
+        queue_area = 0.0
+        now = 0.0
+
+        self._schedule(self.rng.expovariate(self.arrivals_per_minute), ARRIVAL, 0)
+        while self.events:
+            time, _, kind, lane_num = heapq.heappop(self.events)
+            queue_area += queued * (time - now)
+            now = time
+
+            if kind == ARRIVAL:
+                next_arrival = now + self.rng.expovariate(self.arrivals_per_minute)
+                if next_arrival < self.open_minutes:
+                    self._schedule(next_arrival, ARRIVAL, 0)
+
+                customer = self.agent_factory.create_customer()
+                self.customer_cnt += 1
+                lane_num = min(
+                    range(len(self.lanes)), key=lambda i: self.lanes[i].get_load()
+                )
+                lane = self.lanes[lane_num]
+                if lane.busy:
+                    lane.queue.append((now, self.customer_cnt, customer))
+                    queued += 1
+                    max_queued = max(max_queued, queued)
+                else:
+                    waits.append(0.0)
+                    self._serve(lane_num, self.customer_cnt, customer, now)
+            else:
+                lane = self.lanes[lane_num]
+                lane.busy = False
+                if lane.queue:
+                    arrived, customer_number, customer = lane.queue.popleft()
+                    queued -= 1
+                    waits.append(now - arrived)
+                    self._serve(lane_num, customer_number, customer, now)
+
+        waits.sort()
+        return StoreSimulationReport(
+            customers=len(waits),
+            mean_queue_length=queue_area / now if now else 0.0,
+            max_queue_length=max_queued,
+            mean_wait=sum(waits) / len(waits) if waits else 0.0,
+            wait_percentiles={p: percentile(waits, p) for p in (50, 90, 99)},
+            utilization=[lane.busy_time / now if now else 0.0 for lane in self.lanes],
+        )
+
+    def _serve(
+        self, lane_num: int, customer_number: int, customer: Customer, now: float
+    ) -> None:
+        lane = self.lanes[lane_num]
+        cashier = lane.cashier
+        cashier.open_receipt(customer_number)
+        cart = customer.get_cart_items()
+        cashier.register_items(cart)
+        receipt = cashier.show_receipt()
+        cashier.close_receipt(customer.pay(receipt))
+
+        duration = lane.service.service_time(len(cart), self.rng)
+        lane.busy = True
+        lane.busy_time += duration
+        lane.served += 1
+        self._schedule(now + duration, DEPARTURE, lane_num)
+
+    def _schedule(self, time: float, kind: int, lane_num: int) -> None:
+        # event_cnt breaks ties so events at the same time keep insertion order
+        self.event_cnt += 1
+        heapq.heappush(self.events, (time, self.event_cnt, kind, lane_num))
@@ -1,9 +1,28 @@
+import math
+import time
+from datetime import datetime
+from typing import List, Optional
+
 import typer
 
+from benchmarks import (
+    BENCHMARK_SIZES,
+    find_regressions,
+    load_results,
+    run_benchmarks,
+    write_results,
+)
+from chain_simulator import ChainSimulator
+from database import CompositeReceiptJournal, DoesNotExistError, ReceiptJournal
 from db_init import BatchRepositoryInitializer, DiscountInitializer, ItemInitializer
+from event_log import EventLogReceiptJournal, EventReplayer
+from event_simulator import PerItemServiceTime, StoreEventSimulator
 from pos_simulator import PosSimulator
-from printer import Printer
-from real_database import SQLiteDBCreator
+from printer import NoPrinterOutput, Printer
+from real_database import SQLiteDBCreator, SQLiteReceiptJournal
+from shift_archive import ShiftArchive, ShiftArchiveJournal
+from store_agents import PolicyConsole
+from store_units import ThreadedObserverDispatcher
 
 app = typer.Typer()
 
@@ -12,31 +31,204 @@ app = typer.Typer()
 def list() -> None:
     typer.echo("Printing information of the store...")
     db_creator = SQLiteDBCreator()
-    db_creator.drop_tables()
-    db_creator.create_tables()
+    db_creator.migrate()
     item_repo = ItemInitializer.initialize_item_repository(inmemory=False)
     batch_repo = BatchRepositoryInitializer.initialize_batch_repository(item_repo, inmemory=False)
     discount_repo = DiscountInitializer.initialize_discount_repository()
-    Printer.print_items(item_repo)
-    Printer.print_batches(batch_repo)
-    Printer.print_discounts(discount_repo)
+    printer = Printer()
+    printer.print_items(item_repo)
+    printer.print_batches(batch_repo)
+    printer.print_discounts(discount_repo)
 
 
 @app.command()
-def simulate() -> None:
+def simulate(
+    customers: Optional[int] = typer.Option(
+        None, help="Run N customers headless and report customers/sec."
+    ),
+    lanes: int = typer.Option(1, help="Cashier threads sharing the register."),
+    archive: Optional[str] = typer.Option(
+        None, help="Also archive every shift to this directory (needs numpy)."
+    ),
+    event_log: Optional[str] = typer.Option(
+        None, help="Also append every register action to this event log."
+    ),
+) -> None:
     typer.echo("Starting simulation...")
 
     db_creator = SQLiteDBCreator()
-    db_creator.drop_tables()
-    db_creator.create_tables()
+    db_creator.migrate()
     item_repo = ItemInitializer.initialize_item_repository(inmemory=False)
     batch_repo = BatchRepositoryInitializer.initialize_batch_repository(item_repo, inmemory=False)
     discount_repo = DiscountInitializer.initialize_discount_repository(inmemory=False)
-    simulator = PosSimulator(item_repo, discount_repo, batch_repo)
+    journal: ReceiptJournal = SQLiteReceiptJournal()
+    journals: List[ReceiptJournal] = [journal]
+    if archive is not None:
+        journals.append(ShiftArchiveJournal(archive))
+    if event_log is not None:
+        journals.append(EventLogReceiptJournal(event_log, f"{event_log}.snapshots"))
+    if len(journals) > 1:
+        journal = CompositeReceiptJournal(journals)
+    if customers is None:
+        simulator = PosSimulator(item_repo, discount_repo, batch_repo, journal=journal)
+        simulator.setup()
+        simulator.simulate()
+        journal.close()
+        typer.echo("Simulation completed.")
+        return
+
+    # headless, so X reports can be produced off the checkout thread
+    dispatcher = ThreadedObserverDispatcher()
+    simulator = PosSimulator(
+        item_repo,
+        discount_repo,
+        batch_repo,
+        console=PolicyConsole(),
+        printer=Printer(NoPrinterOutput()),
+        journal=journal,
+        dispatcher=dispatcher,
+        # a columnar shift is only kept with a single lane
+        columnar_shift=lanes == 1,
+        lanes=lanes,
+    )
+    simulator.setup()
+    start = time.perf_counter()
+    simulator.simulate(customers)
+    elapsed = time.perf_counter() - start
+    dispatcher.close()
+    journal.close()
+
+    typer.echo(
+        f"Simulation completed: {customers} customers in {elapsed:.2f}s"
+        f" ({customers / elapsed:.0f} customers/sec)."
+    )
+
+
+@app.command()
+def simulate_day(
+    lanes: int = typer.Option(4, help="Number of open registers."),
+    arrivals: float = typer.Option(2.0, help="Customer arrivals per minute."),
+    hours: float = typer.Option(12.0, help="Opening hours."),
+    seed: int = typer.Option(0, help="Random seed for arrivals and service."),
+) -> None:
+    typer.echo("Simulating a store day...")
+
+    item_repo = ItemInitializer.initialize_item_repository(inmemory=True)
+    batch_repo = BatchRepositoryInitializer.initialize_batch_repository(
+        item_repo, inmemory=True
+    )
+    discount_repo = DiscountInitializer.initialize_discount_repository(inmemory=True)
+    simulator = StoreEventSimulator(
+        item_repo,
+        discount_repo,
+        batch_repo,
+        services=[PerItemServiceTime() for _ in range(lanes)],
+        arrivals_per_minute=arrivals,
+        open_minutes=hours * 60,
+        seed=seed,
+    )
     simulator.setup()
-    simulator.simulate()
+    report = simulator.simulate()
+
+    typer.echo(f"Customers served: {report.customers}")
+    typer.echo(f"Mean queue length: {report.mean_queue_length:.2f}")
+    typer.echo(f"Max queue length: {report.max_queue_length}")
+    typer.echo(f"Mean wait: {report.mean_wait:.2f} min")
+    for percent, wait in report.wait_percentiles.items():
+        typer.echo(f"p{percent} wait: {wait:.2f} min")
+    for lane_num, utilization in enumerate(report.utilization, start=1):
+        typer.echo(f"Register {lane_num} utilization: {utilization:.0%}")
+
+
+@app.command()
+def simulate_chain(
+    stores: int = typer.Option(4, help="Number of stores to simulate."),
+    customers: int = typer.Option(1000, help="Customers per store."),
+    sqlite: bool = typer.Option(False, help="Give every store a SQLite database."),
+    workers: Optional[int] = typer.Option(None, help="Worker processes."),
+) -> None:
+    typer.echo(f"Simulating {stores} stores...")
+
+    chain = ChainSimulator(stores, customers, inmemory=not sqlite, workers=workers)
+    start = time.perf_counter()
+    summary = chain.simulate()
+    elapsed = time.perf_counter() - start
+
+    ChainSimulator.print_report(summary, Printer())
+    typer.echo(f"Chain shift completed: {summary.receipts} receipts in {elapsed:.2f}s.")
+
+
+@app.command()
+def benchmark(
+    size: List[int] = typer.Option(
+        [*BENCHMARK_SIZES], help="Catalog sizes to benchmark, repeatable."
+    ),
+    output: str = typer.Option("benchmarks.json", help="Where to write results."),
+    baseline: Optional[str] = typer.Option(
+        None, help="Earlier results to compare against."
+    ),
+    threshold: float = typer.Option(
+        0.2, help="Slowdown per operation that fails the comparison."
+    ),
+    repeat: int = typer.Option(3, help="Runs per benchmark, the best one counts."),
+) -> None:
+    results = run_benchmarks(size, repeat=repeat)
+    for result in results:
+        typer.echo(
+            f"{result.key():<40} {result.seconds:>9.4f}s"
+            f" {result.seconds_per_operation() * 1e6:>10.2f}us/op"
+        )
+    write_results(output, results)
+
+    if baseline is not None:
+        regressions = find_regressions(results, load_results(baseline), threshold)
+        for regression in regressions:
+            typer.echo(f"Regression: {regression}")
+        if regressions:
+            raise typer.Exit(code=1)
+
+
+@app.command()
+def replay(
+    shift: int = typer.Argument(..., help="Shift to rebuild the Z report of."),
+    event_log: str = typer.Option("receipts.log", help="Event log to replay."),
+) -> None:
+    replayer = EventReplayer(event_log, f"{event_log}.snapshots")
+    try:
+        summary = replayer.rebuild_z_report(shift)
+    except DoesNotExistError as error:
+        typer.echo(str(error))
+        raise typer.Exit(code=1)
+    typer.echo(f"Receipts: {summary.receipts}")
+    printer = Printer()
+    printer.print_x_report(
+        summary.get_revenue("cash"), summary.get_revenue("card"), summary.product_sales
+    )
+    printer.flush()
+
+
+@app.command()
+def sales_history(
+    archive: str = typer.Option("shift_archive", help="Archive of past shifts."),
+    top: int = typer.Option(10, help="Number of products to list."),
+    since: Optional[str] = typer.Option(None, help="ISO date, inclusive."),
+    until: Optional[str] = typer.Option(None, help="ISO date, exclusive."),
+    product: Optional[str] = typer.Option(
+        None, help="List what is bought together with this product."
+    ),
+) -> None:
+    start = datetime.fromisoformat(since).timestamp() if since else -math.inf
+    end = datetime.fromisoformat(until).timestamp() if until else math.inf
+    history = ShiftArchive(archive)
 
-    typer.echo("Simulation completed.")
+    for method, cents in history.revenue_by_payment(start, end).items():
+        typer.echo(f"{method} revenue: {cents / 100:.2f}")
+    for name, units in history.top_products(top, start, end):
+        typer.echo(f"{name:<20} {units:>10}")
+    if product is not None:
+        typer.echo(f"Bought with {product}:")
+        for name, baskets in history.bought_with(product, top, start, end):
+            typer.echo(f"{name:<20} {baskets:>10}")
 
 
 if __name__ == "__main__":
@@ -1,16 +1,32 @@
 from __future__ import annotations
 
+import threading
 from dataclasses import dataclass, field
+from typing import List, Optional
 
-from database import BatchRepository, DiscountRepository, ItemRepository
+from database import (
+    BatchRepository,
+    DiscountRepository,
+    ItemRepository,
+    NoReceiptJournal,
+    ReceiptJournal,
+)
 from db_init import BatchRepositoryInitializer, DiscountInitializer, ItemInitializer
+from printer import Printer
 from real_database import SQLiteDBCreator
 from store_agent_factory import (
     DefaultStoreAgentFactory,
     NoStoreAgentFactory,
     StoreAgentFactory,
 )
-from store_agents import Cashier, NoCashier, NoStoreManager, StoreManager
+from store_agents import (
+    Cashier,
+    Console,
+    NoCashier,
+    NoStoreManager,
+    RealConsole,
+    StoreManager,
+)
 from store_unit_factory import (
     DefaultStoreComponentFactory,
     NoComponentFactory,
@@ -22,7 +38,9 @@ from store_units import (
     NoCashRegister,
     NoCatalog,
     NoPricingSystem,
+    ObserverDispatcher,
     PricingSystem,
+    SynchronousObserverDispatcher,
 )
 
 
@@ -38,19 +56,40 @@ class PosSimulator:
     pricing_system: PricingSystem = field(default_factory=NoPricingSystem)
     cashier: Cashier = field(default_factory=NoCashier)
     store_manager: StoreManager = field(default_factory=NoStoreManager)
+    # headless runs swap these for PolicyConsole and a NoPrinterOutput printer
+    console: Console = field(default_factory=RealConsole)
+    printer: Printer = field(default_factory=Printer)
+    journal: ReceiptJournal = field(default_factory=NoReceiptJournal)
+    dispatcher: ObserverDispatcher = field(
+        default_factory=SynchronousObserverDispatcher
+    )
+    columnar_shift: bool = False
+    # cashier threads serving customers at once, all closing into one register
+    lanes: int = 1
     # reason why customer cnt is simulator field and not customer field
     # is because customer does not need to know his/her number
     customer_cnt: int = 0
+    customer_lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
 
     def setup(self) -> None:
         self.component_factory = DefaultStoreComponentFactory(
-            self.item_repo, self.discount_repo, self.batch_repo
+            self.item_repo,
+            self.discount_repo,
+            self.batch_repo,
+            self.journal,
+            self.dispatcher,
+            self.columnar_shift,
+            self.lanes,
         )
         self.cash_register = self.component_factory.create_cash_register()
         self.catalog = self.component_factory.create_catalog()
         self.pricing_system = self.component_factory.create_pricing_system()
         self.store_agent_factory = DefaultStoreAgentFactory(
-            self.catalog, self.cash_register, self.pricing_system
+            self.catalog,
+            self.cash_register,
+            self.pricing_system,
+            console=self.console,
+            printer=self.printer,
         )
         (
             self.cashier,
@@ -58,23 +97,51 @@ class PosSimulator:
         ) = self.store_agent_factory.create_cashier_and_manager()
         self.customer_cnt = 0
 
-    def simulate(self) -> None:
-        while self.store_manager.get_shift_num() < 4:
+    def simulate(self, customers: Optional[int] = None) -> None:
+        # without a customer limit the simulation runs for four shifts
+        if self.lanes > 1:
+            cashiers = [self.cashier] + [
+                self.store_agent_factory.create_cashier()
+                for _ in range(self.lanes - 1)
+            ]
+            threads: List[threading.Thread] = [
+                threading.Thread(target=self._serve, args=(cashier, customers))
+                for cashier in cashiers
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        else:
+            self._serve(self.cashier, customers)
+        self.dispatcher.drain()
+        self.printer.flush()
+        self.journal.flush()
+
+    def _serve(self, cashier: Cashier, customers: Optional[int]) -> None:
+        while True:
+            with self.customer_lock:
+                if not self._keep_running(customers):
+                    return
+                self.customer_cnt += 1
+                customer_number = self.customer_cnt
             customer = self.store_agent_factory.create_customer()
-            self.customer_cnt += 1
-            self.cashier.open_receipt(self.customer_cnt)
-            for product in customer.get_cart_items():
-                self.cashier.register_item(product)
-            receipt = self.cashier.show_receipt()
+            cashier.open_receipt(customer_number)
+            cashier.register_items(customer.get_cart_items())
+            receipt = cashier.show_receipt()
             payment_method = customer.pay(receipt)
-            self.cashier.close_receipt(payment_method)
+            cashier.close_receipt(payment_method)
+
+    def _keep_running(self, customers: Optional[int]) -> bool:
+        if customers is None:
+            return self.store_manager.get_shift_num() < 4
+        return self.customer_cnt < customers
 
 
 if __name__ == "__main__":
 
     db_creator = SQLiteDBCreator()
-    db_creator.drop_tables()
-    db_creator.create_tables()
+    db_creator.migrate()
     item_repo = ItemInitializer.initialize_item_repository(inmemory=False)
     batch_repo = BatchRepositoryInitializer.initialize_batch_repository(item_repo, inmemory=False)
     discount_repo = DiscountInitializer.initialize_discount_repository(inmemory=False)
@@ -1,92 +1,249 @@
-from typing import Dict
+import gzip
+import sys
+from dataclasses import dataclass, field
+from functools import lru_cache
+from itertools import islice
+from typing import IO, Dict, Iterable, List, Optional, Protocol
 
 from database import BatchRepository, DiscountRepository, ItemRepository
 from entities import (
     Batch,
     Item,
+    Money,
     PercentageDiscount,
     PercentageDiscountStrategy,
     Receipt,
 )
 
+RECEIPT_HEADER = (
+    "\n"
+    + "{:<15} | {:<7} | {:<7} | {:<8}".format("Product", "Units", "Price", "Total")
+    + "\n"
+    + "-" * 45
+    + "\n"
+)
+RECEIPT_FOOTER = "-" * 45 + "\n{:<30} ${:<7.2f}\n\n"
+X_REPORT_HEADER = (
+    "{:<15} | {:<10}".format("Product", "Units Sold") + "\n" + "-" * 25 + "\n"
+)
+X_REPORT_LINE = "{:<15} | {:<10}\n"
+X_REPORT_FOOTER = "-" * 25 + "\n{:<15} ${:<10.2f}\n{:<15} ${:<10.2f}\n"
+
+
+# the same products show up on most receipts, so their lines are formatted once
+@lru_cache(maxsize=4096)
+def receipt_line(product_name: str, units: int, price: Money, total: Money) -> str:
+    return "{:<15} | {:<7} | ${:<6.2f} | ${:<7.2f}\n".format(
+        product_name, units, price, total
+    )
+
+
+# sink for rendered documents (receipts, reports), one write() per document
+class PrinterOutput(Protocol):
+    def write(self, document: str) -> None:
+        pass
+
+    def flush(self) -> None:
+        pass
+
+
+@dataclass
+class ConsolePrinterOutput:
+    # documents written to stdout at once, 1 keeps output in step with prompts
+    batch_documents: int = 1
+    buffer: List[str] = field(default_factory=list)
+
+    def write(self, document: str) -> None:
+        self.buffer.append(document)
+        if len(self.buffer) >= self.batch_documents:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.buffer:
+            sys.stdout.write("".join(self.buffer))
+            self.buffer.clear()
+
+
+class NoPrinterOutput:
+    def write(self, document: str) -> None:
+        pass
+
+    def flush(self) -> None:
+        pass
+
+
+@dataclass
+class InMemoryPrinterOutput:
+    documents: List[str] = field(default_factory=list)
+
+    def write(self, document: str) -> None:
+        self.documents.append(document)
+
+    def flush(self) -> None:
+        pass
+
+    def get_lines(self) -> List[str]:
+        return "".join(self.documents).splitlines()
+
+
+@dataclass
+class BufferedFilePrinterOutput:
+    file_name: str
+    batch_documents: int = 100
+    compress: bool = False
+    # start a new numbered file once the current one holds this many characters
+    rotate_size: Optional[int] = None
+    buffer: List[str] = field(default_factory=list)
+    file: Optional[IO[str]] = None
+    segment: int = 0
+    segment_size: int = 0
+
+    def write(self, document: str) -> None:
+        self.buffer.append(document)
+        if len(self.buffer) >= self.batch_documents:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.buffer:
+            return
 
+        data = "".join(self.buffer)
+        self.buffer.clear()
+        if self.file is None:
+            self.file = self._open_segment()
+        self.file.write(data)
+        self.file.flush()
+
+        self.segment_size += len(data)
+        if self.rotate_size is not None and self.segment_size >= self.rotate_size:
+            self.file.close()
+            self.file = None
+            self.segment += 1
+            self.segment_size = 0
+
+    def close(self) -> None:
+        self.flush()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def get_segment_name(self) -> str:
+        name = self.file_name
+        if self.rotate_size is not None:
+            name += "." + str(self.segment)
+        if self.compress:
+            name += ".gz"
+        return name
+
+    def _open_segment(self) -> IO[str]:
+        if self.compress:
+            return gzip.open(self.get_segment_name(), "at")
+        return open(self.get_segment_name(), "a")
+
+
+@dataclass
 class Printer:
-    @staticmethod
-    def print_receipt(receipt: Receipt) -> None:
-        print()
-        print(
-            "{:<15} | {:<7} | {:<7} | {:<8}".format(
-                "Product", "Units", "Price", "Total"
-            )
-        )
-        print("-" * 45)
+    output: PrinterOutput = field(default_factory=ConsolePrinterOutput)
+
+    def print_receipt(self, receipt: Receipt) -> None:
+        self.output.write(self.render_receipt(receipt))
+
+    def render_receipt(self, receipt: Receipt) -> str:
+        parts = [RECEIPT_HEADER]
         # es ar chavtvale sakmarisad mdzime logikad rom sadme sxvagan gametana ravi
-        for sellable in receipt.sellables:
+        for sellable, quantity in receipt.lines():
             product_name = sellable.getName()
             # If the sellable is a batch, get the item type name and amount
             price = sellable.getPrice()
-            total = price
-            units = 1
+            total = price * quantity
+            units = quantity
             if isinstance(sellable, Batch):
                 product_name = sellable.item_type.getName()
-                price = sellable.item_type.getPrice()
-                units = sellable.amount
-                total = sellable.getPrice()
-
-            print(
-                "{:<15} | {:<7} | ${:<6.2f} | ${:<7.2f}".format(
-                    product_name, units, price, total
+                units = sellable.amount * quantity
+                # the unit price carries the pack's discount, not the item's
+                price = sellable.getDiscountStrategy().applyDiscount(
+                    sellable.item_type.price
                 )
-            )
 
-        print("-" * 45)
-        print("{:<30} ${:<7.2f}".format("Total", receipt.getPrice()))
-        print()
-        pass
+            parts.append(receipt_line(product_name, units, price, total))
+
+        parts.append(RECEIPT_FOOTER.format("Total", receipt.getPrice()))
+        return "".join(parts)
 
-    @staticmethod
     def print_x_report(
-        cash_revenue: float, card_revenue: float, product_sales: Dict[str, int]
+        self,
+        cash_revenue: Money,
+        card_revenue: Money,
+        product_sales: Dict[str, int],
     ) -> None:
-        print("{:<15} | {:<10}".format("Product", "Units Sold"))
-        print("-" * 25)
+        self.output.write(
+            self.render_x_report(cash_revenue, card_revenue, product_sales)
+        )
 
+    def render_x_report(
+        self,
+        cash_revenue: Money,
+        card_revenue: Money,
+        product_sales: Dict[str, int],
+    ) -> str:
+        parts = [X_REPORT_HEADER]
         for product, units_sold in product_sales.items():
-            print("{:<15} | {:<10}".format(product, units_sold))
+            parts.append(X_REPORT_LINE.format(product, units_sold))
+        parts.append(
+            X_REPORT_FOOTER.format(
+                "Cash Revenue", cash_revenue, "Card Revenue", card_revenue
+            )
+        )
+        return "".join(parts)
 
-        print("-" * 25)
-        print("{:<15} ${:<10.2f}".format("Cash Revenue", cash_revenue))
-        print("{:<15} ${:<10.2f}".format("Card Revenue", card_revenue))
+    def flush(self) -> None:
+        self.output.flush()
 
-    @staticmethod
-    def print_items(item_repo: ItemRepository) -> None:
-        print("Items:")
-        for item in item_repo.get_all():
-            print(
+    # listings are streamed from the repositories and written batch_size lines
+    # per document, so printing a catalog of any size runs in constant memory
+    def print_items(self, item_repo: ItemRepository, batch_size: int = 1000) -> None:
+        self._print_listing(
+            "Items:",
+            (
                 f"ID: {item.getId()}, Name: {item.getName()}, Price: {item.getPrice()}"
-            )
-        print("-" * 50)
+                for item in item_repo.iter_all(batch_size)
+            ),
+            batch_size,
+        )
 
-    @staticmethod
-    def print_batches(batch_repo: BatchRepository) -> None:
-        print("Batches:")
-        for batch in batch_repo.get_all():
-            print(
+    def print_batches(
+        self, batch_repo: BatchRepository, batch_size: int = 1000
+    ) -> None:
+        self._print_listing(
+            "Batches:",
+            (
                 f"ID: {batch.getId()}, Name: {batch.getName()},"
                 f" Price : {batch.getPrice()}"
-            )
-        print("-" * 50)
-
-    @staticmethod
-    def print_discounts(discount_repo: DiscountRepository) -> None:
-        print("Discounts:")
-        for discount in discount_repo.get_all():
-            if isinstance(discount, PercentageDiscount):
-                print(
-                    f"ID: {discount.getId()}, Item ID: {discount.getItemId()},"
-                    f" Percentage: {discount.getValue()}"
-                )
-        print("-" * 50)
+                for batch in batch_repo.iter_all(batch_size)
+            ),
+            batch_size,
+        )
+
+    def print_discounts(
+        self, discount_repo: DiscountRepository, batch_size: int = 1000
+    ) -> None:
+        self._print_listing(
+            "Discounts:",
+            (
+                f"ID: {discount.getId()}, Item ID: {discount.getItemId()},"
+                f" Percentage: {discount.getValue()}"
+                for discount in discount_repo.iter_all(batch_size)
+                if isinstance(discount, PercentageDiscount)
+            ),
+            batch_size,
+        )
+
+    def _print_listing(self, title: str, lines: Iterable[str], batch_size: int) -> None:
+        self.output.write(title + "\n")
+        iterator = iter(lines)
+        while chunk := list(islice(iterator, batch_size)):
+            self.output.write("\n".join(chunk) + "\n")
+        self.output.write("-" * 50 + "\n")
 
 
 if __name__ == "__main__":
@@ -105,4 +262,4 @@ if __name__ == "__main__":
     receipt = Receipt(id=123, sellables=[milk, water_batch, water])
 
     # Print the receipt using the Printer class
-    Printer.print_receipt(receipt)
+    Printer().print_receipt(receipt)
@@ -1,17 +1,57 @@
+import math
 import sqlite3
-from dataclasses import dataclass
-from typing import List
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from queue import Empty, Queue
+from types import TracebackType
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Type
 
 import pytest
 
 from database import (
     BatchRepository,
+    DiscountObserver,
+    DiscountObservers,
     DiscountRepository,
     DoesNotExistError,
     ExistsError,
+    ItemIdentityMap,
     ItemRepository,
+    ReceiptJournal,
+    shared_identity_map,
 )
-from entities import Batch, Discount, Item, PercentageDiscount, Sellable
+from entities import (
+    Batch,
+    Discount,
+    Item,
+    Money,
+    PercentageDiscount,
+    Receipt,
+    Sellable,
+)
+
+
+# smallest SQLite integer, the keyset page of after_id=None starts above it
+MIN_ID = -(2**63)
+# bound parameters per IN (...) query, below SQLite's oldest default limit
+MAX_PARAMETERS = 500
+# bump together with a new step in SQLiteDBCreator.migrate
+SCHEMA_VERSION = 2
+
+
+@contextmanager
+def connect(
+    db_name: str, connection: Optional[sqlite3.Connection] = None
+) -> Iterator[sqlite3.Connection]:
+    # inside a unit of work the shared connection is used and left uncommitted,
+    # otherwise every call is its own transaction, committed on success
+    if connection is not None:
+        yield connection
+        return
+    with sqlite3.connect(db_name) as conn:
+        yield conn
 
 
 # Es yovelive rac sqllite-s ukavshirdeba sakmaod glexurad weria
@@ -30,7 +70,7 @@ class SQLiteDBCreator:
                 CREATE TABLE IF NOT EXISTS items (
                     item_id INTEGER PRIMARY KEY UNIQUE,
                     name TEXT NOT NULL,
-                    price REAL NOT NULL
+                    price INTEGER NOT NULL
                 )
             """
             )
@@ -47,6 +87,14 @@ class SQLiteDBCreator:
             """
             )
 
+            # Index discounts by item, get_item_discount runs for every scan
+            cursor.execute(
+                """
+                CREATE INDEX IF NOT EXISTS idx_discounts_item_id
+                ON discounts (item_id)
+            """
+            )
+
             # Create the 'batch_items' table
             cursor.execute(
                 """
@@ -60,67 +108,232 @@ class SQLiteDBCreator:
             """
             )
 
+            # Create the receipt journal tables
+            cursor.execute(
+                """
+                CREATE TABLE IF NOT EXISTS receipts (
+                    shift INTEGER NOT NULL,
+                    receipt_id INTEGER NOT NULL,
+                    payment_method TEXT NOT NULL,
+                    total INTEGER NOT NULL,
+                    PRIMARY KEY (shift, receipt_id)
+                )
+            """
+            )
+            cursor.execute(
+                """
+                CREATE TABLE IF NOT EXISTS receipt_items (
+                    shift INTEGER NOT NULL,
+                    receipt_id INTEGER NOT NULL,
+                    line_no INTEGER NOT NULL,
+                    item_id INTEGER NOT NULL,
+                    name TEXT NOT NULL,
+                    units INTEGER NOT NULL,
+                    total INTEGER NOT NULL,
+                    PRIMARY KEY (shift, receipt_id, line_no),
+                    FOREIGN KEY (shift, receipt_id)
+                        REFERENCES receipts (shift, receipt_id)
+                )
+            """
+            )
+
+            # Bookkeeping of migrate and of the db_init seeds
+            cursor.execute(
+                """
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    id INTEGER PRIMARY KEY CHECK (id = 0),
+                    version INTEGER NOT NULL
+                )
+            """
+            )
+            cursor.execute(
+                """
+                CREATE TABLE IF NOT EXISTS seed_checksums (
+                    seed TEXT PRIMARY KEY,
+                    checksum TEXT NOT NULL
+                )
+            """
+            )
+
     def drop_tables(self) -> None:
         with sqlite3.connect(self.db_name) as conn:
             cursor = conn.cursor()
             cursor.execute("DROP TABLE IF EXISTS items")
             cursor.execute("DROP TABLE IF EXISTS discounts")
             cursor.execute("DROP TABLE IF EXISTS batch_items")
+            cursor.execute("DROP TABLE IF EXISTS receipt_items")
+            cursor.execute("DROP TABLE IF EXISTS receipts")
+            cursor.execute("DROP TABLE IF EXISTS schema_version")
+            cursor.execute("DROP TABLE IF EXISTS seed_checksums")
+
+    def get_schema_version(self) -> int:
+        with sqlite3.connect(self.db_name) as conn:
+            try:
+                row = conn.execute("SELECT version FROM schema_version").fetchone()
+            except sqlite3.OperationalError:
+                return 0  # no schema_version table, a new or unversioned database
+            return int(row[0]) if row else 0
+
+    def migrate(self) -> bool:
+        # Brings the database to SCHEMA_VERSION and tells whether anything had to
+        # change; a current database is only read, so running it on every start
+        # is cheap
+        version = self.get_schema_version()
+        if version >= SCHEMA_VERSION:
+            return False
+
+        # version 1 is the create_tables schema, its statements are all
+        # IF NOT EXISTS, so a database from before versioning is adopted as is
+        self.create_tables()
+        with sqlite3.connect(self.db_name) as conn:
+            # the steps and the version bump commit together
+            conn.execute("BEGIN")
+            if version < 2:
+                self._store_prices_in_cents(conn)
+            conn.execute(
+                "INSERT OR REPLACE INTO schema_version (id, version) VALUES (0, ?)",
+                (SCHEMA_VERSION,),
+            )
+        return True
+
+    @staticmethod
+    def _store_prices_in_cents(conn: sqlite3.Connection) -> None:
+        # version 2: item prices are INTEGER cents, an adopted database from
+        # before it still has the old REAL column holding dollars
+        columns = {row[1]: row[2] for row in conn.execute("PRAGMA table_info(items)")}
+        if columns.get("price", "").upper() != "REAL":
+            return
+
+        # SQLite cannot change a column's type, so the table is rebuilt
+        conn.execute(
+            """
+            CREATE TABLE items_in_cents (
+                item_id INTEGER PRIMARY KEY UNIQUE,
+                name TEXT NOT NULL,
+                price INTEGER NOT NULL
+            )
+        """
+        )
+        conn.execute(
+            "INSERT INTO items_in_cents (item_id, name, price) "
+            "SELECT item_id, name, CAST(ROUND(price * 100) AS INTEGER) FROM items"
+        )
+        conn.execute("DROP TABLE items")
+        conn.execute("ALTER TABLE items_in_cents RENAME TO items")
 
 
+@dataclass
 class SQLiteItemRepository(ItemRepository):
     db_name: str = "pos.db"
+    version: int = 0
+    identity_map: ItemIdentityMap = field(
+        default_factory=shared_identity_map, repr=False, compare=False
+    )
+    # shared connection of an enclosing SQLiteUnitOfWork
+    connection: Optional[sqlite3.Connection] = field(
+        default=None, repr=False, compare=False
+    )
 
     def create(self, sellable: Item) -> None:
-        with sqlite3.connect(self.db_name) as conn:
+        with connect(self.db_name, self.connection) as conn:
             cursor = conn.cursor()
             try:
                 cursor.execute(
                     "INSERT INTO items (item_id, name, price) VALUES (?, ?, ?)",
-                    (sellable.getId(), sellable.getName(), sellable.getPrice()),
+                    (sellable.getId(), sellable.getName(), sellable.getPrice().cents),
+                )
+                self.version += 1
+            except sqlite3.IntegrityError:
+                raise ExistsError
+
+    def create_all(self, sellables: Iterable[Item]) -> None:
+        with connect(self.db_name, self.connection) as conn:
+            try:
+                conn.executemany(
+                    "INSERT INTO items (item_id, name, price) VALUES (?, ?, ?)",
+                    (
+                        (item.getId(), item.getName(), item.getPrice().cents)
+                        for item in sellables
+                    ),
                 )
-                conn.commit()
             except sqlite3.IntegrityError:
                 raise ExistsError
+            self.version += 1
 
     def read(self, sellable_id: int) -> Item:
-        with sqlite3.connect(self.db_name) as conn:
+        with connect(self.db_name, self.connection) as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT * FROM items WHERE item_id = ?", (sellable_id,))
             row = cursor.fetchone()
             if row:
-                return Item(id=row[0], name=row[1], price=row[2])
+                return self.identity_map.get(row[0], row[1], Money(row[2]))
             else:
                 raise DoesNotExistError
 
     def update(self, sellable: Item) -> None:
-        with sqlite3.connect(self.db_name) as conn:
+        with connect(self.db_name, self.connection) as conn:
             cursor = conn.cursor()
             cursor.execute(
                 "UPDATE items SET name=?, price=? WHERE item_id=?",
-                (sellable.getName(), sellable.getPrice(), sellable.getId()),
+                (sellable.getName(), sellable.getPrice().cents, sellable.getId()),
             )
-            conn.commit()
+            self.version += 1
+        self.identity_map.evict(sellable.getId())
 
     def delete(self, sellable_id: int) -> None:
-        with sqlite3.connect(self.db_name) as conn:
+        with connect(self.db_name, self.connection) as conn:
             cursor = conn.cursor()
             cursor.execute("DELETE FROM items WHERE item_id=?", (sellable_id,))
-            conn.commit()
+            self.version += 1
+        self.identity_map.evict(sellable_id)
 
     def get_all(self) -> List[Sellable]:
-        with sqlite3.connect(self.db_name) as conn:
+        with connect(self.db_name, self.connection) as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT * FROM items")
             rows = cursor.fetchall()
-            return [Item(id=row[0], name=row[1], price=row[2]) for row in rows]
+            return [
+                self.identity_map.get(row[0], row[1], Money(row[2])) for row in rows
+            ]
 
+    def iter_all(self, batch_size: int = 1000) -> Iterator[Sellable]:
+        # a single cursor read batch_size rows at a time, never the whole table
+        with connect(self.db_name, self.connection) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM items ORDER BY item_id")
+            while rows := cursor.fetchmany(batch_size):
+                for row in rows:
+                    yield self.identity_map.get(row[0], row[1], Money(row[2]))
+
+    def page(self, after_id: Optional[int] = None, limit: int = 100) -> List[Sellable]:
+        with connect(self.db_name, self.connection) as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT * FROM items WHERE item_id > ? ORDER BY item_id LIMIT ?",
+                (MIN_ID if after_id is None else after_id, limit),
+            )
+            return [
+                self.identity_map.get(row[0], row[1], Money(row[2]))
+                for row in cursor.fetchall()
+            ]
 
+    def get_version(self) -> int:
+        return self.version
+
+
+@dataclass
 class SQLiteDiscountRepository(DiscountRepository):
     db_name: str = "pos.db"
+    version: int = 0
+    observers: DiscountObservers = field(
+        default_factory=DiscountObservers, repr=False, compare=False
+    )
+    connection: Optional[sqlite3.Connection] = field(
+        default=None, repr=False, compare=False
+    )
 
     def create(self, discount: Discount) -> None:
-        with sqlite3.connect(self.db_name) as conn:
+        with connect(self.db_name, self.connection) as conn:
             cursor = conn.cursor()
             try:
                 cursor.execute(
@@ -128,12 +341,30 @@ class SQLiteDiscountRepository(DiscountRepository):
                     " VALUES (?, ?, ?)",
                     (discount.getId(), discount.getItemId(), discount.getValue()),
                 )
-                conn.commit()
+                self.version += 1
+            except sqlite3.IntegrityError:
+                raise ExistsError
+
+        self._notify(discount.getItemId())
+
+    def create_all(self, discounts: Iterable[Discount]) -> None:
+        rows = [(d.getId(), d.getItemId(), d.getValue()) for d in discounts]
+        with connect(self.db_name, self.connection) as conn:
+            try:
+                conn.executemany(
+                    "INSERT INTO discounts (discount_id, item_id, value)"
+                    " VALUES (?, ?, ?)",
+                    rows,
+                )
             except sqlite3.IntegrityError:
                 raise ExistsError
+            self.version += 1
+
+        for _, item_id, _ in rows:
+            self._notify(item_id)
 
     def read(self, discount_id: int) -> Discount:
-        with sqlite3.connect(self.db_name) as conn:
+        with connect(self.db_name, self.connection) as conn:
             cursor = conn.cursor()
             cursor.execute(
                 "SELECT * FROM discounts WHERE discount_id = ?", (discount_id,)
@@ -145,22 +376,31 @@ class SQLiteDiscountRepository(DiscountRepository):
                 raise DoesNotExistError
 
     def update(self, discount: Discount) -> None:
-        with sqlite3.connect(self.db_name) as conn:
+        with connect(self.db_name, self.connection) as conn:
             cursor = conn.cursor()
+            old_item_id = self._read_item_id(cursor, discount.getId())
             cursor.execute(
                 "UPDATE discounts SET item_id=?, value=? WHERE discount_id=?",
                 (discount.getItemId(), discount.getValue(), discount.getId()),
             )
-            conn.commit()
+            self.version += 1
+
+        if old_item_id is not None:
+            self._notify(old_item_id)
+        self._notify(discount.getItemId())
 
     def delete(self, discount_id: int) -> None:
-        with sqlite3.connect(self.db_name) as conn:
+        with connect(self.db_name, self.connection) as conn:
             cursor = conn.cursor()
+            old_item_id = self._read_item_id(cursor, discount_id)
             cursor.execute("DELETE FROM discounts WHERE discount_id=?", (discount_id,))
-            conn.commit()
+            self.version += 1
+
+        if old_item_id is not None:
+            self._notify(old_item_id)
 
     def get_item_discount(self, item_id: int) -> float:
-        with sqlite3.connect(self.db_name) as conn:
+        with connect(self.db_name, self.connection) as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT value FROM discounts WHERE item_id=?", (item_id,))
             row = cursor.fetchone()
@@ -169,8 +409,42 @@ class SQLiteDiscountRepository(DiscountRepository):
             else:
                 return 0.0
 
+    def get_item_discount_at(self, item_id: int, at: float) -> Tuple[float, float]:
+        return self.get_item_discount(item_id), math.inf
+
+    def get_item_discounts(self, item_ids: Iterable[int]) -> Dict[int, float]:
+        unique_ids = list(dict.fromkeys(item_ids))
+        discounts = dict.fromkeys(unique_ids, 0.0)
+        if not unique_ids:
+            return discounts
+
+        with connect(self.db_name, self.connection) as conn:
+            cursor = conn.cursor()
+            for start in range(0, len(unique_ids), MAX_PARAMETERS):
+                end = start + MAX_PARAMETERS
+                chunk = unique_ids[start:end]
+                placeholders = ", ".join("?" * len(chunk))
+                cursor.execute(
+                    "SELECT item_id, value FROM discounts "
+                    f"WHERE item_id IN ({placeholders})",
+                    chunk,
+                )
+                # like get_item_discount, the first discount of an item counts
+                resolved = set()
+                for item_id, value in cursor:
+                    if item_id not in resolved:
+                        resolved.add(item_id)
+                        discounts[item_id] = float(value) if value >= 0 else 0.0
+        return discounts
+
+    def get_item_discounts_at(
+        self, item_ids: Iterable[int], at: float
+    ) -> Dict[int, Tuple[float, float]]:
+        discounts = self.get_item_discounts(item_ids)
+        return {item_id: (value, math.inf) for item_id, value in discounts.items()}
+
     def get_all(self) -> List[Discount]:
-        with sqlite3.connect(self.db_name) as conn:
+        with connect(self.db_name, self.connection) as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT * FROM discounts")
             rows = cursor.fetchall()
@@ -179,13 +453,59 @@ class SQLiteDiscountRepository(DiscountRepository):
                 for row in rows
             ]
 
+    def iter_all(self, batch_size: int = 1000) -> Iterator[Discount]:
+        with connect(self.db_name, self.connection) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM discounts ORDER BY discount_id")
+            while rows := cursor.fetchmany(batch_size):
+                for row in rows:
+                    yield PercentageDiscount(
+                        id=row[0], item_id=row[1], percentage=row[2]
+                    )
+
+    def page(self, after_id: Optional[int] = None, limit: int = 100) -> List[Discount]:
+        with connect(self.db_name, self.connection) as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT * FROM discounts WHERE discount_id > ?"
+                " ORDER BY discount_id LIMIT ?",
+                (MIN_ID if after_id is None else after_id, limit),
+            )
+            return [
+                PercentageDiscount(id=row[0], item_id=row[1], percentage=row[2])
+                for row in cursor.fetchall()
+            ]
+
+    def get_version(self) -> int:
+        return self.version
+
+    def add_observer(self, observer: DiscountObserver) -> None:
+        self.observers.add(observer)
+
+    def _read_item_id(self, cursor: sqlite3.Cursor, discount_id: int) -> Optional[int]:
+        cursor.execute(
+            "SELECT item_id FROM discounts WHERE discount_id=?", (discount_id,)
+        )
+        row = cursor.fetchone()
+        return int(row[0]) if row else None
+
+    def _notify(self, item_id: int) -> None:
+        self.observers.notify(item_id)
+
 
 @dataclass
 class SQLiteBatchRepository(BatchRepository):
     db_name: str = "pos.db"
+    version: int = 0
+    identity_map: ItemIdentityMap = field(
+        default_factory=shared_identity_map, repr=False, compare=False
+    )
+    connection: Optional[sqlite3.Connection] = field(
+        default=None, repr=False, compare=False
+    )
 
     def create(self, batch: Batch) -> None:
-        with sqlite3.connect(self.db_name) as conn:
+        with connect(self.db_name, self.connection) as conn:
             cursor = conn.cursor()
             try:
                 cursor.execute(
@@ -193,12 +513,27 @@ class SQLiteBatchRepository(BatchRepository):
                     " VALUES (?, ?, ?)",
                     (batch.getId(), batch.getItem().getId(), batch.getAmount()),
                 )
-                conn.commit()
+                self.version += 1
+            except sqlite3.IntegrityError:
+                raise ExistsError
+
+    def create_all(self, batches: Iterable[Batch]) -> None:
+        with connect(self.db_name, self.connection) as conn:
+            try:
+                conn.executemany(
+                    "INSERT INTO batch_items (batch_id, item_id, amount)"
+                    " VALUES (?, ?, ?)",
+                    (
+                        (batch.getId(), batch.getItem().getId(), batch.getAmount())
+                        for batch in batches
+                    ),
+                )
             except sqlite3.IntegrityError:
                 raise ExistsError
+            self.version += 1
 
     def read(self, batch_id: int) -> Batch:
-        with sqlite3.connect(self.db_name) as conn:
+        with connect(self.db_name, self.connection) as conn:
             cursor = conn.cursor()
             cursor.execute(
                 """
@@ -214,15 +549,10 @@ class SQLiteBatchRepository(BatchRepository):
             if not result:
                 raise DoesNotExistError
 
-            batch_data = result[0]
-            item_data = batch_data[2:5]
-            item = Item(*item_data)
-            batch = Batch(batch_data[0], batch_data[1], item)
-
-            return batch
+            return self._to_batch(result[0])
 
     def update(self, batch: Batch) -> None:
-        with sqlite3.connect(self.db_name) as conn:
+        with connect(self.db_name, self.connection) as conn:
             cursor = conn.cursor()
             cursor.execute(
                 "UPDATE batch_items SET amount = ? WHERE batch_id = ? AND item_id = ?",
@@ -230,18 +560,18 @@ class SQLiteBatchRepository(BatchRepository):
             )
             if cursor.rowcount == 0:
                 raise DoesNotExistError
-            conn.commit()
+            self.version += 1
 
     def delete(self, batch_id: int) -> None:
-        with sqlite3.connect(self.db_name) as conn:
+        with connect(self.db_name, self.connection) as conn:
             cursor = conn.cursor()
             cursor.execute("DELETE FROM batch_items WHERE batch_id = ?", (batch_id,))
             if cursor.rowcount == 0:
                 raise DoesNotExistError
-            conn.commit()
+            self.version += 1
 
     def get_all(self) -> List[Sellable]:
-        with sqlite3.connect(self.db_name) as conn:
+        with connect(self.db_name, self.connection) as conn:
             cursor = conn.cursor()
             cursor.execute(
                 """
@@ -252,14 +582,294 @@ class SQLiteBatchRepository(BatchRepository):
             )
             result = cursor.fetchall()
 
-            batches: List[Sellable] = []
-            for batch_data in result:
-                item_data = batch_data[2:5]
-                item = Item(*item_data)
-                batch = Batch(batch_data[0], batch_data[1], item)
-                batches.append(batch)
+            return [self._to_batch(batch_data) for batch_data in result]
 
-            return batches
+    def iter_all(self, batch_size: int = 1000) -> Iterator[Sellable]:
+        with connect(self.db_name, self.connection) as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                SELECT bi.batch_id, bi.amount, i.item_id, i.name, i.price
+                FROM batch_items bi
+                JOIN items i ON bi.item_id = i.item_id
+                ORDER BY bi.batch_id
+                """
+            )
+            while rows := cursor.fetchmany(batch_size):
+                for row in rows:
+                    yield self._to_batch(row)
+
+    def page(self, after_id: Optional[int] = None, limit: int = 100) -> List[Sellable]:
+        with connect(self.db_name, self.connection) as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                SELECT bi.batch_id, bi.amount, i.item_id, i.name, i.price
+                FROM batch_items bi
+                JOIN items i ON bi.item_id = i.item_id
+                WHERE bi.batch_id > ?
+                ORDER BY bi.batch_id
+                LIMIT ?
+                """,
+                (MIN_ID if after_id is None else after_id, limit),
+            )
+            return [self._to_batch(row) for row in cursor.fetchall()]
+
+    def _to_batch(self, row: Tuple[int, int, int, str, int]) -> Batch:
+        item = self.identity_map.get(row[2], row[3], Money(row[4]))
+        return Batch(row[0], row[1], item)
+
+    def get_version(self) -> int:
+        return self.version
+
+
+# Hands the item, discount and batch repositories one shared connection, so all
+# changes made through them form a single transaction, committed once when the
+# block exits and rolled back if it raises.
+# It is meant for seeding: its repositories are its own, so its writes neither
+# bump the versions of live repositories nor notify their discount observers.
+# Seed before building the repositories and caches the store runs on.
+@dataclass
+class SQLiteUnitOfWork:
+    db_name: str = "pos.db"
+    identity_map: ItemIdentityMap = field(
+        default_factory=shared_identity_map, repr=False
+    )
+    connection: Optional[sqlite3.Connection] = field(default=None, repr=False)
+    items: SQLiteItemRepository = field(init=False, repr=False)
+    discounts: SQLiteDiscountRepository = field(init=False, repr=False)
+    batches: SQLiteBatchRepository = field(init=False, repr=False)
+
+    def __enter__(self) -> "SQLiteUnitOfWork":
+        self.connection = sqlite3.connect(self.db_name)
+        self.items = SQLiteItemRepository(
+            self.db_name, identity_map=self.identity_map, connection=self.connection
+        )
+        self.discounts = SQLiteDiscountRepository(
+            self.db_name, connection=self.connection
+        )
+        self.batches = SQLiteBatchRepository(
+            self.db_name, identity_map=self.identity_map, connection=self.connection
+        )
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        connection = self._active_connection()
+        try:
+            if exc_type is None:
+                connection.commit()
+            else:
+                connection.rollback()
+        finally:
+            connection.close()
+            self.connection = None
+
+    def _active_connection(self) -> sqlite3.Connection:
+        if self.connection is None:
+            raise RuntimeError("unit of work is not active")
+        return self.connection
+
+    def commit(self) -> None:
+        self._active_connection().commit()
+
+    def get_seed_checksum(self, seed: str) -> Optional[str]:
+        row = self._active_connection().execute(
+            "SELECT checksum FROM seed_checksums WHERE seed=?", (seed,)
+        ).fetchone()
+        return str(row[0]) if row else None
+
+    def record_seed_checksum(self, seed: str, checksum: str) -> None:
+        self._active_connection().execute(
+            "INSERT OR REPLACE INTO seed_checksums (seed, checksum) VALUES (?, ?)",
+            (seed, checksum),
+        )
+
+
+# money columns hold integer cents
+ReceiptRow = Tuple[int, int, str, int]
+ReceiptItemRow = Tuple[int, int, int, int, str, int, int]
+
+
+# Closed receipts are handed to a background writer thread which commits them in
+# groups (every group_size receipts or group_interval seconds), so checkout never
+# waits for the disk. flush() blocks until everything recorded so far is durable.
+# A group that fails is written again receipt by receipt, so only the receipts
+# that fail themselves are kept in failed, and flush() raises their last error.
+@dataclass
+class SQLiteReceiptJournal(ReceiptJournal):
+    db_name: str = "pos.db"
+    group_size: int = 100
+    group_interval: float = 0.05
+    shift: int = 0
+    queue: "Queue[Any]" = field(default_factory=Queue, repr=False)
+    writer: Optional[threading.Thread] = field(default=None, repr=False)
+    error: Optional[Exception] = field(default=None, repr=False)
+    failed: List[Tuple[ReceiptRow, List[ReceiptItemRow]]] = field(
+        default_factory=list, repr=False
+    )
+
+    def record(self, receipt: Receipt) -> None:
+        if self.writer is None:
+            self._start()
+
+        receipt_id = receipt.getId()
+        lines: List[ReceiptItemRow] = []
+        for line_no, (sellable, quantity) in enumerate(receipt.lines()):
+            item_id, name, units = sellable.getId(), sellable.getName(), quantity
+            if isinstance(sellable, Batch):
+                item = sellable.getItem()
+                item_id, name = item.getId(), item.getName()
+                units = sellable.amount * quantity
+            lines.append(
+                (
+                    self.shift,
+                    receipt_id,
+                    line_no,
+                    item_id,
+                    name,
+                    units,
+                    sellable.getPrice().cents * quantity,
+                )
+            )
+
+        header: ReceiptRow = (
+            self.shift,
+            receipt_id,
+            receipt.get_payment_method(),
+            receipt.getPrice().cents,
+        )
+        self.queue.put((header, lines))
+
+    def flush(self) -> None:
+        if self.writer is not None:
+            done = threading.Event()
+            self.queue.put(done)
+            done.wait()
+
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def end_shift(self) -> None:
+        self.flush()
+        self.shift += 1
+
+    def close(self) -> None:
+        if self.writer is None:
+            return
+
+        self.flush()
+        self.queue.put(None)
+        self.writer.join()
+        self.writer = None
+
+    def _start(self) -> None:
+        # continue shift numbering of receipts already in the journal
+        with sqlite3.connect(self.db_name) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT MAX(shift) FROM receipts")
+            row = cursor.fetchone()
+            if row and row[0] is not None:
+                self.shift = max(self.shift, row[0] + 1)
+
+        self.writer = threading.Thread(target=self._write, daemon=True)
+        self.writer.start()
+
+    def _write(self) -> None:
+        pending: List[Tuple[ReceiptRow, List[ReceiptItemRow]]] = []
+        try:
+            conn = sqlite3.connect(self.db_name)
+            try:
+                self._write_groups(conn, pending)
+            finally:
+                conn.close()
+        except Exception as error:
+            # the writer cannot go on, what it still gets is kept as failed and
+            # flushes keep returning, so no caller waits forever
+            self.error = error
+            self.failed.extend(pending)
+            while True:
+                entry = self.queue.get()
+                if entry is None:
+                    return
+                if isinstance(entry, threading.Event):
+                    entry.set()
+                else:
+                    self.failed.append(entry)
+
+    def _write_groups(
+        self,
+        conn: sqlite3.Connection,
+        pending: List[Tuple[ReceiptRow, List[ReceiptItemRow]]],
+    ) -> None:
+        deadline = 0.0
+        while True:
+            timeout = max(deadline - time.monotonic(), 0) if pending else None
+            try:
+                entry = self.queue.get(timeout=timeout)
+            except Empty:
+                self._commit(conn, pending)
+                continue
+
+            if entry is None:
+                self._commit(conn, pending)
+                return
+
+            if isinstance(entry, threading.Event):
+                try:
+                    self._commit(conn, pending)
+                finally:
+                    entry.set()
+                continue
+
+            if not pending:
+                deadline = time.monotonic() + self.group_interval
+            pending.append(entry)
+            if len(pending) >= self.group_size:
+                self._commit(conn, pending)
+
+    def _commit(
+        self,
+        conn: sqlite3.Connection,
+        pending: List[Tuple[ReceiptRow, List[ReceiptItemRow]]],
+    ) -> None:
+        if not pending:
+            return
+
+        try:
+            self._insert(conn, pending)
+        except sqlite3.Error:
+            # one bad receipt must not take the rest of its group with it
+            for entry in pending:
+                try:
+                    self._insert(conn, [entry])
+                except sqlite3.Error as error:
+                    self.error = error
+                    self.failed.append(entry)
+        pending.clear()
+
+    @staticmethod
+    def _insert(
+        conn: sqlite3.Connection,
+        entries: List[Tuple[ReceiptRow, List[ReceiptItemRow]]],
+    ) -> None:
+        with conn:
+            conn.executemany(
+                "INSERT INTO receipts (shift, receipt_id, payment_method, total)"
+                " VALUES (?, ?, ?, ?)",
+                [header for header, _ in entries],
+            )
+            conn.executemany(
+                "INSERT INTO receipt_items"
+                " (shift, receipt_id, line_no, item_id, name, units, total)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [line for _, lines in entries for line in lines],
+            )
 
 
 def test_sqlite_item_repository() -> None:
@@ -356,6 +966,13 @@ def test_sqlite_discount_repository() -> None:
     retrieved_item_discount = discount_repository.get_item_discount(test_item_id)
     assert retrieved_item_discount == test_discount_value
 
+    # Test get_item_discounts, items without a discount resolve to 0
+    item_ids = list(range(2 * MAX_PARAMETERS))
+    retrieved_item_discounts = discount_repository.get_item_discounts(item_ids)
+    assert len(retrieved_item_discounts) == len(item_ids)
+    assert retrieved_item_discounts[test_item_id] == test_discount_value
+    assert retrieved_item_discounts[MAX_PARAMETERS + 1] == 0.0
+
     # Test does not exist error
     with pytest.raises(DoesNotExistError):
         discount_repository.read(100)
@@ -410,3 +1027,131 @@ def test_sqlite_batch_repository() -> None:
     # Test does not exist error
     with pytest.raises(DoesNotExistError):
         batch_repository.read(100)
+
+
+def test_sqlite_db_creator_migrates_once() -> None:
+    db_creator = SQLiteDBCreator()
+    db_creator.drop_tables()
+    assert db_creator.get_schema_version() == 0
+
+    assert db_creator.migrate()
+    assert not db_creator.migrate()
+    assert db_creator.get_schema_version() == SCHEMA_VERSION
+
+    with SQLiteUnitOfWork() as unit_of_work:
+        assert unit_of_work.get_seed_checksum("items") is None
+        unit_of_work.record_seed_checksum("items", "abc")
+    with SQLiteUnitOfWork() as unit_of_work:
+        assert unit_of_work.get_seed_checksum("items") == "abc"
+
+
+def test_sqlite_repositories_page_and_stream() -> None:
+    db_creator = SQLiteDBCreator()
+    db_creator.drop_tables()
+    db_creator.create_tables()
+
+    item_repository = SQLiteItemRepository()
+    batch_repository = SQLiteBatchRepository()
+    discount_repository = SQLiteDiscountRepository()
+    items = [Item(id=i, name=f"Item {i}", price=1.0) for i in range(1, 6)]
+    for item in items:
+        item_repository.create(item)
+        batch_repository.create(Batch(id=item.getId(), amount=2, item_type=item))
+        discount_repository.create(
+            PercentageDiscount(id=item.getId(), item_id=item.getId(), percentage=0.1)
+        )
+
+    assert item_repository.page(limit=2) == items[:2]
+    assert item_repository.page(after_id=2, limit=2) == items[2:4]
+    assert item_repository.page(after_id=5) == []
+    assert list(item_repository.iter_all(batch_size=2)) == items
+    assert [batch.getId() for batch in batch_repository.page(after_id=3)] == [4, 5]
+    assert len(list(batch_repository.iter_all(batch_size=2))) == 5
+    assert [d.getId() for d in discount_repository.page(after_id=1, limit=1)] == [2]
+    assert list(discount_repository.iter_all()) == discount_repository.get_all()
+
+
+def test_sqlite_repositories_share_items() -> None:
+    db_creator = SQLiteDBCreator()
+    db_creator.drop_tables()
+    db_creator.create_tables()
+
+    identity_map = ItemIdentityMap()
+    item_repository = SQLiteItemRepository(identity_map=identity_map)
+    batch_repository = SQLiteBatchRepository(identity_map=identity_map)
+    item_repository.create(Item(id=1, name="Test Item", price=10.0))
+    batch_repository.create(Batch(id=1, amount=5, item_type=item_repository.read(1)))
+
+    item = item_repository.read(1)
+    assert batch_repository.read(1).item_type is item
+    assert batch_repository.get_all()[0].getItem() is item  # type: ignore
+    assert item_repository.get_all()[0] is item
+
+    item_repository.update(Item(id=1, name="Test Item", price=12.0))
+    updated_item = item_repository.read(1)
+    assert updated_item is not item
+    assert item.getPrice() == 10.0
+    assert batch_repository.read(1).item_type is updated_item
+
+
+def test_sqlite_unit_of_work() -> None:
+    db_creator = SQLiteDBCreator()
+    db_creator.drop_tables()
+    db_creator.create_tables()
+
+    item = Item(id=1, name="Test Item", price=10.0)
+    with SQLiteUnitOfWork() as unit_of_work:
+        unit_of_work.items.create_all([item, Item(id=2, name="Other", price=5.0)])
+        unit_of_work.batches.create_all([Batch(id=1, amount=3, item_type=item)])
+        unit_of_work.discounts.create_all(
+            [PercentageDiscount(id=1, item_id=1, percentage=0.1)]
+        )
+        # not visible to other connections before the block commits
+        assert SQLiteItemRepository().get_all() == []
+
+    assert len(SQLiteItemRepository().get_all()) == 2
+    assert SQLiteBatchRepository().read(1).getAmount() == 3
+    assert SQLiteDiscountRepository().get_item_discount(1) == 0.1
+
+    with pytest.raises(ExistsError):
+        with SQLiteUnitOfWork() as unit_of_work:
+            unit_of_work.items.create(Item(id=3, name="Third", price=1.0))
+            unit_of_work.items.create(Item(id=1, name="Test Item", price=10.0))
+    with pytest.raises(DoesNotExistError):
+        SQLiteItemRepository().read(3)
+
+    with pytest.raises(RuntimeError, match="not active"):
+        unit_of_work.commit()
+
+
+def test_sqlite_receipt_journal() -> None:
+    db_creator = SQLiteDBCreator()
+    db_creator.drop_tables()
+    db_creator.create_tables()
+    # Arrange
+    journal = SQLiteReceiptJournal(group_size=2, group_interval=10)
+    milk = Item(id=1, name="Milk", price=2.0)
+    receipt = Receipt(id=1, payment_method="card", sellables=[milk, Batch(2, 3, milk)])
+
+    # Act
+    journal.record(receipt)
+    journal.end_shift()
+    journal.record(receipt)
+    journal.close()
+
+    # Assert
+    with sqlite3.connect(db_creator.db_name) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM receipts ORDER BY shift")
+        assert cursor.fetchall() == [(0, 1, "card", 800), (1, 1, "card", 800)]
+        cursor.execute("SELECT * FROM receipt_items WHERE shift = 0")
+        assert cursor.fetchall() == [
+            (0, 1, 0, 1, "Milk", 1, 200),
+            (0, 1, 1, 1, "Milk", 3, 600),
+        ]
+
+    # A new journal continues the shift numbering
+    journal = SQLiteReceiptJournal()
+    journal.record(receipt)
+    journal.close()
+    assert journal.shift == 2
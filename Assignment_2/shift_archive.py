@@ -0,0 +1,273 @@
+from __future__ import annotations
+
+import json
+import math
+import os
+import time
+from array import array
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from database import ReceiptJournal
+from entities import Receipt
+from shift_store import ColumnarShiftStore
+
+try:
+    import numpy as np
+except ImportError:  # only the archive needs numpy, the register runs without it
+    np = None  # type: ignore[assignment, unused-ignore]
+
+# Closed shifts are archived as one directory per shift, holding the columns of
+# the shift's ColumnarShiftStore plus the closing time of every receipt packed
+# one after another into a single int64 columns.npy, and a meta.json with the
+# shift's dictionaries and time span. A shift is small, so it is read whole
+# rather than memory-mapped: loading one costs two file opens and keeps no file
+# open, however many shifts the archive holds. Queries aggregate the columns
+# with numpy group-bys (bincount over dictionary codes).
+
+RECEIPT_COLUMNS = ("ids", "line_starts", "totals", "payments")
+LINE_COLUMNS = ("item_ids", "quantities", "unit_cents", "discount_bp", "name_codes")
+PACKED_COLUMNS = RECEIPT_COLUMNS + LINE_COLUMNS + ("closed_at",)
+PARTITION_PREFIX = "shift_"
+
+
+def require_numpy() -> None:
+    if np is None:
+        raise ImportError("the shift archive needs numpy, pip install numpy")
+
+
+def column_spans(receipts: int, lines: int) -> Iterator[Tuple[str, int, int]]:
+    # where every column sits in a partition's packed array
+    start = 0
+    for column in PACKED_COLUMNS:
+        end = start + (lines if column in LINE_COLUMNS else receipts)
+        yield column, start, end
+        start = end
+
+
+# receipt journal that archives every shift when it ends, or when it is closed
+@dataclass
+class ShiftArchiveJournal(ReceiptJournal):
+    directory: str = "shift_archive"
+    clock: Callable[[], float] = field(default=time.time, repr=False)
+    store: ColumnarShiftStore = field(default_factory=ColumnarShiftStore, repr=False)
+    closed_at: "array[float]" = field(default_factory=lambda: array("d"), repr=False)
+    next_shift: Optional[int] = None
+
+    def __post_init__(self) -> None:
+        require_numpy()
+
+    def record(self, receipt: Receipt) -> None:
+        self.store.append(receipt)
+        self.closed_at.append(self.clock())
+
+    def flush(self) -> None:
+        pass  # only complete shifts are archived
+
+    def end_shift(self) -> None:
+        if len(self.store):
+            self._write_partition()
+        self.store.clear()
+        self.closed_at = array("d")
+
+    def close(self) -> None:
+        self.end_shift()
+
+    def _write_partition(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        if self.next_shift is None:
+            # continue after shifts archived by earlier runs
+            self.next_shift = len(partition_names(self.directory))
+        shift = self.next_shift
+        self.next_shift += 1
+
+        columns = self.store.columns
+        name = f"{PARTITION_PREFIX}{shift:06d}"
+        staging = os.path.join(self.directory, f".{name}.tmp")
+        os.makedirs(staging, exist_ok=True)
+        packed = [
+            np.asarray(getattr(columns, column), dtype=np.int64)
+            for column in RECEIPT_COLUMNS + LINE_COLUMNS
+        ]
+        # closing times keep their float64 bits
+        packed.append(np.asarray(self.closed_at, dtype=np.float64).view(np.int64))
+        np.save(os.path.join(staging, "columns.npy"), np.concatenate(packed))
+        meta = {
+            "shift": shift,
+            "receipts": len(columns.ids),
+            "lines": len(columns.item_ids),
+            "start": min(self.closed_at),
+            "end": max(self.closed_at),
+            "names": columns.names,
+            "payment_methods": columns.payment_methods,
+        }
+        with open(os.path.join(staging, "meta.json"), "w") as meta_file:
+            json.dump(meta, meta_file)
+        # readers only ever see complete partitions
+        os.replace(staging, os.path.join(self.directory, name))
+
+
+def partition_names(directory: str) -> List[str]:
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        name for name in os.listdir(directory) if name.startswith(PARTITION_PREFIX)
+    )
+
+
+@dataclass
+class ShiftPartition:
+    meta: Dict[str, Any]
+    columns: Dict[str, Any]
+    # archive-wide codes of the partition's product names and payment methods
+    name_codes: Any
+    payment_codes: Any
+    # receipt row of every line
+    line_receipts: Any
+
+    def overlaps(self, start: float, end: float) -> bool:
+        return bool(self.meta["start"] < end and self.meta["end"] >= start)
+
+    def receipt_mask(self, start: float, end: float) -> Any:
+        closed_at = self.columns["closed_at"]
+        return (closed_at >= start) & (closed_at < end)
+
+
+# Read side of the archive, partitions are loaded once and then kept in memory.
+# Product names and payment methods are re-coded into archive-wide
+# dictionaries, so every query is a bincount over one code space.
+@dataclass
+class ShiftArchive:
+    directory: str = "shift_archive"
+    partitions: Dict[str, ShiftPartition] = field(default_factory=dict, repr=False)
+    names: List[str] = field(default_factory=list, repr=False)
+    name_index: Dict[str, int] = field(default_factory=dict, repr=False)
+    payment_methods: List[str] = field(default_factory=list, repr=False)
+    payment_index: Dict[str, int] = field(default_factory=dict, repr=False)
+
+    def __post_init__(self) -> None:
+        require_numpy()
+
+    def refresh(self) -> None:
+        for name in partition_names(self.directory):
+            if name not in self.partitions:
+                self.partitions[name] = self._load(name)
+
+    def top_products(
+        self, n: int = 10, start: float = -math.inf, end: float = math.inf
+    ) -> List[Tuple[str, int]]:
+        # products by units sold
+        units = np.zeros(0, dtype=np.int64)
+        for partition, receipts in self._select(start, end):
+            lines = receipts[partition.line_receipts]
+            sold = np.bincount(
+                partition.name_codes[partition.columns["name_codes"][lines]],
+                weights=partition.columns["quantities"][lines],
+                minlength=len(self.names),
+            ).astype(np.int64)
+            units = _accumulate(units, sold)
+        return self._top(units, n)
+
+    def revenue_by_payment(
+        self, start: float = -math.inf, end: float = math.inf
+    ) -> Dict[str, int]:
+        # cents per payment method of the receipts closed in [start, end)
+        revenue = np.zeros(0, dtype=np.int64)
+        for partition, receipts in self._select(start, end):
+            cents = np.bincount(
+                partition.payment_codes[partition.columns["payments"][receipts]],
+                weights=partition.columns["totals"][receipts],
+                minlength=len(self.payment_methods),
+            ).astype(np.int64)
+            revenue = _accumulate(revenue, cents)
+        return {
+            method: int(cents)
+            for method, cents in zip(self.payment_methods, revenue)
+            if cents
+        }
+
+    def bought_with(
+        self,
+        product: str,
+        n: int = 10,
+        start: float = -math.inf,
+        end: float = math.inf,
+    ) -> List[Tuple[str, int]]:
+        # products by the number of baskets they share with product
+        baskets = np.zeros(0, dtype=np.int64)
+        for partition, receipts in self._select(start, end):
+            local_code = _index_of(partition.meta["names"], product)
+            if local_code is None:
+                continue
+            codes = partition.columns["name_codes"]
+            rows = partition.line_receipts
+            with_product = np.zeros(len(receipts), dtype=bool)
+            with_product[rows[(codes == local_code) & receipts[rows]]] = True
+            others = with_product[rows] & (codes != local_code)
+            # a basket counts once per product, however many lines it has
+            pairs = np.unique(rows[others] * len(partition.name_codes) + codes[others])
+            shared = np.bincount(
+                partition.name_codes[pairs % len(partition.name_codes)],
+                minlength=len(self.names),
+            )
+            baskets = _accumulate(baskets, shared)
+        return self._top(baskets, n)
+
+    def _select(self, start: float, end: float) -> Iterator[Tuple[ShiftPartition, Any]]:
+        self.refresh()
+        for name in sorted(self.partitions):
+            partition = self.partitions[name]
+            if partition.overlaps(start, end):
+                yield partition, partition.receipt_mask(start, end)
+
+    def _top(self, counts: Any, n: int) -> List[Tuple[str, int]]:
+        # stable, so ties keep the order products were first archived in
+        order = np.argsort(-counts, kind="stable")[:n]
+        return [(self.names[code], int(counts[code])) for code in order if counts[code]]
+
+    def _load(self, name: str) -> ShiftPartition:
+        path = os.path.join(self.directory, name)
+        with open(os.path.join(path, "meta.json")) as meta_file:
+            meta = json.load(meta_file)
+        packed = np.load(os.path.join(path, "columns.npy"))
+        columns = {
+            column: packed[start:end]
+            for column, start, end in column_spans(meta["receipts"], meta["lines"])
+        }
+        columns["closed_at"] = columns["closed_at"].view(np.float64)
+        line_counts = np.diff(np.append(columns["line_starts"], meta["lines"]))
+        return ShiftPartition(
+            meta,
+            columns,
+            self._codes(meta["names"], self.names, self.name_index),
+            self._codes(
+                meta["payment_methods"], self.payment_methods, self.payment_index
+            ),
+            np.repeat(np.arange(meta["receipts"]), line_counts),
+        )
+
+    @staticmethod
+    def _codes(values: List[str], dictionary: List[str], index: Dict[str, int]) -> Any:
+        codes = []
+        for value in values:
+            code = index.get(value)
+            if code is None:
+                code = index[value] = len(dictionary)
+                dictionary.append(value)
+            codes.append(code)
+        return np.array(codes, dtype=np.int64)
+
+
+def _accumulate(total: Any, part: Any) -> Any:
+    # the archive-wide dictionaries only grow, so later parts can be longer
+    if len(part) > len(total):
+        total = np.pad(total, (0, len(part) - len(total)))
+    total[: len(part)] += part
+    return total
+
+
+def _index_of(values: List[str], value: str) -> Optional[int]:
+    try:
+        return values.index(value)
+    except ValueError:
+        return None
@@ -0,0 +1,237 @@
+from __future__ import annotations
+
+from array import array
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Sequence, Union, overload
+
+from entities import (
+    BASIS_POINTS,
+    Batch,
+    DiscountStrategy,
+    Item,
+    Money,
+    NoDiscount,
+    PercentageDiscountStrategy,
+    Receipt,
+    ReceiptDiscountStrategy,
+    Sellable,
+)
+
+# Closed receipts of a shift are encoded as rows of parallel typed arrays
+# instead of Receipt objects. Every receipt line is one row of the line columns,
+# every receipt one row of the receipt columns; product names and payment
+# methods are dictionary encoded. Columns are only ever appended to, and clear
+# starts new arrays, so a snapshot can share them without copying.
+
+NO_BATCH = -1
+
+
+def discount_basis_points(strategy: DiscountStrategy) -> Optional[int]:
+    # None for strategies that cannot be expressed as a flat percentage
+    if isinstance(strategy, NoDiscount):
+        return 0
+    if isinstance(strategy, PercentageDiscountStrategy):
+        return round(strategy.percentage * BASIS_POINTS)
+    if isinstance(strategy, ReceiptDiscountStrategy):
+        if strategy.isPrime(strategy.customer_id):
+            return round(strategy.percentage * BASIS_POINTS)
+        return 0
+    return None
+
+
+def discount_strategy(basis_points: int) -> DiscountStrategy:
+    if basis_points == 0:
+        return NoDiscount()
+    return PercentageDiscountStrategy(basis_points / BASIS_POINTS)
+
+
+@dataclass
+class ShiftColumns:
+    # line columns
+    receipt_ids: "array[int]" = field(default_factory=lambda: array("q"))
+    item_ids: "array[int]" = field(default_factory=lambda: array("q"))
+    batch_ids: "array[int]" = field(default_factory=lambda: array("q"))
+    quantities: "array[int]" = field(default_factory=lambda: array("q"))
+    unit_cents: "array[int]" = field(default_factory=lambda: array("q"))
+    discount_bp: "array[int]" = field(default_factory=lambda: array("l"))
+    payment_codes: "array[int]" = field(default_factory=lambda: array("b"))
+    name_codes: "array[int]" = field(default_factory=lambda: array("l"))
+    # receipt columns, line_starts[i] is the first line row of receipt i
+    ids: "array[int]" = field(default_factory=lambda: array("q"))
+    line_starts: "array[int]" = field(default_factory=lambda: array("q"))
+    totals: "array[int]" = field(default_factory=lambda: array("q"))
+    payments: "array[int]" = field(default_factory=lambda: array("b"))
+    # receipt-wide discount, strategies that are not a flat percentage only
+    # show up in the total
+    receipt_bp: "array[int]" = field(default_factory=lambda: array("l"))
+    # dictionaries, shared by every snapshot of the shift
+    names: List[str] = field(default_factory=list)
+    payment_methods: List[str] = field(default_factory=list)
+
+
+# read-only view of the first receipt_cnt receipts of a shift, usable wherever a
+# sequence of receipts is expected
+@dataclass(frozen=True)
+class ShiftSnapshot(Sequence[Receipt]):
+    columns: ShiftColumns
+    receipt_cnt: int
+    line_cnt: int
+
+    def __len__(self) -> int:
+        return self.receipt_cnt
+
+    @overload
+    def __getitem__(self, index: int) -> Receipt:
+        pass
+
+    @overload
+    def __getitem__(self, index: slice) -> Sequence[Receipt]:
+        pass
+
+    def __getitem__(
+        self, index: Union[int, slice]
+    ) -> Union[Receipt, Sequence[Receipt]]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.receipt_cnt))]
+        if index < 0:
+            index += self.receipt_cnt
+        if not 0 <= index < self.receipt_cnt:
+            raise IndexError(index)
+        return self._build_receipt(index)
+
+    def __iter__(self) -> Iterator[Receipt]:
+        for index in range(self.receipt_cnt):
+            yield self._build_receipt(index)
+
+    def get_revenue(self) -> Dict[str, int]:
+        # cents per payment method
+        columns = self.columns
+        totals = [0] * len(columns.payment_methods)
+        for code, cents in islice(
+            zip(columns.payments, columns.totals), self.receipt_cnt
+        ):
+            totals[code] += cents
+        return dict(zip(columns.payment_methods, totals))
+
+    def get_product_sales(self) -> Dict[str, int]:
+        columns = self.columns
+        units = [0] * len(columns.names)
+        for code, quantity in islice(
+            zip(columns.name_codes, columns.quantities), self.line_cnt
+        ):
+            units[code] += quantity
+        # names in order of first sale, like the receipt-by-receipt analysis
+        return {name: sold for name, sold in zip(columns.names, units) if sold}
+
+    def _build_receipt(self, index: int) -> Receipt:
+        columns = self.columns
+        start = columns.line_starts[index]
+        end = (
+            columns.line_starts[index + 1]
+            if index + 1 < self.receipt_cnt
+            else self.line_cnt
+        )
+        sellables: List[Sellable] = []
+        quantities: List[int] = []
+        for line in range(start, end):
+            item = Item(
+                columns.item_ids[line],
+                columns.names[columns.name_codes[line]],
+                Money(columns.unit_cents[line]),
+            )
+            strategy = discount_strategy(columns.discount_bp[line])
+            if columns.batch_ids[line] == NO_BATCH:
+                item.setDiscountStrategy(strategy)
+                sellables.append(item)
+                quantities.append(columns.quantities[line])
+            else:
+                sellables.append(
+                    Batch(columns.batch_ids[line], columns.quantities[line], item)
+                )
+                sellables[-1].setDiscountStrategy(strategy)
+                quantities.append(1)
+
+        return Receipt(
+            columns.ids[index],
+            columns.payment_methods[columns.payments[index]],
+            sellables=sellables,
+            discount_strategy=discount_strategy(columns.receipt_bp[index]),
+            quantities=quantities,
+        )
+
+
+@dataclass
+class ColumnarShiftStore:
+    columns: ShiftColumns = field(default_factory=ShiftColumns)
+    name_index: Dict[str, int] = field(default_factory=dict, repr=False)
+    payment_index: Dict[str, int] = field(default_factory=dict, repr=False)
+
+    def append(self, receipt: Receipt) -> None:
+        columns = self.columns
+        payment_code = self._encode(
+            receipt.get_payment_method(), self.payment_index, columns.payment_methods
+        )
+        columns.ids.append(receipt.getId())
+        columns.line_starts.append(len(columns.item_ids))
+        columns.totals.append(receipt.getPrice().cents)
+        columns.payments.append(payment_code)
+        receipt_bp = discount_basis_points(receipt.getDiscountStrategy())
+        columns.receipt_bp.append(receipt_bp or 0)
+
+        for sellable, line_quantity in receipt.lines():
+            batch_id = NO_BATCH
+            units = 1
+            item_id = sellable.getId()
+            name = sellable.getName()
+            if isinstance(sellable, Batch):
+                batch_id = sellable.getId()
+                units = sellable.amount
+                item_id = sellable.item_type.getId()
+                name = sellable.item_type.getName()
+                unit_cents = Money.of(sellable.item_type.price).cents
+            elif isinstance(sellable, Item):
+                unit_cents = Money.of(sellable.price).cents
+            else:
+                unit_cents = sellable.getPrice().cents
+
+            line_bp = discount_basis_points(sellable.getDiscountStrategy())
+            if line_bp is None or not isinstance(sellable, (Item, Batch)):
+                # fold anything that is not a flat percentage into the price
+                unit_cents = sellable.getPrice().cents // units
+                line_bp = 0
+            # a consolidated batch line becomes one batch of all its units
+            quantity = units * line_quantity
+
+            columns.receipt_ids.append(receipt.getId())
+            columns.item_ids.append(item_id)
+            columns.batch_ids.append(batch_id)
+            columns.quantities.append(quantity)
+            columns.unit_cents.append(unit_cents)
+            columns.discount_bp.append(line_bp)
+            columns.payment_codes.append(payment_code)
+            columns.name_codes.append(
+                self._encode(name, self.name_index, columns.names)
+            )
+
+    def snapshot(self) -> ShiftSnapshot:
+        return ShiftSnapshot(
+            self.columns, len(self.columns.ids), len(self.columns.item_ids)
+        )
+
+    def clear(self) -> None:
+        # fresh arrays, snapshots handed out earlier keep the old ones
+        self.columns = ShiftColumns()
+        self.name_index = {}
+        self.payment_index = {}
+
+    def __len__(self) -> int:
+        return len(self.columns.ids)
+
+    @staticmethod
+    def _encode(value: str, index: Dict[str, int], values: List[str]) -> int:
+        code = index.get(value)
+        if code is None:
+            code = index[value] = len(values)
+            values.append(value)
+        return code
@@ -1,11 +1,13 @@
 from __future__ import annotations
 
 import random
-from dataclasses import dataclass
-from typing import Protocol, Tuple
+from dataclasses import dataclass, field
+from typing import Optional, Protocol, Tuple
 
+from printer import Printer
 from store_agents import (
     Cashier,
+    Console,
     Customer,
     DefaultCashier,
     DefaultCustomer,
@@ -13,7 +15,11 @@ from store_agents import (
     NoCashier,
     NoCustomer,
     NoStoreManager,
+    ProductSampler,
+    RandomPaymentChooser,
+    RealConsole,
     StoreManager,
+    UniformProductSampler,
 )
 from store_units import CashRegister, Catalog, PricingSystem
 
@@ -22,6 +28,9 @@ class StoreAgentFactory(Protocol):
     def create_cashier_and_manager(self) -> Tuple[Cashier, StoreManager]:
         pass
 
+    def create_cashier(self) -> Cashier:
+        pass
+
     def create_customer(self) -> Customer:
         pass
 
@@ -31,6 +40,9 @@ class NoStoreAgentFactory:
     def create_cashier_and_manager(self) -> Tuple[Cashier, StoreManager]:
         return NoCashier(), NoStoreManager()
 
+    def create_cashier(self) -> Cashier:
+        return NoCashier()
+
     def create_customer(self) -> Customer:
         return NoCustomer()
 
@@ -40,19 +52,37 @@ class DefaultStoreAgentFactory:
     catalog: Catalog
     cash_register: CashRegister
     pricing_system: PricingSystem
+    # shared by all customers so the sampler can reuse its tables
+    product_sampler: ProductSampler = field(default_factory=UniformProductSampler)
+    console: Console = field(default_factory=RealConsole)
+    printer: Printer = field(default_factory=Printer)
+    # drawn from for cart sizes and payments, the random module when None
+    rng: Optional[random.Random] = None
 
     def create_cashier_and_manager(self) -> Tuple[Cashier, StoreManager]:
-        cashier = DefaultCashier(
-            cash_register=self.cash_register, pricing_system=self.pricing_system
-        )
+        cashier = self.create_cashier()
 
-        store_manager = DefaultStoreManager(cashier=cashier)
+        store_manager = DefaultStoreManager(
+            console=self.console, cashier=cashier, printer=self.printer
+        )
         self.cash_register.add_observer(store_manager)
 
         return cashier, store_manager
 
+    def create_cashier(self) -> Cashier:
+        # every cashier shares the register, so more of them open more lanes
+        return DefaultCashier(
+            cash_register=self.cash_register,
+            pricing_system=self.pricing_system,
+            printer=self.printer,
+        )
+
     def create_customer(self) -> Customer:
-        customer = DefaultCustomer(catalog=self.catalog)
-        num_random_products = random.randint(1, 5)
+        customer = DefaultCustomer(
+            catalog=self.catalog,
+            payment_chooser=RandomPaymentChooser(self.rng),
+            product_sampler=self.product_sampler,
+        )
+        num_random_products = (self.rng or random).randint(1, 5)
         customer.pick_random_products(num_random_products)
         return customer
@@ -2,10 +2,11 @@ from __future__ import annotations
 
 import random
 from dataclasses import dataclass, field
-from typing import Dict, List, Protocol
+from typing import Callable, Dict, Iterable, List, Optional, Protocol, Sequence
 
 from entities import (
     Batch,
+    Money,
     NoReceipt,
     Receipt,
     ReceiptBuilder,
@@ -13,6 +14,7 @@ from entities import (
     Sellable,
 )
 from printer import Printer
+from shift_store import ShiftSnapshot
 from store_units import (
     CashRegister,
     Catalog,
@@ -31,6 +33,9 @@ class Cashier(Protocol):
     def register_item(self, sellable: Sellable) -> None:
         pass
 
+    def register_items(self, sellables: Iterable[Sellable]) -> None:
+        pass
+
     def show_receipt(self) -> Receipt:
         pass
 
@@ -49,6 +54,9 @@ class NoCashier:
     def register_item(self, sellable: Sellable) -> None:
         pass
 
+    def register_items(self, sellables: Iterable[Sellable]) -> None:
+        pass
+
     def show_receipt(self) -> Receipt:
         return NoReceipt()
 
@@ -64,13 +72,14 @@ class DefaultCashier:
     cash_register: CashRegister = field(default_factory=NoCashRegister)
     pricing_system: PricingSystem = field(default_factory=NoPricingSystem)
     curr_receipt: ReceiptBuilder = field(default_factory=ReceiptBuilder)
+    printer: Printer = field(default_factory=Printer)
 
     def open_receipt(self, customer_number: int) -> None:
         strategy = ReceiptDiscountStrategy(customer_number)
         self.curr_receipt = (
             ReceiptBuilder()
             .with_discount_strategy(strategy)
-            .with_id(self.cash_register.get_transaction_cnt())
+            .with_id(self.cash_register.next_receipt_id())
         )
 
     def register_item(self, sellable: Sellable) -> None:
@@ -78,9 +87,14 @@ class DefaultCashier:
 
         self.curr_receipt.with_sellable(discounted_sellable)
 
+    def register_items(self, sellables: Iterable[Sellable]) -> None:
+        # the whole cart is priced at once, with a single discount lookup
+        for sellable in self.pricing_system.manage_discounts(list(sellables)):
+            self.curr_receipt.with_sellable(sellable)
+
     def show_receipt(self) -> Receipt:
         receipt = self.curr_receipt.build()
-        Printer.print_receipt(receipt)
+        self.printer.print_receipt(receipt)
         return receipt
 
     def close_receipt(self, payment_method: str) -> Receipt:
@@ -97,10 +111,110 @@ class PaymentChooser(Protocol):
         pass
 
 
+# agents given no rng draw from the random module, so they follow random.seed
+@dataclass
 class RandomPaymentChooser:
+    rng: Optional[random.Random] = None
+
     def choose_payment_method(self) -> str:
         payment_methods = ["cash", "card"]
-        return random.choice(payment_methods)
+        return (self.rng or random).choice(payment_methods)
+
+
+# weighs every product of a catalog snapshot, weights do not have to sum to 1
+ProductWeights = Callable[[Sequence[Sellable]], List[float]]
+
+
+def uniform_weights(catalog_items: Sequence[Sellable]) -> List[float]:
+    return [1.0] * len(catalog_items)
+
+
+def zipf_weights(exponent: float = 1.0) -> ProductWeights:
+    # catalog order is the popularity rank, first product is the most popular
+    def weights(catalog_items: Sequence[Sellable]) -> List[float]:
+        return [1 / (rank**exponent) for rank in range(1, len(catalog_items) + 1)]
+
+    return weights
+
+
+def sales_weights(product_sales: Dict[str, int]) -> ProductWeights:
+    # popularity taken from past sales, e.g. TransactionAnalyzer.product_sales
+    def weights(catalog_items: Sequence[Sellable]) -> List[float]:
+        return [float(product_sales.get(item.getName(), 0)) for item in catalog_items]
+
+    return weights
+
+
+class ProductSampler(Protocol):
+    def sample(self, catalog_items: Sequence[Sellable], k: int) -> List[Sellable]:
+        pass
+
+
+@dataclass
+class UniformProductSampler:
+    rng: Optional[random.Random] = None
+
+    def sample(self, catalog_items: Sequence[Sellable], k: int) -> List[Sellable]:
+        return (self.rng or random).choices(catalog_items, k=k)
+
+
+# Walker's alias method: O(n) table build per catalog/weights change, O(1) draws
+@dataclass
+class AliasProductSampler:
+    weights: ProductWeights = uniform_weights
+    catalog_items: Optional[Sequence[Sellable]] = field(default=None, repr=False)
+    probabilities: List[float] = field(default_factory=list, repr=False)
+    aliases: List[int] = field(default_factory=list, repr=False)
+    rng: Optional[random.Random] = None
+
+    def set_weights(self, weights: ProductWeights) -> None:
+        self.weights = weights
+        self.catalog_items = None
+
+    def sample(self, catalog_items: Sequence[Sellable], k: int) -> List[Sellable]:
+        # catalog snapshots are shared until the catalog changes
+        if catalog_items is not self.catalog_items:
+            self._build_table(catalog_items)
+
+        n = len(catalog_items)
+        probabilities = self.probabilities
+        aliases = self.aliases
+        draw = (self.rng or random).random
+        picked: List[Sellable] = []
+        for _ in range(k):
+            u = draw() * n
+            column = int(u)
+            if u - column >= probabilities[column]:
+                column = aliases[column]
+            picked.append(catalog_items[column])
+        return picked
+
+    def _build_table(self, catalog_items: Sequence[Sellable]) -> None:
+        n = len(catalog_items)
+        weights = self.weights(catalog_items)
+        total = sum(weights)
+        if total <= 0:
+            weights, total = uniform_weights(catalog_items), float(n)
+
+        scaled = [weight * n / total for weight in weights]
+        probabilities = [1.0] * n
+        aliases = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1]
+        large = [i for i, p in enumerate(scaled) if p >= 1]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            probabilities[less] = scaled[less]
+            aliases[less] = more
+            scaled[more] += scaled[less] - 1
+            if scaled[more] < 1:
+                small.append(more)
+            else:
+                large.append(more)
+
+        # catalog_items last, so another thread never pairs it with old tables
+        self.probabilities = probabilities
+        self.aliases = aliases
+        self.catalog_items = catalog_items
 
 
 class Customer(Protocol):
@@ -150,6 +264,7 @@ class DefaultCustomer:
     catalog: Catalog = field(default_factory=NoCatalog)
     cart: List[Sellable] = field(default_factory=list)
     payment_chooser: PaymentChooser = field(default_factory=RandomPaymentChooser)
+    product_sampler: ProductSampler = field(default_factory=UniformProductSampler)
 
     def pick_specific_product(self, item_num: int) -> None:
         # Pick a specific item from the catalog and add it to the cart
@@ -161,8 +276,7 @@ class DefaultCustomer:
         # Pick a random combination of items from the catalog and add them to the cart
         catalog_items = self.catalog.browse_catalog()
         if catalog_items:
-            # random_items = sample(catalog_items, min(num_items, len(catalog_items)))
-            random_items = random.choices(catalog_items, k=num_items)
+            random_items = self.product_sampler.sample(catalog_items, num_items)
             self.cart.extend(random_items)
 
     def get_cart_items(self) -> List[Sellable]:
@@ -182,13 +296,13 @@ class DefaultCustomer:
 
 
 class StoreManager(Protocol):
-    def update_x(self, transactions: List[Receipt]) -> None:
+    def update_x(self, transactions: Sequence[Receipt]) -> None:
         pass
 
     def update_z(self) -> None:
         pass
 
-    def generate_x_report(self, transactions: List[Receipt]) -> None:
+    def generate_x_report(self, transactions: Sequence[Receipt]) -> None:
         pass
 
     def get_shift_num(self) -> int:
@@ -197,19 +311,23 @@ class StoreManager(Protocol):
 
 @dataclass
 class NoStoreManager:
-    def update_x(self, transactions: List[Receipt]) -> None:
+    def update_x(self, transactions: Sequence[Receipt]) -> None:
         pass
 
     def update_z(self) -> None:
         pass
 
-    def generate_x_report(self, transactions: List[Receipt]) -> None:
+    def generate_x_report(self, transactions: Sequence[Receipt]) -> None:
         pass
 
     def get_shift_num(self) -> int:
         return 0
 
 
+X_REPORT_PROMPT = "Make x_report? \n"
+END_SHIFT_PROMPT = "End Shift? \n"
+
+
 class Console(Protocol):
     def read_bool(self, prompt: str) -> bool:
         pass
@@ -224,6 +342,26 @@ class TestConsole:
         return self.val
 
 
+# headless console: answers X report / end shift prompts by a fixed policy
+@dataclass
+class PolicyConsole:
+    x_report_every: int = 1
+    end_shift_after: int = 1
+    x_prompts: int = 0
+    shift_prompts: int = 0
+
+    def read_bool(self, prompt: str) -> bool:
+        if prompt == END_SHIFT_PROMPT:
+            self.shift_prompts += 1
+            if self.shift_prompts < self.end_shift_after:
+                return False
+            self.shift_prompts = 0
+            return True
+
+        self.x_prompts += 1
+        return self.x_prompts % self.x_report_every == 0
+
+
 class RealConsole:
     def read_bool(self, prompt: str) -> bool:
         response = input(prompt + "Enter 'y' or 'n': ").lower()
@@ -232,48 +370,123 @@ class RealConsole:
 
 @dataclass
 class TransactionAnalyzer:
-    total_cash_revenue: float = 0.0
-    total_card_revenue: float = 0.0
+    total_cash_revenue: Money = field(default_factory=Money)
+    total_card_revenue: Money = field(default_factory=Money)
     product_sales: Dict[str, int] = field(default_factory=dict)
 
-    def analyze_transactions(self, transactions: List[Receipt]) -> None:
-        self.total_cash_revenue = 0.0
-        self.total_card_revenue = 0.0
+    def analyze_transactions(self, transactions: Sequence[Receipt]) -> None:
+        if isinstance(transactions, ShiftSnapshot):
+            # aggregate the columns directly, no Receipt objects are built
+            revenue = transactions.get_revenue()
+            self.total_cash_revenue = Money(revenue.get("cash", 0))
+            self.total_card_revenue = Money(revenue.get("card", 0))
+            self.product_sales = transactions.get_product_sales()
+            return
+
+        # totals are summed as plain integer cents
+        cash_cents = 0
+        card_cents = 0
         self.product_sales = {}
         for transaction in transactions:
             payment_method = transaction.get_payment_method()
-            total_price = transaction.getPrice()
+            total_cents = transaction.getPrice().cents
 
             if payment_method == "cash":
-                self.total_cash_revenue += total_price
+                cash_cents += total_cents
             elif payment_method == "card":
-                self.total_card_revenue += total_price
+                card_cents += total_cents
 
-            for sellable in transaction.sellables:
-                self._update_product_sales(sellable)
+            for sellable, quantity in transaction.lines():
+                self._update_product_sales(sellable, quantity)
 
-    def _update_product_sales(self, sellable: Sellable) -> None:
+        self.total_cash_revenue = Money(cash_cents)
+        self.total_card_revenue = Money(card_cents)
+
+    def _update_product_sales(self, sellable: Sellable, quantity: int = 1) -> None:
         product_name = sellable.getName()
-        units_sold = 1
+        units_sold = quantity
 
         if isinstance(sellable, Batch):
             product_name = sellable.item_type.getName()
-            units_sold = sellable.amount
+            units_sold = sellable.amount * quantity
 
         self.product_sales[product_name] = (
             self.product_sales.get(product_name, 0) + units_sold
         )
 
-    def get_total_cash_revenue(self) -> float:
+    def get_total_cash_revenue(self) -> Money:
         return self.total_cash_revenue
 
-    def get_total_card_revenue(self) -> float:
+    def get_total_card_revenue(self) -> Money:
         return self.total_card_revenue
 
     def get_product_sales(self) -> Dict[str, int]:
         return self.product_sales
 
 
+# Compact result of a shift: plain ints keyed by strings, so it is cheap to pickle.
+# merge is associative and commutative, so summaries of many stores or shifts can
+# be reduced in any grouping.
+@dataclass
+class ShiftSummary:
+    receipts: int = 0
+    revenue: Dict[str, int] = field(default_factory=dict)
+    product_sales: Dict[str, int] = field(default_factory=dict)
+
+    def add_receipt(self, receipt: Receipt) -> None:
+        self.add_payment(receipt.get_payment_method(), receipt.getPrice().cents)
+        for sellable, quantity in receipt.lines():
+            product_name = sellable.getName()
+            units_sold = quantity
+            if isinstance(sellable, Batch):
+                product_name = sellable.item_type.getName()
+                units_sold = sellable.amount * quantity
+            self.add_sale(product_name, units_sold)
+
+    def add_payment(self, payment_method: str, cents: int) -> None:
+        self.receipts += 1
+        self.revenue[payment_method] = self.revenue.get(payment_method, 0) + cents
+
+    def add_sale(self, product_name: str, units_sold: int) -> None:
+        self.product_sales[product_name] = (
+            self.product_sales.get(product_name, 0) + units_sold
+        )
+
+    def merge(self, other: ShiftSummary) -> ShiftSummary:
+        merged = ShiftSummary(
+            self.receipts + other.receipts,
+            dict(self.revenue),
+            dict(self.product_sales),
+        )
+        for payment_method, cents in other.revenue.items():
+            merged.revenue[payment_method] = (
+                merged.revenue.get(payment_method, 0) + cents
+            )
+        for product_name, units_sold in other.product_sales.items():
+            merged.product_sales[product_name] = (
+                merged.product_sales.get(product_name, 0) + units_sold
+            )
+        return merged
+
+    def get_revenue(self, payment_method: str) -> Money:
+        return Money(self.revenue.get(payment_method, 0))
+
+
+def merge_summaries(summaries: List[ShiftSummary]) -> ShiftSummary:
+    # pairwise tree reduction
+    if not summaries:
+        return ShiftSummary()
+    while len(summaries) > 1:
+        merged = [
+            summaries[i].merge(summaries[i + 1])
+            for i in range(0, len(summaries) - 1, 2)
+        ]
+        if len(summaries) % 2:
+            merged.append(summaries[-1])
+        summaries = merged
+    return summaries[0]
+
+
 @dataclass
 class DefaultStoreManager:
     transaction_analyzer: TransactionAnalyzer = field(
@@ -282,22 +495,22 @@ class DefaultStoreManager:
     console: Console = field(default_factory=RealConsole)
     shift_cnt: int = 0
     cashier: Cashier = field(default_factory=NoCashier)
+    printer: Printer = field(default_factory=Printer)
 
-    def update_x(self, transactions: List[Receipt]) -> None:
+    def update_x(self, transactions: Sequence[Receipt]) -> None:
         # Update records and generate X report when notified about a new transaction
-        if self.console.read_bool("Make x_report? \n"):
+        if self.console.read_bool(X_REPORT_PROMPT):
             self.generate_x_report(transactions)
 
     def update_z(self) -> None:
-        if self.console.read_bool("End Shift? \n"):
-            self.shift_cnt += 1
-            self.cashier.generate_z_report()
+        # the cash register has already ended the shift, it is only counted
+        self.shift_cnt += 1
 
-    def generate_x_report(self, transactions: List[Receipt]) -> None:
+    def generate_x_report(self, transactions: Sequence[Receipt]) -> None:
         # Generate X report based on transactions
         # self.transaction_analyzer.set_transactions(transactions)
         self.transaction_analyzer.analyze_transactions(transactions)
-        Printer.print_x_report(
+        self.printer.print_x_report(
             self.transaction_analyzer.get_total_cash_revenue(),
             self.transaction_analyzer.get_total_card_revenue(),
             self.transaction_analyzer.get_product_sales(),
@@ -1,19 +1,29 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Protocol
 
-from database import BatchRepository, DiscountRepository, ItemRepository
+from database import (
+    BatchRepository,
+    DiscountRepository,
+    ItemRepository,
+    NoReceiptJournal,
+    ReceiptJournal,
+)
 from store_units import (
     CashRegister,
     Catalog,
+    ColumnarCashRegister,
     DefaultCatalog,
     DefaultPricingSystem,
     InMemoryCashRegister,
     NoCashRegister,
     NoCatalog,
     NoPricingSystem,
+    ObserverDispatcher,
     PricingSystem,
+    StripedCashRegister,
+    SynchronousObserverDispatcher,
 )
 
 
@@ -33,9 +43,28 @@ class DefaultStoreComponentFactory(StoreComponentFactory):
     item_repo: ItemRepository
     discount_repo: DiscountRepository
     batch_repo: BatchRepository
+    journal: ReceiptJournal = field(default_factory=NoReceiptJournal)
+    dispatcher: ObserverDispatcher = field(
+        default_factory=SynchronousObserverDispatcher
+    )
+    # keep the shift in typed columns instead of Receipt objects
+    columnar: bool = False
+    # cashier threads closing receipts into the same register
+    lanes: int = 1
 
     def create_cash_register(self) -> CashRegister:
-        return InMemoryCashRegister()
+        if self.lanes > 1 and self.columnar:
+            # the striped register keeps its stripes as lists of receipts
+            raise ValueError("a columnar shift is only kept with a single lane")
+        if self.lanes > 1:
+            return StripedCashRegister(
+                self.lanes, journal=self.journal, dispatcher=self.dispatcher
+            )
+        if self.columnar:
+            return ColumnarCashRegister(
+                journal=self.journal, dispatcher=self.dispatcher
+            )
+        return InMemoryCashRegister(journal=self.journal, dispatcher=self.dispatcher)
 
     def create_pricing_system(self) -> PricingSystem:
         return DefaultPricingSystem(self.discount_repo, self.item_repo)
@@ -1,23 +1,53 @@
 from __future__ import annotations
 
+import threading
+import time
+from collections import deque
+from copy import copy
 from dataclasses import dataclass, field
-from typing import List, Protocol
+from functools import lru_cache
+from itertools import chain
+from typing import (
+    Callable,
+    Deque,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Protocol,
+    Sequence,
+    Tuple,
+)
 
-from database import BatchRepository, DiscountRepository, ExistsError, ItemRepository
+from database import (
+    BatchRepository,
+    DiscountRepository,
+    ExistsError,
+    ItemRepository,
+    NoReceiptJournal,
+    ReceiptJournal,
+)
 from entities import (
     Batch,
+    DiscountStrategy,
     Item,
+    NoDiscount,
     NoSellable,
     PercentageDiscountStrategy,
     Receipt,
     Sellable,
 )
+from shift_store import ColumnarShiftStore
 
 
 # abstraction layer for customer
 # main reason is not to give customer direct access to item repository
 class Catalog(Protocol):
-    def browse_catalog(self) -> List[Sellable]:
+    def browse_catalog(self) -> Sequence[Sellable]:
+        pass
+
+    # streams the catalog without materializing it, for listings
+    def iter_catalog(self, batch_size: int = 1000) -> Iterator[Sellable]:
         pass
 
     def pick_product(self, item_id: int) -> Sellable:
@@ -29,9 +59,12 @@ class Catalog(Protocol):
 
 @dataclass
 class NoCatalog:
-    def browse_catalog(self) -> List[Sellable]:
+    def browse_catalog(self) -> Sequence[Sellable]:
         return []
 
+    def iter_catalog(self, batch_size: int = 1000) -> Iterator[Sellable]:
+        return iter(())
+
     def pick_product(self, item_id: int) -> Sellable:
         return NoSellable()
 
@@ -43,15 +76,29 @@ class NoCatalog:
 class DefaultCatalog:
     item_repo: ItemRepository
     batch_repo: BatchRepository
+    # immutable snapshot of the catalog, rebuilt only when a repository changes
+    snapshot: Tuple[Sellable, ...] = field(default=(), repr=False)
+    snapshot_version: Tuple[int, int] = field(default=(-1, -1), repr=False)
+
+    def browse_catalog(self) -> Sequence[Sellable]:
+        version = (self.item_repo.get_version(), self.batch_repo.get_version())
+        if version == self.snapshot_version:
+            return self.snapshot
 
-    def browse_catalog(self) -> List[Sellable]:
         try:
             # Retrieve all items from the item and batch repositories
-            return self.item_repo.get_all() + self.batch_repo.get_all()
+            self.snapshot = tuple(self.item_repo.get_all() + self.batch_repo.get_all())
+            self.snapshot_version = version
+            return self.snapshot
 
         except ExistsError:
             print("Error retrieving items from the catalog.")
-            return []
+            return ()
+
+    def iter_catalog(self, batch_size: int = 1000) -> Iterator[Sellable]:
+        return chain(
+            self.item_repo.iter_all(batch_size), self.batch_repo.iter_all(batch_size)
+        )
 
     def pick_product(self, item_id: int) -> Sellable:
         try:
@@ -79,32 +126,112 @@ class PricingSystem(Protocol):
     def manage_discount(self, sellable: Sellable) -> Sellable:
         pass
 
+    def manage_discounts(self, sellables: Sequence[Sellable]) -> List[Sellable]:
+        pass
+
 
 @dataclass
 class NoPricingSystem:
     def manage_discount(self, sellable: Sellable) -> Sellable:
         return sellable
 
+    def manage_discounts(self, sellables: Sequence[Sellable]) -> List[Sellable]:
+        return list(sellables)
 
+
+# Resolved discount strategies are cached per item and shared between sellables,
+# the discount repository invalidates an item's entry whenever its discounts
+# change and every entry expires when its discount's time window ends, so a warm
+# cache never touches the repository.
 @dataclass
 class DefaultPricingSystem:
     discount_repository: DiscountRepository
     item_repository: ItemRepository
+    clock: Callable[[], float] = field(default=time.time, repr=False)
+    # item id -> (strategy, time until which it stays in effect)
+    strategies: Dict[int, Tuple[DiscountStrategy, float]] = field(
+        default_factory=dict, repr=False
+    )
+    # bumped on every invalidation, so a lookup can tell it raced with one
+    generation: int = field(default=0, repr=False)
+
+    def __post_init__(self) -> None:
+        self.discount_repository.add_observer(self)
 
     def manage_discount(self, sellable: Sellable) -> Sellable:
-        item_discount = 0.0
-        if isinstance(sellable, Item):
-            item_discount = self.discount_repository.get_item_discount(sellable.getId())
-        if isinstance(sellable, Batch):
-            item_discount = self.discount_repository.get_item_discount(
-                sellable.item_type.getId()
-            )
-        if isinstance(sellable, Receipt):
+        item_id = self._item_id(sellable)
+        if item_id is None:
             return sellable
+        # catalog sellables are shared, closed receipts must keep their price
+        priced = copy(sellable)
+        priced.setDiscountStrategy(self._resolve(item_id))
+        return priced
+
+    def manage_discounts(self, sellables: Sequence[Sellable]) -> List[Sellable]:
+        # a whole cart costs one repository lookup for the items the cache misses
+        now = self.clock()
+        missing: List[int] = []
+        for sellable in sellables:
+            item_id = self._item_id(sellable)
+            if item_id is None:
+                continue
+            cached = self.strategies.get(item_id)
+            if cached is None or now >= cached[1]:
+                missing.append(item_id)
+        if missing:
+            generation = self.generation
+            resolved = self.discount_repository.get_item_discounts_at(missing, now)
+            for item_id, (item_discount, until) in resolved.items():
+                self._store(item_id, item_discount, until, generation)
+        return [self.manage_discount(sellable) for sellable in sellables]
+
+    def discount_changed(self, item_id: int) -> None:
+        self.generation += 1
+        self.strategies.pop(item_id, None)
+
+    def _resolve(self, item_id: int) -> DiscountStrategy:
+        now = self.clock()
+        cached = self.strategies.get(item_id)
+        if cached is not None and now < cached[1]:
+            return cached[0]
+
+        generation = self.generation
+        item_discount, until = self.discount_repository.get_item_discount_at(
+            item_id, now
+        )
+        return self._store(item_id, item_discount, until, generation)
+
+    def _store(
+        self, item_id: int, item_discount: float, until: float, generation: int
+    ) -> DiscountStrategy:
+        strategy: DiscountStrategy = NO_DISCOUNT
         if item_discount != 0:
-            strategy = PercentageDiscountStrategy(item_discount)
-            sellable.setDiscountStrategy(strategy)
-        return sellable
+            strategy = percentage_strategy(item_discount)
+        self.strategies[item_id] = (strategy, until)
+        if generation != self.generation:
+            # raced with a discount change, resolve again on the next lookup
+            self.strategies.pop(item_id, None)
+        return strategy
+
+    @staticmethod
+    def _item_id(sellable: Sellable) -> Optional[int]:
+        # id the discount of a sellable is stored under, receipts have none
+        if isinstance(sellable, Receipt):
+            return None
+        if isinstance(sellable, Batch):
+            return sellable.item_type.getId()
+        if isinstance(sellable, Item):
+            return sellable.getId()
+        return None
+
+
+NO_DISCOUNT = NoDiscount()
+
+
+@lru_cache(maxsize=None)
+def percentage_strategy(percentage: float) -> PercentageDiscountStrategy:
+    # strategies are immutable, so one instance per percentage is shared
+    return PercentageDiscountStrategy(percentage)
 
 
 class CashRegister(Protocol):
@@ -123,6 +250,10 @@ class CashRegister(Protocol):
     def get_transaction_cnt(self) -> int:
         pass
 
+    # ids are handed out once per register, never again in a later shift
+    def next_receipt_id(self) -> int:
+        pass
+
     def close_receipt(self, receipt: Receipt) -> None:
         pass
 
@@ -144,6 +275,9 @@ class NoCashRegister(CashRegister):
     def get_transaction_cnt(self) -> int:
         return 0
 
+    def next_receipt_id(self) -> int:
+        return 0
+
     def close_receipt(self, receipt: Receipt) -> None:
         pass
 
@@ -156,6 +290,11 @@ class InMemoryCashRegister(CashRegister):
     transactions: List[Receipt] = field(default_factory=list)
     observers: List[CashRegisterObserver] = field(default_factory=list)
     transaction_cnt: int = 0
+    journal: ReceiptJournal = field(default_factory=NoReceiptJournal)
+    dispatcher: ObserverDispatcher = field(
+        default_factory=lambda: SynchronousObserverDispatcher()
+    )
+    receipt_cnt: int = 0
 
     def add_observer(self, observer: CashRegisterObserver) -> None:
         self.observers.append(observer)
@@ -164,17 +303,24 @@ class InMemoryCashRegister(CashRegister):
         self.observers.remove(observer)
 
     def notify_observers(self, z_report: bool = False) -> None:
-        for observer in self.observers:
-            observer.update_x(self.transactions)
-            if z_report:
-                observer.update_z()
+        # observers get an immutable snapshot of the shift so far
+        transactions = tuple(self.transactions)
+        if z_report:
+            # the register starts the next shift before observers hear of it
+            self.clear()
+        self.dispatcher.dispatch(tuple(self.observers), transactions, z_report)
 
     def get_transaction_cnt(self) -> int:
         return self.transaction_cnt
 
+    def next_receipt_id(self) -> int:
+        self.receipt_cnt += 1
+        return self.receipt_cnt - 1
+
     def close_receipt(self, receipt: Receipt) -> None:
         self.transactions.append(receipt)
         self.transaction_cnt += 1
+        self.journal.record(receipt)
 
         if self.transaction_cnt % CashRegister.ENTRIES_FOR_Z_REPORT == 0:
             self.notify_observers(z_report=True)
@@ -183,13 +329,334 @@ class InMemoryCashRegister(CashRegister):
 
     def clear(self) -> None:
         # Reset transactions when generating Z report
+        # the shift's receipts must be durable before they are dropped
+        self.journal.end_shift()
         self.transactions.clear()
         self.transaction_cnt = 0
 
 
+# keeps the shift in a ColumnarShiftStore instead of a list of Receipt objects,
+# observers get a ShiftSnapshot, which is a sequence of receipts as well
+@dataclass
+class ColumnarCashRegister(CashRegister):
+    store: ColumnarShiftStore = field(default_factory=ColumnarShiftStore)
+    observers: List[CashRegisterObserver] = field(default_factory=list)
+    journal: ReceiptJournal = field(default_factory=NoReceiptJournal)
+    dispatcher: ObserverDispatcher = field(
+        default_factory=lambda: SynchronousObserverDispatcher()
+    )
+    receipt_cnt: int = 0
+
+    def add_observer(self, observer: CashRegisterObserver) -> None:
+        self.observers.append(observer)
+
+    def remove_observer(self, observer: CashRegisterObserver) -> None:
+        self.observers.remove(observer)
+
+    def notify_observers(self, z_report: bool = False) -> None:
+        snapshot = self.store.snapshot()
+        if z_report:
+            self.clear()
+        self.dispatcher.dispatch(tuple(self.observers), snapshot, z_report)
+
+    def get_transaction_cnt(self) -> int:
+        return len(self.store)
+
+    def next_receipt_id(self) -> int:
+        self.receipt_cnt += 1
+        return self.receipt_cnt - 1
+
+    def close_receipt(self, receipt: Receipt) -> None:
+        self.store.append(receipt)
+        self.journal.record(receipt)
+
+        transaction_cnt = len(self.store)
+        if transaction_cnt % CashRegister.ENTRIES_FOR_Z_REPORT == 0:
+            self.notify_observers(z_report=True)
+        elif transaction_cnt % CashRegister.ENTRIES_FOR_X_REPORT == 0:
+            self.notify_observers()
+
+    def clear(self) -> None:
+        self.journal.end_shift()
+        self.store.clear()
+
+
+# Cash register shared by several cashier threads. Receipts are appended to one
+# of stripe_cnt buffers, picked per thread, so cashiers only contend on their
+# stripe's lock and on a short counter update. Reports take every stripe lock
+# to read a consistent snapshot, and while one is running cashiers wait before
+# appending, so the locks are not starved. A Z report clears the stripes under
+# the same locks it took its snapshot with: every receipt is reported in
+# exactly one shift. Reports are dispatched with the stripes unlocked. Under
+# contention a shift can end a few receipts after its Z threshold.
+@dataclass
+class StripedCashRegister(CashRegister):
+    stripe_cnt: int = 8
+    observers: List[CashRegisterObserver] = field(default_factory=list)
+    transaction_cnt: int = 0
+    journal: ReceiptJournal = field(default_factory=NoReceiptJournal)
+    dispatcher: ObserverDispatcher = field(
+        default_factory=lambda: SynchronousObserverDispatcher()
+    )
+    receipt_cnt: int = 0
+    stripes: List[List[Receipt]] = field(init=False, repr=False)
+    stripe_locks: List[threading.RLock] = field(init=False, repr=False)
+    # lock order: report_lock, stripe locks (ascending), counter_lock, gate
+    report_lock: threading.RLock = field(default_factory=threading.RLock, repr=False)
+    counter_lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+    # reports in progress, close_receipt waits on the gate while there are any
+    reporting: int = field(default=0, repr=False)
+    gate: threading.Condition = field(default_factory=threading.Condition, repr=False)
+    local: threading.local = field(default_factory=threading.local, repr=False)
+    thread_cnt: int = field(default=0, repr=False)
+
+    def __post_init__(self) -> None:
+        self.stripes = [[] for _ in range(self.stripe_cnt)]
+        self.stripe_locks = [threading.RLock() for _ in range(self.stripe_cnt)]
+
+    def add_observer(self, observer: CashRegisterObserver) -> None:
+        with self.report_lock:
+            self.observers.append(observer)
+
+    def remove_observer(self, observer: CashRegisterObserver) -> None:
+        with self.report_lock:
+            self.observers.remove(observer)
+
+    def notify_observers(self, z_report: bool = False) -> None:
+        self._set_reporting(1)
+        self._report(z_report)
+
+    def _report(self, z_report: bool) -> None:
+        # the caller raised reporting, it is lowered once the snapshot is taken
+        with self.report_lock:
+            try:
+                self._lock_stripes()
+                try:
+                    transactions = tuple(chain.from_iterable(self.stripes))
+                    if z_report:
+                        self._end_shift()
+                finally:
+                    self._unlock_stripes()
+            finally:
+                self._set_reporting(-1)
+
+            # cashiers carry on while the report is dispatched. It is still
+            # dispatched under report_lock, so reports reach the dispatcher in
+            # the order their snapshots were taken
+            self.dispatcher.dispatch(tuple(self.observers), transactions, z_report)
+
+    def get_transaction_cnt(self) -> int:
+        return self.transaction_cnt
+
+    def next_receipt_id(self) -> int:
+        # cashiers open receipts at once, each must get its own id
+        with self.counter_lock:
+            self.receipt_cnt += 1
+            return self.receipt_cnt - 1
+
+    def close_receipt(self, receipt: Receipt) -> None:
+        stripe = self._stripe()
+        while True:
+            with self.stripe_locks[stripe]:
+                # a report raises reporting before it takes the stripe locks
+                if not self.reporting:
+                    self.stripes[stripe].append(receipt)
+                    with self.counter_lock:
+                        self.transaction_cnt += 1
+                        transaction_cnt = self.transaction_cnt
+                        self.journal.record(receipt)
+                        z_report = transaction_cnt % self.ENTRIES_FOR_Z_REPORT == 0
+                        x_report = transaction_cnt % self.ENTRIES_FOR_X_REPORT == 0
+                        if z_report or x_report:
+                            # hold the other cashiers before the next receipt
+                            self._set_reporting(1)
+                    break
+            with self.gate:
+                while self.reporting:
+                    self.gate.wait()
+
+        if z_report or x_report:
+            self._report(z_report)
+
+    def clear(self) -> None:
+        self._lock_stripes()
+        try:
+            self._end_shift()
+        finally:
+            self._unlock_stripes()
+
+    def _end_shift(self) -> None:
+        # the caller holds every stripe lock
+        with self.counter_lock:
+            self.journal.end_shift()
+            for receipts in self.stripes:
+                receipts.clear()
+            self.transaction_cnt = 0
+
+    def _stripe(self) -> int:
+        stripe: Optional[int] = getattr(self.local, "stripe", None)
+        if stripe is None:
+            with self.counter_lock:
+                stripe = self.thread_cnt % self.stripe_cnt
+                self.thread_cnt += 1
+            self.local.stripe = stripe
+        return stripe
+
+    def _set_reporting(self, change: int) -> None:
+        with self.gate:
+            self.reporting += change
+            self.gate.notify_all()
+
+    def _lock_stripes(self) -> None:
+        for lock in self.stripe_locks:
+            lock.acquire()
+
+    def _unlock_stripes(self) -> None:
+        for lock in reversed(self.stripe_locks):
+            lock.release()
+
+
 class CashRegisterObserver(Protocol):
-    def update_x(self, transactions: List[Receipt]) -> None:
+    def update_x(self, transactions: Sequence[Receipt]) -> None:
         pass
 
     def update_z(self) -> None:
         pass
+
+
+# delivers cash register notifications to its observers
+class ObserverDispatcher(Protocol):
+    def dispatch(
+        self,
+        observers: Sequence[CashRegisterObserver],
+        transactions: Sequence[Receipt],
+        z_report: bool,
+    ) -> None:
+        pass
+
+    # blocks until every notification dispatched so far has been delivered
+    def drain(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class SynchronousObserverDispatcher:
+    def dispatch(
+        self,
+        observers: Sequence[CashRegisterObserver],
+        transactions: Sequence[Receipt],
+        z_report: bool,
+    ) -> None:
+        for observer in observers:
+            observer.update_x(transactions)
+            if z_report:
+                observer.update_z()
+
+    def drain(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+# Reports are handed to a worker thread, so close_receipt does not wait for
+# observers to analyze and print the shift. At most max_pending X reports wait
+# for the worker, when another one arrives the oldest waiting report is dropped
+# (coalesce, only the latest snapshot matters) or the caller blocks until the
+# worker catches up (backpressure). A Z report is queued behind them and never
+# dropped, waiting X reports are superseded by its snapshot when coalescing.
+# The register has already started the next shift when it dispatches a Z
+# report, so the caller does not wait for it either.
+# Observers and their printer output must tolerate being called from the worker.
+@dataclass
+class ThreadedObserverDispatcher:
+    max_pending: int = 1
+    coalesce: bool = True
+    coalesced: int = 0
+    pending: Deque[
+        Tuple[Sequence[CashRegisterObserver], Sequence[Receipt], bool]
+    ] = field(default_factory=deque, repr=False)
+    condition: threading.Condition = field(
+        default_factory=threading.Condition, repr=False
+    )
+    worker: Optional[threading.Thread] = field(default=None, repr=False)
+    busy: bool = False
+    closed: bool = False
+    error: Optional[BaseException] = None
+
+    def dispatch(
+        self,
+        observers: Sequence[CashRegisterObserver],
+        transactions: Sequence[Receipt],
+        z_report: bool,
+    ) -> None:
+        with self.condition:
+            self._start()
+            if z_report and self.coalesce:
+                z_reports = deque(report for report in self.pending if report[2])
+                self.coalesced += len(self.pending) - len(z_reports)
+                self.pending = z_reports
+            while len(self.pending) >= self.max_pending:
+                if not self.coalesce:
+                    self.condition.wait()
+                elif not self._drop_x_report():
+                    # only Z reports are waiting
+                    break
+            self.pending.append((observers, transactions, z_report))
+            self.condition.notify_all()
+
+    def drain(self) -> None:
+        with self.condition:
+            while self.pending or self.busy:
+                self.condition.wait()
+            if self.error is not None:
+                error, self.error = self.error, None
+                raise error
+
+    def close(self) -> None:
+        self.drain()
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        if self.worker is not None:
+            self.worker.join()
+            self.worker = None
+
+    def _start(self) -> None:
+        if self.worker is None:
+            self.closed = False
+            self.worker = threading.Thread(target=self._deliver, daemon=True)
+            self.worker.start()
+
+    def _drop_x_report(self) -> bool:
+        for index, (_, _, z_report) in enumerate(self.pending):
+            if not z_report:
+                del self.pending[index]
+                self.coalesced += 1
+                return True
+        return False
+
+    def _deliver(self) -> None:
+        while True:
+            with self.condition:
+                while not self.pending and not self.closed:
+                    self.condition.wait()
+                if not self.pending:
+                    return
+                observers, transactions, z_report = self.pending.popleft()
+                self.busy = True
+                self.condition.notify_all()
+
+            try:
+                for observer in observers:
+                    observer.update_x(transactions)
+                    if z_report:
+                        observer.update_z()
+            except BaseException as error:
+                self.error = error
+            finally:
+                with self.condition:
+                    self.busy = False
+                    self.condition.notify_all()
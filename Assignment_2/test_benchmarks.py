@@ -0,0 +1,56 @@
+from pathlib import Path
+
+from benchmarks import (
+    BENCHMARKS,
+    BenchmarkResult,
+    build_store,
+    find_regressions,
+    load_results,
+    run_benchmarks,
+    sample_sellables,
+    write_results,
+)
+from entities import Batch
+
+
+def test_benchmarks_run_on_both_backends() -> None:
+    results = run_benchmarks(sizes=[20], repeat=1)
+
+    assert len(results) == 2 * len(BENCHMARKS)
+    assert {result.backend for result in results} == {"memory", "sqlite"}
+    assert all(result.operations > 0 for result in results)
+
+
+def test_benchmark_inputs_are_read_from_the_store(tmp_path: Path) -> None:
+    store = build_store("sqlite", 20, str(tmp_path / "bench.db"))
+
+    sellables = sample_sellables(store)
+
+    assert [sellable.getId() for sellable in sellables[:20]] == list(range(1, 21))
+    assert [sellable.getId() for sellable in sellables[20:]] == [1, 6, 11, 16]
+    assert all(isinstance(sellable, Batch) for sellable in sellables[20:])
+
+
+def test_benchmark_results_round_trip(tmp_path: Path) -> None:
+    results = [BenchmarkResult("x_report", "memory", 100, 0.5, 1000)]
+    path = str(tmp_path / "benchmarks.json")
+
+    write_results(path, results)
+
+    assert load_results(path) == results
+
+
+def test_find_regressions_compares_time_per_operation() -> None:
+    baseline = [
+        BenchmarkResult("x_report", "memory", 100, 1.0, 1000),
+        BenchmarkResult("close_receipt", "memory", 100, 1.0, 1000),
+    ]
+    results = [
+        BenchmarkResult("x_report", "memory", 100, 2.0, 2000),
+        BenchmarkResult("close_receipt", "memory", 100, 1.5, 1000),
+        BenchmarkResult("close_receipt", "sqlite", 100, 9.0, 1000),
+    ]
+
+    regressions = find_regressions(results, baseline, threshold=0.2)
+
+    assert regressions == ["close_receipt/memory/100 is 1.50x slower"]
@@ -0,0 +1,64 @@
+from pathlib import Path
+
+import pytest
+
+from chain_simulator import ChainSimulator, SummaryReceiptJournal, simulate_store
+from entities import Batch, Item, Receipt
+from printer import InMemoryPrinterOutput, Printer
+from store_agents import ShiftSummary, merge_summaries
+
+
+def make_summary(receipts: int, cash: int, milk: int) -> ShiftSummary:
+    return ShiftSummary(receipts, {"cash": cash}, {"Milk": milk})
+
+
+def test_summary_journal_counts_receipts() -> None:
+    journal = SummaryReceiptJournal()
+    milk = Item(id=1, name="Milk", price=2.0)
+
+    journal.record(Receipt(id=1, payment_method="card", sellables=[milk]))
+    journal.record(Receipt(id=2, payment_method="cash", sellables=[Batch(2, 3, milk)]))
+
+    assert journal.summary == ShiftSummary(2, {"card": 200, "cash": 600}, {"Milk": 4})
+
+
+def test_summary_merge_is_associative() -> None:
+    a = make_summary(1, 100, 1)
+    b = ShiftSummary(2, {"card": 50}, {"Beer": 2})
+    c = make_summary(3, 25, 5)
+
+    assert a.merge(b).merge(c) == a.merge(b.merge(c))
+    assert merge_summaries([a, b, c]) == ShiftSummary(
+        6, {"cash": 125, "card": 50}, {"Milk": 6, "Beer": 2}
+    )
+    assert merge_summaries([]) == ShiftSummary()
+
+
+def test_chain_simulation_merges_store_summaries() -> None:
+    chain = ChainSimulator(stores=3, customers_per_store=150, workers=2, seed=3)
+
+    summary = chain.simulate()
+
+    expected = merge_summaries([simulate_store(i, 150, seed=3) for i in range(3)])
+    assert summary == expected
+    assert summary.receipts == 450
+
+
+def test_sqlite_store_leaves_no_database_behind(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.chdir(tmp_path)
+
+    summary = simulate_store(0, 20, inmemory=False)
+
+    assert summary.receipts == 20
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_chain_report_prints_merged_revenue() -> None:
+    output = InMemoryPrinterOutput()
+    summary = ShiftSummary(2, {"cash": 1050, "card": 200}, {"Milk": 2})
+
+    ChainSimulator.print_report(summary, Printer(output))
+
+    assert output.get_lines()[-2] == "Cash Revenue    $10.50     "
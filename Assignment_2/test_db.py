@@ -1,3 +1,7 @@
+import sqlite3
+import threading
+from pathlib import Path
+
 import pytest
 
 from database import (
@@ -8,9 +12,17 @@ from database import (
     InMemoryBatchRepository,
     InMemoryDiscountRepository,
     InMemoryItemRepository,
+    ItemIdentityMap,
     ItemRepository,
+    ReadWriteLock,
+)
+from db_init import ItemInitializer
+from entities import Batch, Item, Money, PercentageDiscount, Receipt
+from real_database import (
+    SQLiteDBCreator,
+    SQLiteItemRepository,
+    SQLiteReceiptJournal,
 )
-from entities import Batch, Item, PercentageDiscount
 
 
 @pytest.fixture
@@ -238,3 +250,213 @@ def test_in_memory_batch_repository_should_delete(
 
     with pytest.raises(DoesNotExistError):
         in_memory_batch_repository.read(1)
+
+
+def test_in_memory_discount_repository_should_find_item_discount(
+    in_memory_discount_repository: DiscountRepository,
+) -> None:
+    in_memory_discount_repository.create(
+        PercentageDiscount(id=1, item_id=1, percentage=0.1)
+    )
+    in_memory_discount_repository.create(
+        PercentageDiscount(id=2, item_id=2, percentage=0.2)
+    )
+
+    assert in_memory_discount_repository.get_item_discount(1) == 0.1
+    assert in_memory_discount_repository.get_item_discount(2) == 0.2
+    assert in_memory_discount_repository.get_item_discount(3) == 0
+
+
+def test_in_memory_discount_repository_should_reindex_on_update(
+    in_memory_discount_repository: DiscountRepository,
+) -> None:
+    discount = PercentageDiscount(id=1, item_id=1, percentage=0.1)
+
+    in_memory_discount_repository.create(discount)
+    discount.item_id = 2
+    in_memory_discount_repository.update(discount)
+
+    assert in_memory_discount_repository.get_item_discount(1) == 0
+    assert in_memory_discount_repository.get_item_discount(2) == 0.1
+
+
+def test_in_memory_discount_repository_should_unindex_on_delete(
+    in_memory_discount_repository: DiscountRepository,
+) -> None:
+    in_memory_discount_repository.create(
+        PercentageDiscount(id=1, item_id=1, percentage=0.1)
+    )
+    in_memory_discount_repository.delete(1)
+
+    assert in_memory_discount_repository.get_item_discount(1) == 0
+
+
+def test_in_memory_item_repository_should_page_by_id(
+    in_memory_item_repository: ItemRepository,
+) -> None:
+    items = [Item(id=i, name=f"Item {i}", price=1.0) for i in (5, 1, 4, 2, 3)]
+    for item in items:
+        in_memory_item_repository.create(item)
+
+    first_page = in_memory_item_repository.page(limit=2)
+    assert [item.getId() for item in first_page] == [1, 2]
+    second_page = in_memory_item_repository.page(after_id=2, limit=2)
+    assert [item.getId() for item in second_page] == [3, 4]
+    assert in_memory_item_repository.page(after_id=5) == []
+    assert list(in_memory_item_repository.iter_all(batch_size=2)) == items
+
+
+def test_in_memory_item_repository_iterates_without_blocking_writers(
+    in_memory_item_repository: ItemRepository,
+) -> None:
+    for i in range(1, 6):
+        in_memory_item_repository.create(Item(id=i, name=f"Item {i}", price=1.0))
+
+    seen = []
+    for item in in_memory_item_repository.iter_all(batch_size=2):
+        seen.append(item.getId())
+        if item.getId() == 1:
+            # a writer in the middle of the iteration does not wait for it
+            in_memory_item_repository.delete(4)
+            in_memory_item_repository.create(Item(id=6, name="Item 6", price=1.0))
+
+    assert seen == [1, 2, 3, 5]
+
+
+def test_item_identity_map_shares_unchanged_items() -> None:
+    identity_map = ItemIdentityMap()
+    item = identity_map.get(1, "Milk", Money(199))
+
+    assert identity_map.get(1, "Milk", Money(199)) is item
+    assert identity_map.get(1, "Milk", Money(249)) is not item
+    assert item.getPrice() == Money(199)
+
+
+def test_item_identity_map_forgets_unreferenced_items() -> None:
+    identity_map = ItemIdentityMap()
+    identity_map.get(1, "Milk", Money(199))
+    kept = identity_map.get(2, "Bread", Money(99))
+
+    assert len(identity_map) == 1
+    identity_map.evict(2)
+    assert identity_map.get(2, "Bread", Money(99)) is not kept
+
+
+def test_read_write_lock_lets_readers_share() -> None:
+    lock = ReadWriteLock()
+    inside = threading.Barrier(2, timeout=5)
+
+    def reader() -> None:
+        with lock.read_locked():
+            inside.wait()  # only returns if both readers hold the lock
+
+    threads = [threading.Thread(target=reader) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not inside.broken
+
+
+def test_in_memory_item_repository_concurrent_writers() -> None:
+    repository = InMemoryItemRepository()
+
+    def writer(start: int) -> None:
+        for item_id in range(start, start + 500):
+            repository.create(Item(id=item_id, name="Item", price=1.0))
+            repository.read(item_id)
+
+    threads = [threading.Thread(target=writer, args=(i * 500,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(repository.get_all()) == 2000
+    assert [item.getId() for item in repository.page(limit=3)] == [0, 1, 2]
+
+
+def test_sqlite_migration_stores_legacy_prices_in_cents(tmp_path: Path) -> None:
+    db_name = str(tmp_path / "pos.db")
+    with sqlite3.connect(db_name) as conn:
+        # items table of a database from before versioning, prices in dollars
+        conn.execute(
+            "CREATE TABLE items (item_id INTEGER PRIMARY KEY UNIQUE, "
+            "name TEXT NOT NULL, price REAL NOT NULL)"
+        )
+        conn.execute("INSERT INTO items VALUES (1, 'Milk', 1.99), (2, 'Bread', 0.3)")
+
+    assert SQLiteDBCreator(db_name).migrate()
+
+    with sqlite3.connect(db_name) as conn:
+        rows = conn.execute("SELECT price, typeof(price) FROM items ORDER BY item_id")
+        assert rows.fetchall() == [(199, "integer"), (30, "integer")]
+    item = SQLiteItemRepository(db_name, identity_map=ItemIdentityMap()).read(1)
+    assert item.getPrice().cents == 199
+    assert not SQLiteDBCreator(db_name).migrate()
+
+
+def test_money_from_a_real_column_holds_int_cents() -> None:
+    with sqlite3.connect(":memory:") as conn:
+        (cents,) = conn.execute("SELECT CAST(199 AS REAL)").fetchone()
+
+    assert isinstance(Money(cents).cents, int)
+    assert Money(cents) == Money(199)
+
+
+def test_sqlite_seed_is_only_applied_when_it_changes(tmp_path: Path) -> None:
+    db_name = str(tmp_path / "pos.db")
+    SQLiteDBCreator(db_name).migrate()
+    ItemInitializer.initialize_item_repository(db_name=db_name)
+    with sqlite3.connect(db_name) as conn:
+        conn.execute("UPDATE items SET price = 1 WHERE item_id = 1")
+        conn.execute("UPDATE items SET name = 'Rye' WHERE item_id = 1")
+
+    # unchanged seed, the edited row is left alone
+    item_repo = ItemInitializer.initialize_item_repository(db_name=db_name)
+    assert item_repo.read(1) == Item(id=1, name="Rye", price=Money(1))
+
+    # changed seed, only differing rows are written back
+    with sqlite3.connect(db_name) as conn:
+        conn.execute("UPDATE seed_checksums SET checksum = 'stale'")
+    item_repo = ItemInitializer.initialize_item_repository(db_name=db_name)
+    assert item_repo.read(1) == Item(id=1, name="Bread", price=2.49)
+    assert len(item_repo.get_all()) == 8
+
+
+def test_sqlite_journal_keeps_the_rest_of_a_failed_group(tmp_path: Path) -> None:
+    db_name = str(tmp_path / "pos.db")
+    SQLiteDBCreator(db_name).migrate()
+    journal = SQLiteReceiptJournal(db_name, group_size=3, group_interval=10)
+    milk = Item(id=1, name="Milk", price=2.0)
+
+    # the second receipt 1 of the shift breaks the group's unique constraint
+    for receipt_id in (1, 2, 1):
+        journal.record(Receipt(id=receipt_id, sellables=[milk]))
+    with pytest.raises(sqlite3.IntegrityError):
+        journal.flush()
+    journal.close()
+
+    with sqlite3.connect(db_name) as conn:
+        rows = conn.execute("SELECT receipt_id FROM receipts ORDER BY receipt_id")
+        assert rows.fetchall() == [(1,), (2,)]
+    assert [header[1] for header, _ in journal.failed] == [1]
+
+
+def test_sqlite_journal_flush_returns_when_the_writer_fails(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    db_name = str(tmp_path / "pos.db")
+    SQLiteDBCreator(db_name).migrate()
+    journal = SQLiteReceiptJournal(db_name)
+
+    def fail(*args: object) -> None:
+        raise RuntimeError("disk is gone")
+
+    monkeypatch.setattr(journal, "_write_groups", fail)
+    journal.record(Receipt(id=1, sellables=[Item(id=1, name="Milk", price=2.0)]))
+    with pytest.raises(RuntimeError):
+        journal.flush()
+    journal.close()
+
+    assert len(journal.failed) == 1
@@ -0,0 +1,71 @@
+from typing import List
+
+from database import InMemoryItemRepository
+from discount_rules import DiscountRuleIndex, RuleDiscountRepository
+from entities import NO_ITEM, DiscountRule, Item, PercentageDiscount
+from store_units import DefaultPricingSystem
+
+
+def test_index_resolves_highest_priority_rule() -> None:
+    base = DiscountRule(1, 1, 0.1, start=0, end=100)
+    promo = DiscountRule(2, 1, 0.3, start=20, end=40, priority=1)
+    index = DiscountRuleIndex.build([base, promo])
+
+    assert index.resolve(-1) == (None, 0)
+    assert index.resolve(10) == (base, 20)
+    assert index.resolve(20) == (promo, 40)
+    assert index.resolve(50) == (base, 100)
+    assert index.resolve(100) == (None, float("inf"))
+
+
+def test_index_breaks_priority_ties_by_oldest_rule() -> None:
+    older = DiscountRule(1, 1, 0.1, start=0, end=10)
+    newer = DiscountRule(2, 1, 0.2, start=5, end=10)
+    index = DiscountRuleIndex.build([newer, older])
+
+    assert index.resolve(7) == (older, 10)
+
+
+def test_rule_repository_windows_and_categories() -> None:
+    repository = RuleDiscountRepository(item_categories={1: "dairy", 2: "dairy"})
+    repository.create(DiscountRule(1, 1, 0.1))
+    repository.create(
+        DiscountRule(2, NO_ITEM, 0.25, start=10, end=20, priority=1, category="dairy")
+    )
+
+    assert repository.get_item_discount_at(1, 5) == (0.1, 10)
+    assert repository.get_item_discount_at(1, 15) == (0.25, 20)
+    assert repository.get_item_discount_at(2, 5) == (0.0, 10)
+    assert repository.get_item_discount_at(3, 15) == (0.0, float("inf"))
+
+
+def test_rule_repository_accepts_plain_discounts() -> None:
+    repository = RuleDiscountRepository(clock=lambda: 0.0)
+    repository.create(PercentageDiscount(id=1, item_id=1, percentage=0.2))
+
+    assert repository.get_item_discount(1) == 0.2
+    repository.delete(1)
+    assert repository.get_item_discount(1) == 0.0
+
+
+def test_pricing_system_expires_cached_discount_with_its_window() -> None:
+    now: List[float] = [0.0]
+    repository = RuleDiscountRepository()
+    repository.create(DiscountRule(1, 1, 0.5, start=10, end=20))
+    pricing_system = DefaultPricingSystem(
+        repository, InMemoryItemRepository(), clock=lambda: now[0]
+    )
+
+    prices = []
+    for time in (0.0, 15.0, 25.0):
+        now[0] = time
+        item = pricing_system.manage_discount(Item(id=1, name="Milk", price=10.0))
+        prices.append(item.getPrice())
+    assert prices == [10.0, 5.0, 10.0]
+
+    repository.set_category(1, "dairy")
+    repository.create(
+        DiscountRule(2, NO_ITEM, 0.2, start=0, end=100, priority=1, category="dairy")
+    )
+    item = pricing_system.manage_discount(Item(id=1, name="Milk", price=10.0))
+    assert item.getPrice() == 8.0
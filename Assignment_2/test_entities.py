@@ -1,7 +1,10 @@
+from typing import Dict
+
 from entities import (
     Batch,
     Item,
     ItemPack,
+    Money,
     NoDiscount,
     NoSellable,
     PercentageDiscount,
@@ -65,6 +68,23 @@ def test_receipt_builder() -> None:
     assert receipt.getPrice() == item.getPrice()
 
 
+def test_receipt_builder_consolidates_identical_sellables() -> None:
+    milk = Item(id=1, name="Milk", price=2.5)
+    discounted_milk = Item(id=1, name="Milk", price=2.5)
+    discounted_milk.setDiscountStrategy(PercentageDiscountStrategy(0.2))
+    builder = ReceiptBuilder(id=1)
+    for sellable in [milk, milk, discounted_milk, Item(id=1, name="Milk", price=2.5)]:
+        builder.with_sellable(sellable)
+
+    receipt = builder.build()
+    assert receipt.sellables == [milk, discounted_milk, milk]
+    assert receipt.quantities == [2, 1, 1]
+    assert receipt.getPrice() == Money(950)
+
+    receipt.removeSellable(milk)
+    assert receipt.quantities == [1, 1, 1]
+
+
 def test_item_with_percentage_discount() -> None:
     item = Item(id=1, name="Milk", price=2.5)
     discount_strategy = PercentageDiscountStrategy(0.2)
@@ -96,6 +116,16 @@ def test_item_pack_single_item_with_discount() -> None:
     assert item_pack.getDiscountStrategy() == discount_strategy
 
 
+def test_item_pack_price_leaves_packed_items_discounted() -> None:
+    banana = Item(id=3, name="Banana", price=1.0)
+    banana.setDiscountStrategy(PercentageDiscountStrategy(0.5))
+    item_pack = ItemPack(id=4, sellables=[banana, Item(id=5, name="Kiwi", price=2.0)])
+
+    # packed items are priced without their own discount, shared ones keep it
+    assert item_pack.getPrice() == 3.0
+    assert banana.getPrice() == 0.5
+
+
 def test_item_pack_multiple_items_no_discount() -> None:
     item1 = Item(id=5, name="Orange", price=2.0)
     item2 = Item(id=6, name="Orange", price=2.5)
@@ -117,7 +147,8 @@ def test_item_pack_multiple_items_with_discount() -> None:
 
     assert item_pack.getId() == 10
     assert item_pack.getName() == "Cherry 2 pack"
-    assert item_pack.getPrice() == 1.9125
+    # each discounted line is rounded to cents: 0.85 + 1.0625 -> 0.85 + 1.06
+    assert item_pack.getPrice() == 1.91
     assert item_pack.getDiscountStrategy() == discount_strategy
 
 
@@ -182,3 +213,40 @@ def test_percentage_discount_get_value() -> None:
     discount = PercentageDiscount(id=1, item_id=2, percentage=0.1)
     result = discount.getValue()
     assert result == 0.1
+
+
+def test_money_from_float_is_exact_cents() -> None:
+    assert Money.of(2.49) == Money(249)
+    assert Money.of(3) == Money(300)
+    assert Money.of(0.1) + Money.of(0.2) == Money(30)
+
+
+def test_money_discount_uses_bankers_rounding() -> None:
+    # 50% of 1 cent and 3 cents are exact halves, rounded to the even cent
+    assert Money(1).discounted(0.5) == Money(0)
+    assert Money(3).discounted(0.5) == Money(2)
+    assert Money(249).discounted(0.1) == Money(224)
+
+
+def test_money_compares_and_hashes_like_its_amount() -> None:
+    assert Money(100) == 1
+    assert hash(Money(100)) == hash(1)
+    assert len({Money(100), 1, 1.0}) == 1
+    by_amount: Dict[object, str] = {1: "x", Money(249): "y"}
+    assert by_amount.get(Money(100)) == "x"
+    assert by_amount.get(2.49) == "y"
+    assert Money(1) < 0.5 and 0.5 > Money(1)
+    assert Money(50) <= 0.5 and Money(50) >= 0.5
+    assert Money(249) > Money(100)
+    assert Money(100) != "1"
+
+
+def test_money_formats_like_float() -> None:
+    assert "{:<7.2f}".format(Money(1200)) == "12.00  "
+    assert str(Money(299)) == "2.99"
+
+
+def test_receipt_total_has_no_float_drift() -> None:
+    gums = [Item(id=i, name="Gum", price=0.1) for i in range(10)]
+    receipt = Receipt(id=1, sellables=list(gums))
+    assert receipt.getPrice() == Money(100)
@@ -0,0 +1,116 @@
+from pathlib import Path
+
+import pytest
+
+from database import DoesNotExistError
+from entities import Batch, Item, Receipt
+from event_log import EventLogReceiptJournal, EventReplayer, read_lines
+from store_agents import ShiftSummary
+
+
+def make_journal(tmp_path: Path, snapshot_every: int) -> EventLogReceiptJournal:
+    return EventLogReceiptJournal(
+        str(tmp_path / "receipts.log"),
+        str(tmp_path / "receipts.snapshots"),
+        snapshot_every=snapshot_every,
+    )
+
+
+def record_shifts(journal: EventLogReceiptJournal) -> None:
+    milk = Item(id=1, name="Milk", price=2.0)
+    for shift in range(3):
+        for receipt_id in range(5):
+            journal.record(
+                Receipt(
+                    id=receipt_id,
+                    payment_method="cash" if receipt_id % 2 else "card",
+                    sellables=[milk, Batch(2, shift + 1, milk)],
+                )
+            )
+        journal.end_shift()
+    journal.close()
+
+
+def test_event_log_appends_every_register_action(tmp_path: Path) -> None:
+    journal = make_journal(tmp_path, snapshot_every=1000)
+    receipt = Receipt(id=0, payment_method="cash", sellables=[Item(1, "Milk", 2.0)])
+
+    journal.record(receipt)
+    journal.end_shift()
+    journal.close()
+
+    events = [event for _, event in read_lines(journal.log_name)]
+    assert [event["type"] for event in events] == ["open", "item", "close", "z"]
+    assert [event["seq"] for event in events] == [1, 2, 3, 4]
+    assert events[2]["cents"] == 200
+
+
+def test_replayer_rebuilds_z_reports_from_snapshots(tmp_path: Path) -> None:
+    journal = make_journal(tmp_path, snapshot_every=7)
+    record_shifts(journal)
+    replayer = EventReplayer(journal.log_name, journal.snapshot_name)
+
+    assert replayer.rebuild_z_report(1) == ShiftSummary(
+        5, {"card": 1800, "cash": 1200}, {"Milk": 15}
+    )
+    # the same report without any snapshot
+    no_snapshots = EventReplayer(journal.log_name, str(tmp_path / "missing"))
+    for shift in range(3):
+        expected = no_snapshots.rebuild_z_report(shift)
+        assert replayer.rebuild_z_report(shift) == expected
+
+
+def test_replayer_has_no_z_report_of_an_open_shift(tmp_path: Path) -> None:
+    journal = make_journal(tmp_path, snapshot_every=7)
+    record_shifts(journal)
+    replayer = EventReplayer(journal.log_name, journal.snapshot_name)
+
+    # shift 3 is open, shift 99 never existed
+    for shift in (3, 99):
+        with pytest.raises(DoesNotExistError):
+            replayer.rebuild_z_report(shift)
+
+
+def test_replayer_rebuilds_x_report_at_any_event(tmp_path: Path) -> None:
+    journal = make_journal(tmp_path, snapshot_every=4)
+    record_shifts(journal)
+    replayer = EventReplayer(journal.log_name, journal.snapshot_name)
+
+    # shift 0 has 5 receipts of 4 events each, then the z event (seq 21)
+    assert replayer.rebuild_x_report(8).receipts == 2
+    assert replayer.rebuild_x_report(20) == replayer.rebuild_z_report(0)
+    assert replayer.rebuild_x_report(21) == ShiftSummary()
+
+
+def test_journal_resumes_existing_log(tmp_path: Path) -> None:
+    record_shifts(make_journal(tmp_path, snapshot_every=10))
+
+    journal = make_journal(tmp_path, snapshot_every=10)
+    journal.end_shift()
+    journal.close()
+
+    assert journal.get_state().seq == 3 * 21 + 1
+    assert journal.get_state().shift == 4
+
+
+def test_torn_last_record_is_dropped(tmp_path: Path) -> None:
+    record_shifts(make_journal(tmp_path, snapshot_every=10))
+    log_name = str(tmp_path / "receipts.log")
+    snapshot_name = str(tmp_path / "receipts.snapshots")
+    # a crash in the middle of both writes
+    with open(log_name, "ab") as log:
+        log.write(b'{"seq": 64, "type": "op')
+    with open(snapshot_name, "ab") as snapshots:
+        snapshots.write(b'{"seq": 64, "off')
+
+    replayer = EventReplayer(log_name, snapshot_name)
+    assert replayer.rebuild_state().seq == 3 * 21
+
+    journal = make_journal(tmp_path, snapshot_every=1)
+    journal.end_shift()
+    journal.close()
+
+    events = [event for _, event in read_lines(log_name)]
+    assert [event["seq"] for event in events] == list(range(1, 3 * 21 + 2))
+    assert replayer.rebuild_z_report(2).receipts == 5
+    assert replayer.rebuild_state().shift == 4
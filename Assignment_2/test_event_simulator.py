@@ -0,0 +1,82 @@
+import random
+from typing import List
+
+import pytest
+
+from db_init import BatchRepositoryInitializer, DiscountInitializer, ItemInitializer
+from event_simulator import (
+    ExponentialServiceTime,
+    FixedServiceTime,
+    PerItemServiceTime,
+    ServiceTime,
+    StoreEventSimulator,
+    percentile,
+)
+
+
+def make_simulator(
+    services: List[ServiceTime], arrivals_per_minute: float, open_minutes: float
+) -> StoreEventSimulator:
+    item_repo = ItemInitializer.initialize_item_repository(inmemory=True)
+    batch_repo = BatchRepositoryInitializer.initialize_batch_repository(
+        item_repo, inmemory=True
+    )
+    discount_repo = DiscountInitializer.initialize_discount_repository(inmemory=True)
+    simulator = StoreEventSimulator(
+        item_repo,
+        discount_repo,
+        batch_repo,
+        services=services,
+        arrivals_per_minute=arrivals_per_minute,
+        open_minutes=open_minutes,
+        seed=7,
+    )
+    simulator.setup()
+    return simulator
+
+
+def test_percentile_uses_nearest_rank() -> None:
+    values = [1.0, 2.0, 3.0, 4.0]
+
+    assert percentile(values, 50) == 2.0
+    assert percentile(values, 99) == 4.0
+    assert percentile([], 50) == 0.0
+
+
+def test_every_arrival_is_checked_out() -> None:
+    simulator = make_simulator([FixedServiceTime(2.0)] * 3, 1.0, 8 * 60)
+
+    report = simulator.simulate()
+
+    assert report.customers == simulator.customer_cnt
+    assert sum(lane.served for lane in simulator.lanes) == report.customers
+
+
+def test_single_lane_utilization_matches_offered_load() -> None:
+    simulator = make_simulator([FixedServiceTime(1.0)], 0.5, 24 * 60)
+
+    report = simulator.simulate()
+
+    assert report.utilization[0] == pytest.approx(0.5, abs=0.05)
+    assert report.wait_percentiles[50] <= report.wait_percentiles[90]
+    assert report.wait_percentiles[90] <= report.wait_percentiles[99]
+
+
+def test_more_lanes_shorten_waits() -> None:
+    busy = make_simulator([ExponentialServiceTime(2.0)] * 2, 0.9, 8 * 60).simulate()
+    relaxed = make_simulator([ExponentialServiceTime(2.0)] * 4, 0.9, 8 * 60).simulate()
+
+    assert relaxed.mean_wait < busy.mean_wait
+    assert relaxed.mean_queue_length < busy.mean_queue_length
+    assert busy.max_queue_length > 0
+
+
+def test_seed_reproduces_a_per_item_day() -> None:
+    reports = []
+    for global_seed in (1, 2):
+        # whatever the random module was seeded with
+        random.seed(global_seed)
+        simulator = make_simulator([PerItemServiceTime()] * 2, 2.0, 4 * 60)
+        reports.append(simulator.simulate())
+
+    assert reports[0] == reports[1]
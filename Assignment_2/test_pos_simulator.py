@@ -0,0 +1,102 @@
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from db_init import BatchRepositoryInitializer, DiscountInitializer, ItemInitializer
+from pos_simulator import PosSimulator
+from printer import InMemoryPrinterOutput, NoPrinterOutput, Printer
+from real_database import SQLiteDBCreator, SQLiteReceiptJournal
+from store_agents import PolicyConsole
+
+
+def test_headless_simulation_runs_requested_customers() -> None:
+    item_repo = ItemInitializer.initialize_item_repository(inmemory=True)
+    batch_repo = BatchRepositoryInitializer.initialize_batch_repository(
+        item_repo, inmemory=True
+    )
+    discount_repo = DiscountInitializer.initialize_discount_repository(inmemory=True)
+    output = InMemoryPrinterOutput()
+    simulator = PosSimulator(
+        item_repo,
+        discount_repo,
+        batch_repo,
+        console=PolicyConsole(x_report_every=2, end_shift_after=1),
+        printer=Printer(output),
+    )
+    simulator.setup()
+
+    simulator.simulate(customers=250)
+
+    assert simulator.customer_cnt == 250
+    assert simulator.store_manager.get_shift_num() == 2
+    assert sum(line.startswith("Cash Revenue") for line in output.get_lines()) == 6
+
+
+def test_headless_simulation_serves_customers_on_several_lanes() -> None:
+    item_repo = ItemInitializer.initialize_item_repository(inmemory=True)
+    batch_repo = BatchRepositoryInitializer.initialize_batch_repository(
+        item_repo, inmemory=True
+    )
+    discount_repo = DiscountInitializer.initialize_discount_repository(inmemory=True)
+    output = InMemoryPrinterOutput()
+    simulator = PosSimulator(
+        item_repo,
+        discount_repo,
+        batch_repo,
+        console=PolicyConsole(x_report_every=2, end_shift_after=1),
+        printer=Printer(output),
+        lanes=4,
+    )
+    simulator.setup()
+
+    simulator.simulate(customers=250)
+
+    assert simulator.customer_cnt == 250
+    assert simulator.store_manager.get_shift_num() == 2
+    receipts = sum(line.startswith("Total") for line in output.get_lines())
+    assert receipts == 250
+
+
+def test_lanes_journal_receipts_under_unique_ids(tmp_path: Path) -> None:
+    db_name = str(tmp_path / "pos.db")
+    SQLiteDBCreator(db_name).migrate()
+    item_repo = ItemInitializer.initialize_item_repository(inmemory=True)
+    batch_repo = BatchRepositoryInitializer.initialize_batch_repository(
+        item_repo, inmemory=True
+    )
+    discount_repo = DiscountInitializer.initialize_discount_repository(inmemory=True)
+    journal = SQLiteReceiptJournal(db_name)
+    simulator = PosSimulator(
+        item_repo,
+        discount_repo,
+        batch_repo,
+        console=PolicyConsole(x_report_every=2, end_shift_after=1),
+        printer=Printer(NoPrinterOutput()),
+        journal=journal,
+        lanes=4,
+    )
+    simulator.setup()
+
+    simulator.simulate(customers=250)
+    journal.close()
+
+    assert journal.error is None
+    assert journal.failed == []
+    with sqlite3.connect(db_name) as conn:
+        (receipts,) = conn.execute("SELECT COUNT(*) FROM receipts").fetchone()
+    assert receipts == 250
+
+
+def test_columnar_shift_needs_a_single_lane() -> None:
+    item_repo = ItemInitializer.initialize_item_repository(inmemory=True)
+    batch_repo = BatchRepositoryInitializer.initialize_batch_repository(
+        item_repo, inmemory=True
+    )
+    discount_repo = DiscountInitializer.initialize_discount_repository(inmemory=True)
+    simulator = PosSimulator(
+        item_repo, discount_repo, batch_repo, columnar_shift=True, lanes=4
+    )
+
+    with pytest.raises(ValueError):
+        simulator.setup()
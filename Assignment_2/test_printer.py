@@ -0,0 +1,140 @@
+import gzip
+from pathlib import Path
+
+import pytest
+
+from database import InMemoryItemRepository
+from entities import Batch, Item, Money, PercentageDiscountStrategy, Receipt
+from printer import (
+    BufferedFilePrinterOutput,
+    ConsolePrinterOutput,
+    InMemoryPrinterOutput,
+    NoPrinterOutput,
+    Printer,
+)
+
+EXPECTED_RECEIPT = (
+    "\n"
+    "Product         | Units   | Price   | Total   \n"
+    "---------------------------------------------\n"
+    "Milk            | 1       | $4.99   | $4.99   \n"
+    "Mineral Water   | 4       | $3.00   | $12.00  \n"
+    "---------------------------------------------\n"
+    "Total                          $16.99  \n"
+    "\n"
+)
+
+
+def make_receipt() -> Receipt:
+    milk = Item(id=1, name="Milk", price=4.99)
+    water = Item(id=2, name="Mineral Water", price=3.00)
+    return Receipt(id=1, sellables=[milk, Batch(id=3, amount=4, item_type=water)])
+
+
+def test_printer_prints_receipt_to_console(capsys: pytest.CaptureFixture[str]) -> None:
+    Printer().print_receipt(make_receipt())
+
+    assert capsys.readouterr().out == EXPECTED_RECEIPT
+
+
+def test_printer_prices_consolidated_line_once() -> None:
+    milk = Item(id=1, name="Milk", price=4.99)
+    receipt = Receipt(id=1, sellables=[milk], quantities=[3])
+
+    lines = Printer().render_receipt(receipt).splitlines()
+
+    assert lines[3] == "Milk            | 3       | $4.99   | $14.97  "
+    assert lines[-2] == "Total                          $14.97  "
+
+
+def test_printer_prices_discounted_batch_units() -> None:
+    water = Item(id=2, name="Mineral Water", price=2.00)
+    pack = Batch(id=3, amount=3, item_type=water)
+    pack.setDiscountStrategy(PercentageDiscountStrategy(0.5))
+    receipt = Receipt(id=1, sellables=[pack])
+
+    lines = Printer().render_receipt(receipt).splitlines()
+
+    assert lines[3] == "Mineral Water   | 3       | $1.00   | $3.00   "
+    assert lines[-2] == "Total                          $3.00   "
+
+
+def test_printer_writes_x_report_to_in_memory_output() -> None:
+    output = InMemoryPrinterOutput()
+
+    Printer(output).print_x_report(Money(1000), Money(550), {"Milk": 2})
+
+    lines = output.get_lines()
+    assert lines[2] == "Milk            | 2         "
+    assert lines[-2] == "Cash Revenue    $10.00     "
+    assert lines[-1] == "Card Revenue    $5.50      "
+
+
+def test_printer_writes_one_document_per_receipt() -> None:
+    output = InMemoryPrinterOutput()
+
+    Printer(output).print_receipt(make_receipt())
+
+    assert output.documents == [EXPECTED_RECEIPT]
+
+
+def test_printer_with_no_output_prints_nothing(
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    Printer(NoPrinterOutput()).print_receipt(make_receipt())
+
+    assert capsys.readouterr().out == ""
+
+
+def test_console_output_batches_documents(capsys: pytest.CaptureFixture[str]) -> None:
+    printer = Printer(ConsolePrinterOutput(batch_documents=2))
+
+    printer.print_receipt(make_receipt())
+    assert capsys.readouterr().out == ""
+
+    printer.print_receipt(make_receipt())
+    assert capsys.readouterr().out == EXPECTED_RECEIPT * 2
+
+
+def test_buffered_file_output_writes_on_flush(tmp_path: Path) -> None:
+    file_name = str(tmp_path / "receipts.txt")
+    output = BufferedFilePrinterOutput(file_name, batch_documents=100)
+
+    Printer(output).print_receipt(make_receipt())
+    assert not Path(file_name).exists()
+
+    output.close()
+    assert Path(file_name).read_text() == EXPECTED_RECEIPT
+
+
+def test_buffered_file_output_rotates_gzip_segments(tmp_path: Path) -> None:
+    file_name = str(tmp_path / "receipts.txt")
+    output = BufferedFilePrinterOutput(
+        file_name, batch_documents=1, compress=True, rotate_size=1
+    )
+    printer = Printer(output)
+
+    printer.print_receipt(make_receipt())
+    printer.print_receipt(make_receipt())
+    output.close()
+
+    for segment in range(2):
+        with gzip.open(f"{file_name}.{segment}.gz", "rt") as file:
+            assert file.read() == EXPECTED_RECEIPT
+
+
+def test_printer_streams_item_listing_in_batches() -> None:
+    item_repo = InMemoryItemRepository()
+    for item_id in range(1, 6):
+        item_repo.create(Item(id=item_id, name=f"Item {item_id}", price=1.0))
+    output = InMemoryPrinterOutput()
+
+    Printer(output).print_items(item_repo, batch_size=2)
+
+    # header, three batches of lines and the footer
+    assert len(output.documents) == 5
+    assert output.get_lines()[0] == "Items:"
+    assert output.get_lines()[1:6] == [
+        f"ID: {item_id}, Name: Item {item_id}, Price: 1.0" for item_id in range(1, 6)
+    ]
+    assert output.get_lines()[6] == "-" * 50
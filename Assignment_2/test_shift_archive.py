@@ -0,0 +1,94 @@
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from entities import Batch, Item, Receipt
+from shift_archive import ShiftArchive, ShiftArchiveJournal
+
+pytest.importorskip("numpy")
+
+BREAD = Item(id=1, name="Bread", price=2.0)
+MILK = Item(id=2, name="Milk", price=1.5)
+WATER = Item(id=3, name="Water", price=1.0)
+
+
+@pytest.fixture
+def archive_dir(tmp_path: Path) -> str:
+    # two shifts, the receipts of shift i close at times 10 * i, 10 * i + 1, ...
+    now = [0.0]
+    journal = ShiftArchiveJournal(str(tmp_path / "archive"), clock=lambda: now[0])
+    shifts: List[List[Receipt]] = [
+        [
+            Receipt(1, "cash", [BREAD, MILK], quantities=[2, 1]),
+            Receipt(2, "card", [MILK, Batch(7, 6, WATER)]),
+        ],
+        [
+            Receipt(1, "card", [BREAD, WATER]),
+            Receipt(2, "cash", [Batch(7, 6, WATER)]),
+        ],
+    ]
+    for shift, receipts in enumerate(shifts):
+        for offset, receipt in enumerate(receipts):
+            now[0] = 10.0 * shift + offset
+            journal.record(receipt)
+        journal.end_shift()
+    journal.close()
+    return journal.directory
+
+
+def test_top_products_over_all_shifts(archive_dir: str) -> None:
+    archive = ShiftArchive(archive_dir)
+
+    assert archive.top_products(2) == [("Water", 13), ("Bread", 3)]
+    assert archive.top_products(10, start=10.0) == [("Water", 7), ("Bread", 1)]
+
+
+def test_revenue_by_payment_over_time_range(archive_dir: str) -> None:
+    archive = ShiftArchive(archive_dir)
+
+    assert archive.revenue_by_payment() == {"cash": 1150, "card": 1050}
+    assert archive.revenue_by_payment(start=1.0, end=11.0) == {"card": 1050}
+
+
+def test_bought_with_counts_shared_baskets(archive_dir: str) -> None:
+    archive = ShiftArchive(archive_dir)
+
+    assert archive.bought_with("Milk") == [("Bread", 1), ("Water", 1)]
+    assert archive.bought_with("Water") == [("Bread", 1), ("Milk", 1)]
+    assert archive.bought_with("Coffee") == []
+
+
+def test_archive_picks_up_new_shifts(archive_dir: str) -> None:
+    archive = ShiftArchive(archive_dir)
+    archive.top_products()
+
+    journal = ShiftArchiveJournal(archive_dir, clock=lambda: 100.0)
+    journal.record(Receipt(1, "cash", [Item(id=9, name="Coffee", price=5.0)]))
+    journal.close()
+
+    assert ShiftArchive(archive_dir).revenue_by_payment(start=100.0) == {"cash": 500}
+    assert archive.top_products(1, start=100.0) == [("Coffee", 1)]
+
+
+def test_archive_queries_a_year_of_shifts_with_few_open_files(tmp_path: Path) -> None:
+    resource = pytest.importorskip("resource")
+    # four shifts a day for a year
+    now = [0.0]
+    journal = ShiftArchiveJournal(str(tmp_path / "archive"), clock=lambda: now[0])
+    shifts = 4 * 365
+    for shift in range(shifts):
+        now[0] = float(shift)
+        journal.record(Receipt(1, "cash", [BREAD, MILK]))
+        journal.end_shift()
+
+    # far fewer file descriptors than the archive has shifts
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (min(256, soft), hard))
+    try:
+        archive = ShiftArchive(journal.directory)
+        assert archive.revenue_by_payment() == {"cash": shifts * 350}
+        assert archive.top_products(1) == [("Bread", shifts)]
+        assert archive.revenue_by_payment(start=4.0, end=8.0) == {"cash": 4 * 350}
+    finally:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (soft, hard))
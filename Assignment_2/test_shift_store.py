@@ -0,0 +1,114 @@
+from typing import List, Sequence
+
+from entities import (
+    Batch,
+    Item,
+    PercentageDiscountStrategy,
+    Receipt,
+    ReceiptDiscountStrategy,
+)
+from shift_store import ColumnarShiftStore
+from store_agents import TransactionAnalyzer
+from store_units import CashRegister, ColumnarCashRegister
+
+
+def make_receipts() -> List[Receipt]:
+    bread = Item(id=1, name="Bread", price=2.49)
+    bread.setDiscountStrategy(PercentageDiscountStrategy(0.1))
+    water = Item(id=4, name="Mineral Water", price=0.99)
+    water_pack = Batch(id=3, amount=5, item_type=water)
+    water_pack.setDiscountStrategy(PercentageDiscountStrategy(0.15))
+    return [
+        Receipt(id=1, payment_method="cash", sellables=[bread, water_pack]),
+        Receipt(
+            id=2,
+            payment_method="card",
+            sellables=[Item(id=3, name="Milk", price=1.99), bread],
+            discount_strategy=ReceiptDiscountStrategy(customer_id=3),
+        ),
+    ]
+
+
+def test_snapshot_rebuilds_equivalent_receipts() -> None:
+    receipts = make_receipts()
+    store = ColumnarShiftStore()
+    for receipt in receipts:
+        store.append(receipt)
+
+    snapshot = store.snapshot()
+    assert len(snapshot) == 2
+    for original, view in zip(receipts, snapshot):
+        assert view.getId() == original.getId()
+        assert view.get_payment_method() == original.get_payment_method()
+        assert view.getPrice() == original.getPrice()
+        assert [s.getName() for s in view.sellables] == [
+            s.getName() for s in original.sellables
+        ]
+    assert snapshot[-1].getPrice() == receipts[-1].getPrice()
+
+
+def test_analyzer_aggregates_columns_like_receipts() -> None:
+    receipts = make_receipts()
+    store = ColumnarShiftStore()
+    for receipt in receipts:
+        store.append(receipt)
+
+    from_receipts = TransactionAnalyzer()
+    from_receipts.analyze_transactions(receipts)
+    from_columns = TransactionAnalyzer()
+    from_columns.analyze_transactions(store.snapshot())
+
+    assert from_columns == from_receipts
+
+
+def test_snapshot_keeps_consolidated_lines() -> None:
+    water = Item(id=4, name="Mineral Water", price=0.99)
+    receipt = Receipt(
+        id=1,
+        payment_method="cash",
+        sellables=[water, Batch(id=3, amount=5, item_type=water)],
+        quantities=[3, 2],
+    )
+    store = ColumnarShiftStore()
+    store.append(receipt)
+
+    view = store.snapshot()[0]
+    assert view.getPrice() == receipt.getPrice()
+    from_receipts = TransactionAnalyzer()
+    from_receipts.analyze_transactions([receipt])
+    from_columns = TransactionAnalyzer()
+    from_columns.analyze_transactions(store.snapshot())
+    assert from_columns == from_receipts
+    assert from_columns.get_product_sales() == {"Mineral Water": 13}
+
+
+def test_snapshot_survives_clear() -> None:
+    store = ColumnarShiftStore()
+    store.append(make_receipts()[0])
+    snapshot = store.snapshot()
+
+    store.clear()
+    store.append(make_receipts()[1])
+
+    assert len(store) == 1
+    assert [receipt.getId() for receipt in snapshot] == [1]
+
+
+def test_columnar_cash_register_notifies_with_snapshot() -> None:
+    seen: List[int] = []
+
+    class Observer:
+        def update_x(self, transactions: Sequence[Receipt]) -> None:
+            seen.append(len(transactions))
+
+        def update_z(self) -> None:
+            pass
+
+    cash_register = ColumnarCashRegister()
+    cash_register.add_observer(Observer())
+    for _ in range(CashRegister.ENTRIES_FOR_X_REPORT):
+        cash_register.close_receipt(make_receipts()[0])
+
+    assert seen == [CashRegister.ENTRIES_FOR_X_REPORT]
+    cash_register.clear()
+    assert cash_register.get_transaction_cnt() == 0
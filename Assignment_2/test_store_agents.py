@@ -7,17 +7,29 @@ from database import (
     InMemoryDiscountRepository,
     InMemoryItemRepository,
 )
-from entities import Batch, Item, NoReceipt, Receipt
+from entities import Batch, Item, NoReceipt, PercentageDiscount, Receipt
 from store_agents import (
+    AliasProductSampler,
     DefaultCashier,
     DefaultCustomer,
+    END_SHIFT_PROMPT,
+    X_REPORT_PROMPT,
     DefaultStoreManager,
     NoCashier,
     NoCustomer,
+    PolicyConsole,
     TestConsole,
     TransactionAnalyzer,
+    sales_weights,
+    zipf_weights,
+)
+from printer import NoPrinterOutput, Printer
+from store_units import (
+    CashRegister,
+    DefaultCatalog,
+    DefaultPricingSystem,
+    InMemoryCashRegister,
 )
-from store_units import DefaultCatalog, DefaultPricingSystem, InMemoryCashRegister
 
 
 def test_no_cashier_open_receipt() -> None:
@@ -83,6 +95,25 @@ def test_default_cashier_register_item() -> None:
     assert cashier.curr_receipt.sellables[0] == sellable
 
 
+def test_default_cashier_register_items() -> None:
+    discount_repository = InMemoryDiscountRepository()
+    discount_repository.create(PercentageDiscount(id=1, item_id=1, percentage=0.5))
+    pricing_system = DefaultPricingSystem(
+        discount_repository=discount_repository,
+        item_repository=InMemoryItemRepository(),
+    )
+    cashier = DefaultCashier(pricing_system=pricing_system)
+
+    cart = [Item(id=1, name="Test Item", price=10.0), Item(id=2, name="Other", price=4)]
+    cashier.register_items(cart)
+
+    sellables = cashier.curr_receipt.sellables
+    assert [sellable.getName() for sellable in sellables] == ["Test Item", "Other"]
+    assert [sellable.getPrice() for sellable in sellables] == [5.0, 4.0]
+    # the cart keeps the catalog's undiscounted items
+    assert [sellable.getPrice() for sellable in cart] == [10.0, 4.0]
+
+
 def test_default_cashier_show_receipt() -> None:
     pricing_system = DefaultPricingSystem(
         discount_repository=InMemoryDiscountRepository(),
@@ -239,6 +270,41 @@ def test_default_customer_pay() -> None:
     assert payment_method == "cash"
 
 
+def test_default_customer_pick_weighted_products() -> None:
+    catalog = DefaultCatalog(
+        item_repo=InMemoryItemRepository(), batch_repo=InMemoryBatchRepository()
+    )
+    catalog.item_repo.create(Item(id=1, name="Test Item 1", price=10.0))
+    catalog.item_repo.create(Item(id=2, name="Test Item 2", price=20.0))
+    sampler = AliasProductSampler(weights=sales_weights({"Test Item 2": 5}))
+    customer = DefaultCustomer(catalog=catalog, product_sampler=sampler)
+
+    customer.pick_random_products(10)
+
+    assert len(customer.get_cart_items()) == 10
+    assert all(item.getId() == 2 for item in customer.get_cart_items())
+
+
+def test_alias_product_sampler_rebuilds_on_weight_change() -> None:
+    items = (Item(id=1, name="A", price=1.0), Item(id=2, name="B", price=1.0))
+    sampler = AliasProductSampler(weights=sales_weights({"A": 1}))
+
+    assert all(item.getName() == "A" for item in sampler.sample(items, 10))
+
+    sampler.set_weights(sales_weights({"B": 1}))
+    assert all(item.getName() == "B" for item in sampler.sample(items, 10))
+
+
+def test_alias_product_sampler_follows_zipf_weights() -> None:
+    items = tuple(Item(id=i, name=str(i), price=1.0) for i in range(1, 4))
+    sampler = AliasProductSampler(weights=zipf_weights())
+
+    picked = sampler.sample(items, 3000)
+    counts = [sum(1 for item in picked if item is target) for target in items]
+
+    assert counts[0] > counts[1] > counts[2] > 0
+
+
 # ===========================================================================================================#
 #  NoStoreManager Tests
 # ===========================================================================================================#
@@ -292,15 +358,36 @@ def test_store_manager_console_interaction() -> None:
     test_console = TestConsole(val=True)
     register = InMemoryCashRegister()
     cashier = DefaultCashier(cash_register=register)
-    manager = DefaultStoreManager(console=test_console, cashier=cashier)
+    manager = DefaultStoreManager(
+        console=test_console, cashier=cashier, printer=Printer(NoPrinterOutput())
+    )
+    register.add_observer(manager)
 
     # Add some values to CashRegister
     item = Item(id=1, name="Test Item", price=10.0)
     batch = Batch(id=2, amount=3, item_type=item)
-    register.close_receipt(Receipt(sellables=[item, batch], id=1))
-    manager.update_z()
-    assert register.get_transaction_cnt() == 1
+    for receipt_id in range(CashRegister.ENTRIES_FOR_Z_REPORT - 1):
+        register.close_receipt(Receipt(sellables=[item, batch], id=receipt_id))
     assert manager.shift_cnt == 0
-    manager.update_z()
+
+    # the register ends the shift at its Z report, the manager counts it
+    register.close_receipt(Receipt(sellables=[item], id=99))
     assert register.get_transaction_cnt() == 0
     assert manager.shift_cnt == 1
+
+
+def test_policy_console_follows_report_policy() -> None:
+    console = PolicyConsole(x_report_every=2, end_shift_after=3)
+
+    assert [console.read_bool(X_REPORT_PROMPT) for _ in range(4)] == [
+        False,
+        True,
+        False,
+        True,
+    ]
+    assert [console.read_bool(END_SHIFT_PROMPT) for _ in range(4)] == [
+        False,
+        False,
+        True,
+        False,
+    ]
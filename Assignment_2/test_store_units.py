@@ -1,5 +1,7 @@
+import threading
+import time
 from dataclasses import dataclass, field
-from typing import List
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
 
 import pytest
 
@@ -11,7 +13,17 @@ from database import (
     InMemoryItemRepository,
     ItemRepository,
 )
-from entities import Batch, Item, NoDiscount, NoSellable, PercentageDiscount, Receipt
+from entities import (
+    Batch,
+    Item,
+    Money,
+    NoDiscount,
+    NoSellable,
+    PercentageDiscount,
+    Receipt,
+)
+from printer import NoPrinterOutput, Printer
+from store_agents import DefaultCashier
 from store_units import (
     CashRegister,
     CashRegisterObserver,
@@ -20,6 +32,10 @@ from store_units import (
     InMemoryCashRegister,
     NoCatalog,
     NoPricingSystem,
+    ObserverDispatcher,
+    StripedCashRegister,
+    SynchronousObserverDispatcher,
+    ThreadedObserverDispatcher,
 )
 
 
@@ -180,6 +196,75 @@ def test_browse_catalog_error_handling(
     assert len(catalog_items) == 0
 
 
+def test_browse_catalog_reuses_snapshot(
+    item_repo: ItemRepository, batch_repo: BatchRepository
+) -> None:
+    catalog = DefaultCatalog(item_repo=item_repo, batch_repo=batch_repo)
+    item_repo.create(Item(id=1, name="Milk", price=2.99))
+
+    first = catalog.browse_catalog()
+    second = catalog.browse_catalog()
+
+    assert first is second
+
+
+def test_browse_catalog_refreshes_after_mutation(
+    item_repo: ItemRepository, batch_repo: BatchRepository
+) -> None:
+    catalog = DefaultCatalog(item_repo=item_repo, batch_repo=batch_repo)
+    milk = Item(id=1, name="Milk", price=2.99)
+    item_repo.create(milk)
+    assert len(catalog.browse_catalog()) == 1
+
+    batch_repo.create(Batch(id=2, amount=6, item_type=milk))
+    assert len(catalog.browse_catalog()) == 2
+
+    item_repo.delete(1)
+    assert len(catalog.browse_catalog()) == 1
+
+
+def test_discount_change_keeps_closed_receipts_priced(
+    item_repo: ItemRepository, batch_repo: BatchRepository
+) -> None:
+    item_repo.create(Item(id=1, name="Bread", price=10.0))
+    batch_repo.create(Batch(id=2, amount=2, item_type=item_repo.read(1)))
+    discount_repo = InMemoryDiscountRepository()
+    discount_repo.create(PercentageDiscount(id=1, item_id=1, percentage=0.1))
+    catalog = DefaultCatalog(item_repo=item_repo, batch_repo=batch_repo)
+    cashier = DefaultCashier(
+        InMemoryCashRegister(),
+        DefaultPricingSystem(discount_repo, item_repo),
+        printer=Printer(NoPrinterOutput()),
+    )
+
+    # customer 1 gets no receipt discount, only the bread discount applies
+    cashier.open_receipt(1)
+    cashier.register_items(catalog.browse_catalog())
+    closed = cashier.close_receipt("cash")
+    assert closed.getPrice() == 27.0
+
+    discount_repo.update(PercentageDiscount(id=1, item_id=1, percentage=0.5))
+    cashier.open_receipt(1)
+    cashier.register_items(catalog.browse_catalog())
+
+    assert cashier.close_receipt("cash").getPrice() == 15.0
+    assert closed.getPrice() == 27.0
+    assert [sellable.getPrice() for sellable in catalog.browse_catalog()] == [10, 20]
+
+
+def test_iter_catalog_streams_items_and_batches(
+    item_repo: ItemRepository, batch_repo: BatchRepository
+) -> None:
+    item = Item(id=1, name="Test Item", price=10.0)
+    batch = Batch(id=2, amount=3, item_type=item)
+    item_repo.create(item)
+    batch_repo.create(batch)
+    catalog = DefaultCatalog(item_repo=item_repo, batch_repo=batch_repo)
+
+    assert list(catalog.iter_catalog(batch_size=1)) == [item, batch]
+    assert list(NoCatalog().iter_catalog()) == []
+
+
 # ===========================================================================================================#
 # NoCatalog Tests
 # ===========================================================================================================#
@@ -267,6 +352,94 @@ def test_default_pricing_system_manage_discount_no_discount() -> None:
     assert isinstance(result_item.getDiscountStrategy(), NoDiscount)
 
 
+def test_default_pricing_system_warm_cache_skips_repository() -> None:
+    discount_repository = CountingDiscountRepository()
+    discount_repository.create(PercentageDiscount(id=1, item_id=1, percentage=0.1))
+    default_pricing_system = DefaultPricingSystem(
+        discount_repository=discount_repository,
+        item_repository=InMemoryItemRepository(),
+    )
+
+    item = Item(id=1, name="Test Item", price=10.0)
+    first = default_pricing_system.manage_discount(item)
+    second = default_pricing_system.manage_discount(item)
+    default_pricing_system.manage_discount(Batch(id=2, amount=3, item_type=item))
+
+    assert discount_repository.lookups == 1
+    assert first.getDiscountStrategy() is second.getDiscountStrategy()
+
+
+def test_default_pricing_system_invalidates_changed_discount() -> None:
+    discount_repository = CountingDiscountRepository()
+    discount_repository.create(PercentageDiscount(id=1, item_id=1, percentage=0.1))
+    default_pricing_system = DefaultPricingSystem(
+        discount_repository=discount_repository,
+        item_repository=InMemoryItemRepository(),
+    )
+    default_pricing_system.manage_discount(Item(id=1, name="Test Item", price=10.0))
+    default_pricing_system.manage_discount(Item(id=2, name="Other Item", price=5.0))
+
+    discount_repository.update(PercentageDiscount(id=1, item_id=1, percentage=0.5))
+    item = default_pricing_system.manage_discount(
+        Item(id=1, name="Test Item", price=10.0)
+    )
+    default_pricing_system.manage_discount(Item(id=2, name="Other Item", price=5.0))
+    assert item.getPrice() == 5.0
+    assert discount_repository.lookups == 3
+
+    discount_repository.delete(1)
+    item = default_pricing_system.manage_discount(
+        Item(id=1, name="Test Item", price=10.0)
+    )
+    assert item.getPrice() == 10.0
+
+
+def test_discount_repository_does_not_keep_pricing_systems_alive() -> None:
+    discount_repository = InMemoryDiscountRepository()
+    for _ in range(3):
+        DefaultPricingSystem(
+            discount_repository=discount_repository,
+            item_repository=InMemoryItemRepository(),
+        )
+
+    assert len(discount_repository.observers) == 0
+
+
+def test_default_pricing_system_prices_cart_with_one_lookup() -> None:
+    discount_repository = CountingDiscountRepository()
+    discount_repository.create(PercentageDiscount(id=1, item_id=1, percentage=0.1))
+    default_pricing_system = DefaultPricingSystem(
+        discount_repository=discount_repository,
+        item_repository=InMemoryItemRepository(),
+    )
+    cart = [
+        Item(id=1, name="Test Item", price=10.0),
+        Item(id=2, name="Other Item", price=5.0),
+        Batch(id=3, amount=2, item_type=Item(id=1, name="Test Item", price=10.0)),
+    ]
+
+    priced = default_pricing_system.manage_discounts(cart)
+    default_pricing_system.manage_discounts(cart)
+
+    assert [sellable.getPrice() for sellable in priced] == [9.0, 5.0, 18.0]
+    assert discount_repository.bulk_lookups == 1
+    assert discount_repository.lookups == 0
+
+
+@dataclass
+class CountingDiscountRepository(InMemoryDiscountRepository):
+    lookups: int = 0
+    bulk_lookups: int = 0
+
+    def get_item_discount(self, item_id: int) -> float:
+        self.lookups += 1
+        return super().get_item_discount(item_id)
+
+    def get_item_discounts(self, item_ids: Iterable[int]) -> Dict[int, float]:
+        self.bulk_lookups += 1
+        return super().get_item_discounts(item_ids)
+
+
 # ===========================================================================================================#
 # NoPricingSystem Tests
 # ===========================================================================================================#
@@ -386,18 +559,194 @@ def test_in_memory_cash_register_notify_observers_z_report() -> None:
         receipt = Receipt(id=1, sellables=[Item(id=1, name="Test Item", price=10.0)])
         cash_register.close_receipt(receipt)
 
-    assert observer.transactions == cash_register.transactions
+    # the register ends the shift, observers get the snapshot of it
+    assert len(observer.transactions) == CashRegister.ENTRIES_FOR_Z_REPORT
+    assert not cash_register.transactions
     m = observer.z_report_called
     assert m == 1
 
 
+def test_in_memory_cash_register_journals_receipts() -> None:
+    journal = MockReceiptJournal()
+    cash_register = InMemoryCashRegister(journal=journal)
+    receipt = Receipt(id=1, sellables=[Item(id=1, name="Test Item", price=10.0)])
+
+    cash_register.close_receipt(receipt)
+    assert journal.recorded == [receipt]
+    assert journal.shifts_ended == 0
+
+    cash_register.clear()
+    assert journal.shifts_ended == 1
+
+
+def test_threaded_dispatcher_does_not_block_close_receipt() -> None:
+    observer = BlockingCashRegisterObserver()
+    dispatcher = ThreadedObserverDispatcher()
+    cash_register = InMemoryCashRegister(dispatcher=dispatcher)
+    cash_register.add_observer(observer)
+    receipt = Receipt(id=1, sellables=[Item(id=1, name="Test Item", price=10.0)])
+
+    # the worker is stuck in the first X report, the two after it coalesce
+    for _ in range(3 * CashRegister.ENTRIES_FOR_X_REPORT):
+        cash_register.close_receipt(receipt)
+        if cash_register.get_transaction_cnt() == CashRegister.ENTRIES_FOR_X_REPORT:
+            assert observer.started.wait(timeout=5)
+    observer.release.set()
+    dispatcher.drain()
+
+    assert dispatcher.coalesced == 1
+    assert observer.snapshot_sizes == [20, 60]
+
+
+def test_threaded_dispatcher_delivers_z_report_in_order() -> None:
+    observer = BlockingCashRegisterObserver()
+    observer.release.set()
+    dispatcher = ThreadedObserverDispatcher(max_pending=5, coalesce=False)
+    cash_register = InMemoryCashRegister(dispatcher=dispatcher)
+    cash_register.add_observer(observer)
+    receipt = Receipt(id=1, sellables=[Item(id=1, name="Test Item", price=10.0)])
+
+    for _ in range(CashRegister.ENTRIES_FOR_Z_REPORT):
+        cash_register.close_receipt(receipt)
+    dispatcher.close()
+
+    assert observer.snapshot_sizes == [20, 40, 60, 80, 100]
+    assert observer.z_reports == 1
+
+
+@pytest.mark.parametrize("register", [InMemoryCashRegister, StripedCashRegister])
+def test_threaded_dispatcher_does_not_block_close_receipt_at_z_report(
+    register: Callable[..., CashRegister]
+) -> None:
+    dispatcher = ThreadedObserverDispatcher()
+    cash_register = register(dispatcher=dispatcher)
+    observer = ShiftTotalsObserver(z_delay=0.3)
+    cash_register.add_observer(observer)
+    receipt = Receipt(id=1, sellables=[Item(id=1, name="Test Item", price=10.0)])
+
+    latencies: List[float] = []
+    for _ in range(2 * CashRegister.ENTRIES_FOR_Z_REPORT + 1):
+        start = time.perf_counter()
+        cash_register.close_receipt(receipt)
+        latencies.append(time.perf_counter() - start)
+    # both shifts ended before their slow Z reports were delivered
+    assert cash_register.get_transaction_cnt() == 1
+    assert max(latencies) < 0.1
+    dispatcher.close()
+
+    assert observer.shift_receipts == [CashRegister.ENTRIES_FOR_Z_REPORT] * 2
+    assert observer.z_thread not in (None, threading.current_thread())
+
+
+@pytest.mark.parametrize(
+    "dispatcher", [SynchronousObserverDispatcher, ThreadedObserverDispatcher]
+)
+def test_striped_cash_register_reports_every_receipt_once(
+    dispatcher: Callable[[], ObserverDispatcher]
+) -> None:
+    cash_register = StripedCashRegister(stripe_cnt=4, dispatcher=dispatcher())
+    observer = ShiftTotalsObserver()
+    cash_register.add_observer(observer)
+
+    def cashier(lane: int) -> None:
+        for number in range(250):
+            item = Item(id=lane, name=f"Item {lane}", price=float(number % 7 + 1))
+            cash_register.close_receipt(Receipt(id=number, sellables=[item]))
+
+    threads = [threading.Thread(target=cashier, args=(lane,)) for lane in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # end the last shift as well
+    cash_register.notify_observers(z_report=True)
+    cash_register.dispatcher.close()
+
+    assert sum(observer.shift_receipts) == 8 * 250
+    revenue = 8 * sum(float(number % 7 + 1) for number in range(250))
+    assert sum(observer.shift_revenue) == pytest.approx(revenue)
+    # a shift can run past its threshold, but never ends early
+    for receipts in observer.shift_receipts[:-1]:
+        assert receipts >= CashRegister.ENTRIES_FOR_Z_REPORT
+    assert cash_register.get_transaction_cnt() == 0
+
+
+def test_striped_cash_register_clear() -> None:
+    journal = MockReceiptJournal()
+    cash_register = StripedCashRegister(journal=journal)
+    receipt = Receipt(id=1, sellables=[Item(id=1, name="Test Item", price=10.0)])
+
+    cash_register.close_receipt(receipt)
+    cash_register.clear()
+
+    assert journal.recorded == [receipt]
+    assert journal.shifts_ended == 1
+    assert cash_register.get_transaction_cnt() == 0
+    assert not any(cash_register.stripes)
+
+
+@dataclass
+class BlockingCashRegisterObserver:
+    started: threading.Event = field(default_factory=threading.Event)
+    release: threading.Event = field(default_factory=threading.Event)
+    snapshot_sizes: List[int] = field(default_factory=list)
+    z_reports: int = 0
+
+    def update_x(self, transactions: Sequence[Receipt]) -> None:
+        self.started.set()
+        self.release.wait(timeout=5)
+        self.snapshot_sizes.append(len(transactions))
+
+    def update_z(self) -> None:
+        # the last X report must have been delivered before the shift ends
+        assert self.snapshot_sizes[-1] == CashRegister.ENTRIES_FOR_Z_REPORT
+        self.z_reports += 1
+
+
+@dataclass
+class ShiftTotalsObserver:
+    z_delay: float = 0.0
+    last_snapshot: List[Receipt] = field(default_factory=list)
+    shift_receipts: List[int] = field(default_factory=list)
+    shift_revenue: List[float] = field(default_factory=list)
+    z_thread: Optional[threading.Thread] = None
+
+    def update_x(self, transactions: Sequence[Receipt]) -> None:
+        self.last_snapshot = list(transactions)
+
+    def update_z(self) -> None:
+        self.z_thread = threading.current_thread()
+        self.shift_receipts.append(len(self.last_snapshot))
+        revenue = sum((r.getPrice() for r in self.last_snapshot), Money())
+        self.shift_revenue.append(float(revenue))
+        time.sleep(self.z_delay)
+
+
+@dataclass
+class MockReceiptJournal:
+    recorded: List[Receipt] = field(default_factory=list)
+    shifts_ended: int = 0
+
+    def record(self, receipt: Receipt) -> None:
+        self.recorded.append(receipt)
+
+    def flush(self) -> None:
+        pass
+
+    def end_shift(self) -> None:
+        self.shifts_ended += 1
+
+    def close(self) -> None:
+        pass
+
+
 @dataclass
 class MockCashRegisterObserver(CashRegisterObserver):
     z_report_called: int = 0
     transactions: List[Receipt] = field(default_factory=list)
 
-    def update_x(self, transactions: List[Receipt]) -> None:
-        self.transactions = transactions
+    def update_x(self, transactions: Sequence[Receipt]) -> None:
+        self.transactions = list(transactions)
 
     def update_z(self) -> None:
         self.z_report_called = 1
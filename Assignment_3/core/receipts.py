@@ -59,6 +59,9 @@ class ReceiptRepository(Protocol):
     def read_all(self) -> list[Receipt]:
         pass
 
+    def get_sales_summary(self) -> ReportInfo:
+        pass
+
 
 class ReceiptExistsError(Exception):
     pass
@@ -123,14 +126,5 @@ class ReceiptService:
             raise e
 
     def get_sales_report(self) -> ReportInfo:
-        closed_receipts = [
-            receipt
-            for receipt in self.receipts.read_all()
-            if receipt.status == "closed"
-        ]
-
-        total_sale_num = len(closed_receipts)
-
-        total_revenue = sum(receipt.get_total() for receipt in closed_receipts)
-
-        return ReportInfo(total_sale_num=total_sale_num, total_revenue=total_revenue)
+        # kept up to date by the repository as receipts are closed
+        return self.receipts.get_sales_summary()
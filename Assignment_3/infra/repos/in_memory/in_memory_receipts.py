@@ -8,6 +8,7 @@ from core.receipts import (
     ReceiptDoesNotExistError,
     ReceiptExistsError,
     ReceiptProduct,
+    ReportInfo,
 )
 
 
@@ -15,6 +16,10 @@ from core.receipts import (
 @dataclass
 class InMemoryReceipts:
     receipts: dict[UUID, Receipt] = field(default_factory=dict)
+    # totals of the closed receipts, updated as receipts are closed. Revenue
+    # is kept in cents, a running float total drifts
+    closed_receipts: int = 0
+    closed_revenue_cents: int = 0
 
     def create(self, receipt: Receipt) -> None:
         if receipt.id in self.receipts:
@@ -54,7 +59,16 @@ class InMemoryReceipts:
                 f"Receipt with id '{receipt_id}' does not exist"
             )
 
-        self.receipts[receipt_id].status = receipt_status
+        receipt = self.receipts[receipt_id]
+        was_closed = receipt.status == "closed"
+        receipt.status = receipt_status
+
+        if not was_closed and receipt_status == "closed":
+            self.closed_receipts += 1
+            self.closed_revenue_cents += round(receipt.get_total() * 100)
+        elif was_closed and receipt_status != "closed":
+            self.closed_receipts -= 1
+            self.closed_revenue_cents -= round(receipt.get_total() * 100)
 
     def delete(self, receipt_id: UUID) -> None:
         if receipt_id not in self.receipts:
@@ -69,3 +83,9 @@ class InMemoryReceipts:
 
     def read_all(self) -> list[Receipt]:
         return list(self.receipts.values())
+
+    def get_sales_summary(self) -> ReportInfo:
+        return ReportInfo(
+            total_sale_num=self.closed_receipts,
+            total_revenue=self.closed_revenue_cents / 100,
+        )
@@ -62,6 +62,46 @@ class DbManager:
                 """
             )
 
+            # Create the 'sales_summary' table, a single row with the totals of
+            # the closed receipts that SQLiteReceipts keeps up to date. Revenue
+            # is kept in integer cents, a running REAL total drifts. The totals
+            # are derived from the receipts, so a table from before cents is
+            # dropped and started again below
+            columns = [
+                row[1] for row in cursor.execute("PRAGMA table_info(sales_summary)")
+            ]
+            if columns and "revenue_cents" not in columns:
+                cursor.execute("DROP TABLE sales_summary")
+            cursor.execute(
+                """
+                CREATE TABLE IF NOT EXISTS sales_summary (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    n_receipts INTEGER NOT NULL,
+                    revenue_cents INTEGER NOT NULL
+                )
+                """
+            )
+
+            # Start the totals from the receipts already closed, if any, every
+            # receipt rounded to cents like SQLiteReceipts.update_status does
+            cursor.execute(
+                """
+                INSERT OR IGNORE INTO sales_summary (id, n_receipts, revenue_cents)
+                SELECT 1, COUNT(*), COALESCE(SUM(cents), 0)
+                FROM (
+                    SELECT CAST(
+                        ROUND(COALESCE(SUM(rp.quantity * p.price), 0) * 100)
+                        AS INTEGER
+                    ) AS cents
+                    FROM receipts r
+                    LEFT JOIN receipt_products rp ON rp.receipt_id = r.id
+                    LEFT JOIN products p ON p.id = rp.product_id
+                    WHERE r.status = 'closed'
+                    GROUP BY r.id
+                )
+                """
+            )
+
     def drop_tables(self) -> None:
         with sqlite3.connect(self.db_name) as conn:
             cursor = conn.cursor()
@@ -69,6 +109,7 @@ class DbManager:
             cursor.execute("DROP TABLE IF EXISTS products")
             cursor.execute("DROP TABLE IF EXISTS receipts")
             cursor.execute("DROP TABLE IF EXISTS receipt_products")
+            cursor.execute("DROP TABLE IF EXISTS sales_summary")
 
     def get_unit_repository(self) -> SQLiteUnits:
         return SQLiteUnits(self.db_name)
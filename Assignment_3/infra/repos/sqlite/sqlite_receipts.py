@@ -1,5 +1,6 @@
 import sqlite3
 from dataclasses import dataclass
+from typing import Any, Iterable, Iterator
 from uuid import UUID
 
 from core.products import Product
@@ -9,6 +10,16 @@ from core.receipts import (
     ReceiptDoesNotExistError,
     ReceiptExistsError,
     ReceiptProduct,
+    ReportInfo,
+)
+
+# A receipt with its products in one query, a receipt without products (or whose
+# products were deleted) still comes back as a single row with NULL products.
+RECEIPTS_WITH_PRODUCTS = (
+    "SELECT r.id, r.status, p.id, p.unit_id, p.name, p.barcode, p.price, rp.quantity"
+    " FROM receipts r"
+    " LEFT JOIN receipt_products rp ON rp.receipt_id = r.id"
+    " LEFT JOIN products p ON p.id = rp.product_id"
 )
 
 
@@ -76,10 +87,27 @@ class SQLiteReceipts:
                 )
 
     def read(self, receipt_id: UUID) -> Receipt:
+        with sqlite3.connect(self.db_name) as conn:
+            cursor = conn.execute(
+                RECEIPTS_WITH_PRODUCTS + " WHERE r.id = ? ORDER BY rp.product_id",
+                (str(receipt_id),),
+            )
+
+            for receipt in _group_receipts(cursor):
+                return receipt
+
+            raise ReceiptDoesNotExistError(
+                f"Receipt with id '{receipt_id}' does not exist"
+            )
+
+    def update_status(self, receipt_id: UUID, receipt_status: str) -> None:
         with sqlite3.connect(self.db_name) as conn:
             cursor = conn.cursor()
+            # Lock before reading the old status, so two concurrent closes of
+            # one receipt cannot both count it
+            cursor.execute("BEGIN IMMEDIATE")
             cursor.execute(
-                "SELECT id, status FROM receipts" " WHERE id = ?", (str(receipt_id),)
+                "SELECT status FROM receipts WHERE id = ?", (str(receipt_id),)
             )
             result = cursor.fetchone()
 
@@ -88,50 +116,25 @@ class SQLiteReceipts:
                     f"Receipt with id '{receipt_id}' does not exist"
                 )
 
-            receipt = Receipt(id=UUID(result[0]), status=result[1])
-            cursor.execute(
-                "SELECT product_id, quantity FROM receipt_products"
-                " WHERE receipt_id = ?",
-                (str(receipt_id),),
-            )
-            product_results = cursor.fetchall()
-
-            for product_result in product_results:
-                product_id, quantity = product_result
-
-                # Fetch product details from the 'products' table
-                cursor.execute(
-                    "SELECT unit_id, name, barcode, price FROM products"
-                    " WHERE id = ?",
-                    (str(product_id),),
-                )
-                product_details = cursor.fetchone()
-
-                if product_details is not None:
-                    unit_id, name, barcode, price = product_details
-                    product = Product(
-                        id=UUID(product_id),
-                        unit_id=UUID(unit_id),
-                        name=name,
-                        barcode=barcode,
-                        price=price,
-                    )
-                    receipt_product = ReceiptProduct(inner=product, quantity=quantity)
-                    receipt.add_product(receipt_product)
-
-            return receipt
-
-    def update_status(self, receipt_id: UUID, receipt_status: str) -> None:
-        with sqlite3.connect(self.db_name) as conn:
-            cursor = conn.cursor()
             cursor.execute(
                 "UPDATE receipts SET status = ? WHERE id = ?",
                 (receipt_status, str(receipt_id)),
             )
 
-            if cursor.rowcount == 0:
-                raise ReceiptDoesNotExistError(
-                    f"Receipt with id '{receipt_id}' does not exist"
+            # Keep the sales summary in step, in the same transaction
+            was_closed = result[0] == "closed"
+            if was_closed != (receipt_status == "closed"):
+                sign = -1 if was_closed else 1
+                cursor.execute(
+                    "UPDATE sales_summary SET n_receipts = n_receipts + ?,"
+                    " revenue_cents = revenue_cents + ? * ("
+                    "SELECT CAST(ROUND("
+                    "COALESCE(SUM(rp.quantity * p.price), 0) * 100) AS INTEGER)"
+                    " FROM receipt_products rp"
+                    " JOIN products p ON p.id = rp.product_id"
+                    " WHERE rp.receipt_id = ?"
+                    ") WHERE id = 1",
+                    (sign, sign, str(receipt_id)),
                 )
 
     def delete(self, receipt_id: UUID) -> None:
@@ -163,51 +166,51 @@ class SQLiteReceipts:
 
     def read_all(self) -> list[Receipt]:
         with sqlite3.connect(self.db_name) as conn:
-            cursor = conn.cursor()
-
-            # Fetch all receipts
-            cursor.execute("SELECT id, status FROM receipts")
-            receipt_results = cursor.fetchall()
-
-            receipts = []
+            cursor = conn.execute(
+                RECEIPTS_WITH_PRODUCTS + " ORDER BY r.rowid, rp.product_id"
+            )
+            return list(_group_receipts(cursor))
 
-            for receipt_result in receipt_results:
-                receipt_id, receipt_status = receipt_result
-                receipt = Receipt(id=UUID(receipt_id), status=receipt_status)
+    def get_sales_summary(self) -> ReportInfo:
+        with sqlite3.connect(self.db_name) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT n_receipts, revenue_cents FROM sales_summary")
+            result = cursor.fetchone()
 
-                # Fetch products for each receipt
-                cursor.execute(
-                    "SELECT product_id, quantity FROM receipt_products"
-                    " WHERE receipt_id = ?",
-                    (str(receipt_id),),
-                )
-                product_results = cursor.fetchall()
-
-                for product_result in product_results:
-                    product_id, quantity = product_result
-
-                    # Fetch product details from the 'products' table
-                    cursor.execute(
-                        "SELECT unit_id, name, barcode, price FROM products"
-                        " WHERE id = ?",
-                        (str(product_id),),
-                    )
-                    product_details = cursor.fetchone()
-
-                    if product_details is not None:
-                        unit_id, name, barcode, price = product_details
-                        product = Product(
-                            id=UUID(product_id),
-                            unit_id=UUID(unit_id),
-                            name=name,
-                            barcode=barcode,
-                            price=price,
-                        )
-                        receipt_product = ReceiptProduct(
-                            inner=product, quantity=quantity
-                        )
-                        receipt.add_product(receipt_product)
-
-                receipts.append(receipt)
-
-            return receipts
+            if result is None:
+                return ReportInfo(total_sale_num=0, total_revenue=0)
+
+            return ReportInfo(total_sale_num=result[0], total_revenue=result[1] / 100)
+
+
+def _group_receipts(rows: Iterable[tuple[Any, ...]]) -> Iterator[Receipt]:
+    # rows of a receipt are adjacent, so receipts are built in one pass
+    receipt = None
+    current_id = None
+    uuids: dict[str, UUID] = {}
+    for receipt_id, status, product_id, unit_id, name, barcode, price, quantity in rows:
+        if receipt is None or receipt_id != current_id:
+            if receipt is not None:
+                yield receipt
+            current_id = receipt_id
+            receipt = Receipt(id=UUID(receipt_id), status=status)
+
+        # no products, or a product that no longer exists
+        if product_id is None:
+            continue
+
+        if product_id not in uuids:
+            uuids[product_id] = UUID(product_id)
+        if unit_id not in uuids:
+            uuids[unit_id] = UUID(unit_id)
+        product = Product(
+            id=uuids[product_id],
+            unit_id=uuids[unit_id],
+            name=name,
+            barcode=barcode,
+            price=price,
+        )
+        receipt.add_product(ReceiptProduct(inner=product, quantity=quantity))
+
+    if receipt is not None:
+        yield receipt
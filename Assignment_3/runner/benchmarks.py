@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Callable
+from uuid import UUID, uuid4
+
+from core.products import Product
+from core.receipts import Receipt, ReceiptProduct
+from infra.repos.sqlite.db_manager import DbManager
+from infra.repos.sqlite.sqlite_receipts import SQLiteReceipts
+
+
+@dataclass
+class ReceiptReadTimes:
+    receipts: int
+    n_plus_one: float
+    joined: float
+
+    def speedup(self) -> float:
+        return self.n_plus_one / max(self.joined, 1e-12)
+
+
+def seed_receipts(
+    db_name: str, receipts: int, products: int = 100, lines: int = 3
+) -> None:
+    db_manager = DbManager(db_name)
+    db_manager.drop_tables()
+    db_manager.create_tables()
+
+    unit_id = str(uuid4())
+    product_ids = [str(uuid4()) for _ in range(products)]
+    receipt_ids = [str(uuid4()) for _ in range(receipts)]
+    with sqlite3.connect(db_name) as conn:
+        conn.execute("INSERT INTO units (id, name) VALUES (?, ?)", (unit_id, "pcs"))
+        conn.executemany(
+            "INSERT INTO products (id, unit_id, name, barcode, price)"
+            " VALUES (?, ?, ?, ?, ?)",
+            (
+                (product_id, unit_id, f"Product {i}", str(i), 1 + i % 10)
+                for i, product_id in enumerate(product_ids)
+            ),
+        )
+        conn.executemany(
+            "INSERT INTO receipts (id, status) VALUES (?, ?)",
+            ((receipt_id, "closed") for receipt_id in receipt_ids),
+        )
+        conn.executemany(
+            "INSERT INTO receipt_products (receipt_id, product_id, quantity)"
+            " VALUES (?, ?, ?)",
+            (
+                (receipt_id, product_ids[(i + line) % products], 1 + line)
+                for i, receipt_id in enumerate(receipt_ids)
+                for line in range(lines)
+            ),
+        )
+
+
+def read_all_n_plus_one(db_name: str) -> list[Receipt]:
+    # the reference, what SQLiteReceipts.read_all did before the joined query:
+    # one query for the receipts, one per receipt and one per receipt line
+    with sqlite3.connect(db_name) as conn:
+        cursor = conn.cursor()
+        receipts = []
+        for receipt_id, status in cursor.execute(
+            "SELECT id, status FROM receipts"
+        ).fetchall():
+            receipt = Receipt(id=UUID(receipt_id), status=status)
+            for product_id, quantity in cursor.execute(
+                "SELECT product_id, quantity FROM receipt_products"
+                " WHERE receipt_id = ?",
+                (receipt_id,),
+            ).fetchall():
+                product_details = cursor.execute(
+                    "SELECT unit_id, name, barcode, price FROM products WHERE id = ?",
+                    (product_id,),
+                ).fetchone()
+                if product_details is not None:
+                    unit_id, name, barcode, price = product_details
+                    product = Product(
+                        id=UUID(product_id),
+                        unit_id=UUID(unit_id),
+                        name=name,
+                        barcode=barcode,
+                        price=price,
+                    )
+                    receipt.add_product(
+                        ReceiptProduct(inner=product, quantity=quantity)
+                    )
+            receipts.append(receipt)
+        return receipts
+
+
+def _best_of(repeat: int, read: Callable[[], list[Receipt]]) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        read()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def bench_receipt_reads(receipts: int = 100_000, repeat: int = 3) -> ReceiptReadTimes:
+    with tempfile.TemporaryDirectory() as workdir:
+        db_name = os.path.join(workdir, "bench.db")
+        seed_receipts(db_name, receipts)
+        repository = SQLiteReceipts(db_name)
+
+        # both sides must read the same receipts for the timings to compare
+        if read_all_n_plus_one(db_name) != repository.read_all():
+            raise RuntimeError("batched receipt reads differ from per-receipt reads")
+        return ReceiptReadTimes(
+            receipts,
+            _best_of(repeat, lambda: read_all_n_plus_one(db_name)),
+            _best_of(repeat, repository.read_all),
+        )
@@ -4,6 +4,7 @@ import uvicorn
 from dotenv import load_dotenv
 from typer import Typer
 
+from runner.benchmarks import bench_receipt_reads
 from runner.setup import init_app
 
 cli = Typer(no_args_is_help=True, add_completion=False)
@@ -14,3 +15,12 @@ def run(host: str = "127.0.0.1", port: int = 8000) -> None:
     load_dotenv()
 
     uvicorn.run(host=host, port=port, app=init_app())
+
+
+@cli.command()
+def bench_receipts(receipts: int = 100_000, repeat: int = 3) -> None:
+    times = bench_receipt_reads(receipts, repeat)
+
+    print(f"read_all of {times.receipts} receipts")
+    print(f"n+1 queries: {times.n_plus_one:.2f}s")
+    print(f"joined:      {times.joined:.2f}s ({times.speedup():.1f}x faster)")
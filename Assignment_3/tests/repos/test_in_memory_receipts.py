@@ -156,3 +156,43 @@ def test_should_read_all_receipts(fake_generator: FakeGenerator) -> None:
     assert fake_receipt1 in all_receipts
     assert fake_receipt2 in all_receipts
     assert fake_receipt3 in all_receipts
+
+
+def test_should_count_closed_receipts_once(fake_generator: FakeGenerator) -> None:
+    receipts_repository: InMemoryReceipts = InMemoryReceipts()
+    fake_product = fake_generator.generate_product()
+    fake_receipt: Receipt = Receipt()
+
+    receipts_repository.create(fake_receipt)
+    receipts_repository.create(Receipt())
+    receipts_repository.add_product(
+        fake_receipt.id, ReceiptProduct(inner=fake_product, quantity=2)
+    )
+    receipts_repository.update_status(fake_receipt.id, "closed")
+    receipts_repository.update_status(fake_receipt.id, "closed")
+
+    summary = receipts_repository.get_sales_summary()
+    assert summary.total_sale_num == 1
+    assert summary.total_revenue == 2 * fake_product.price
+
+    receipts_repository.update_status(fake_receipt.id, "open")
+
+    summary = receipts_repository.get_sales_summary()
+    assert summary.total_sale_num == 0
+    assert summary.total_revenue == 0
+
+
+def test_should_keep_sales_revenue_in_cents(fake_generator: FakeGenerator) -> None:
+    receipts_repository: InMemoryReceipts = InMemoryReceipts()
+    fake_product = fake_generator.generate_product()
+    fake_product.price = 0.1
+    for _ in range(3):
+        fake_receipt: Receipt = Receipt()
+        receipts_repository.create(fake_receipt)
+        receipts_repository.add_product(
+            fake_receipt.id, ReceiptProduct(inner=fake_product, quantity=1)
+        )
+        receipts_repository.update_status(fake_receipt.id, "closed")
+
+    # a running float total would be 0.30000000000000004
+    assert receipts_repository.get_sales_summary().total_revenue == 0.3
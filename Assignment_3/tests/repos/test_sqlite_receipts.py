@@ -0,0 +1,156 @@
+import sqlite3
+from pathlib import Path
+from uuid import uuid4
+
+import pytest
+
+from core.products import Product
+from core.receipts import (
+    Receipt,
+    ReceiptDoesNotExistError,
+    ReceiptProduct,
+    ReportInfo,
+)
+from infra.repos.sqlite.db_manager import DbManager
+from infra.repos.sqlite.sqlite_receipts import SQLiteReceipts
+from runner.benchmarks import read_all_n_plus_one, seed_receipts
+
+
+@pytest.fixture
+def db_name(tmp_path: Path) -> str:
+    db_name = str(tmp_path / "pos.db")
+    db_manager = DbManager(db_name)
+    db_manager.create_tables()
+    return db_name
+
+
+def create_product(db_name: str, name: str, price: float) -> Product:
+    product = Product(name=name, barcode=str(uuid4()), price=price)
+    db_manager = DbManager(db_name)
+    db_manager.get_product_repository().create(product)
+    return product
+
+
+def test_should_read_receipt_with_products(db_name: str) -> None:
+    receipts = SQLiteReceipts(db_name)
+    milk = create_product(db_name, "Milk", 2.5)
+    bread = create_product(db_name, "Bread", 1.0)
+    receipt = Receipt()
+
+    receipts.create(receipt)
+    receipts.add_product(receipt.id, ReceiptProduct(inner=milk, quantity=2))
+    receipts.add_product(receipt.id, ReceiptProduct(inner=bread, quantity=1))
+    receipts.add_product(receipt.id, ReceiptProduct(inner=milk, quantity=1))
+
+    read = receipts.read(receipt.id)
+    assert read.id == receipt.id
+    assert read.status == "open"
+    assert sorted((p.inner.name, p.quantity) for p in read.products) == [
+        ("Bread", 1),
+        ("Milk", 3),
+    ]
+    assert read.get_total() == 8.5
+
+
+def test_should_read_receipt_without_products(db_name: str) -> None:
+    receipts = SQLiteReceipts(db_name)
+    receipt = Receipt()
+
+    receipts.create(receipt)
+    assert receipts.read(receipt.id) == receipt
+    assert receipts.read_all() == [receipt]
+
+
+def test_should_not_read_unknown_receipt(db_name: str) -> None:
+    with pytest.raises(ReceiptDoesNotExistError):
+        SQLiteReceipts(db_name).read(uuid4())
+
+
+def test_should_skip_deleted_products(db_name: str) -> None:
+    receipts = SQLiteReceipts(db_name)
+    milk = create_product(db_name, "Milk", 2.5)
+    receipt = Receipt()
+
+    receipts.create(receipt)
+    receipts.add_product(receipt.id, ReceiptProduct(inner=milk, quantity=1))
+    with sqlite3.connect(db_name) as conn:
+        conn.execute("DELETE FROM products WHERE id = ?", (str(milk.id),))
+
+    assert receipts.read(receipt.id).products == []
+    assert receipts.read_all() == [receipts.read(receipt.id)]
+
+
+def test_should_read_all_like_one_query_per_line(db_name: str) -> None:
+    seed_receipts(db_name, receipts=50, products=7)
+
+    assert SQLiteReceipts(db_name).read_all() == read_all_n_plus_one(db_name)
+
+
+def test_should_count_closed_receipts_once(db_name: str) -> None:
+    receipts = SQLiteReceipts(db_name)
+    milk = create_product(db_name, "Milk", 2.5)
+    receipt = Receipt()
+
+    receipts.create(receipt)
+    receipts.create(Receipt())
+    receipts.add_product(receipt.id, ReceiptProduct(inner=milk, quantity=2))
+    receipts.update_status(receipt.id, "closed")
+    receipts.update_status(receipt.id, "closed")
+
+    assert receipts.get_sales_summary() == ReportInfo(
+        total_sale_num=1, total_revenue=5.0
+    )
+
+    receipts.update_status(receipt.id, "open")
+
+    assert receipts.get_sales_summary() == ReportInfo(
+        total_sale_num=0, total_revenue=0
+    )
+
+
+def test_should_not_update_status_of_unknown_receipt(db_name: str) -> None:
+    receipts = SQLiteReceipts(db_name)
+
+    with pytest.raises(ReceiptDoesNotExistError):
+        receipts.update_status(uuid4(), "closed")
+    assert receipts.get_sales_summary().total_sale_num == 0
+
+
+def test_should_keep_sales_revenue_in_cents(db_name: str) -> None:
+    receipts = SQLiteReceipts(db_name)
+    gum = create_product(db_name, "Gum", 0.1)
+    for _ in range(3):
+        receipt = Receipt()
+        receipts.create(receipt)
+        receipts.add_product(receipt.id, ReceiptProduct(inner=gum, quantity=1))
+        receipts.update_status(receipt.id, "closed")
+
+    # a running float total would be 0.30000000000000004
+    assert receipts.get_sales_summary().total_revenue == 0.3
+
+
+def test_should_rebuild_sales_summary_kept_in_dollars(db_name: str) -> None:
+    seed_receipts(db_name, receipts=20, products=7)
+    with sqlite3.connect(db_name) as conn:
+        conn.execute("DROP TABLE sales_summary")
+        conn.execute(
+            "CREATE TABLE sales_summary (id INTEGER PRIMARY KEY CHECK (id = 1),"
+            " n_receipts INTEGER NOT NULL, revenue REAL NOT NULL)"
+        )
+        conn.execute("INSERT INTO sales_summary VALUES (1, 0, 0)")
+    DbManager(db_name).create_tables()
+
+    assert SQLiteReceipts(db_name).get_sales_summary().total_sale_num == 20
+
+
+def test_should_start_sales_summary_from_closed_receipts(db_name: str) -> None:
+    seed_receipts(db_name, receipts=20, products=7)
+    receipts = SQLiteReceipts(db_name)
+    with sqlite3.connect(db_name) as conn:
+        conn.execute("DROP TABLE sales_summary")
+    DbManager(db_name).create_tables()
+
+    summary = receipts.get_sales_summary()
+    closed = [r for r in receipts.read_all() if r.status == "closed"]
+    assert summary.total_sale_num == len(closed) == 20
+    assert summary.total_revenue == pytest.approx(sum(r.get_total() for r in closed))